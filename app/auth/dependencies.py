@@ -4,22 +4,46 @@ from fastapi import Depends, HTTPException, status, Request
 from fastapi import security
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
-from app.auth.exceptions import InvalidTokenException
-from app.auth.service import AuthService
+from app.auth.exceptions import ForbiddenException, InvalidTokenException, TooManyRequestsException
+from app.auth.model import LoginForm
+from app.auth.service import AuthService, auth_service
 from app.auth.utils import verify_token
-from app.users.model import User
+from app.dependencies import UnitOfWorkDep
+from app.metrics import CallbackMetric
+from app.ratelimit import RateLimiter, get_backend
+from app.users.model import UserRecord
+from app.config import (
+    ADMIN_EMAILS,
+    LOGIN_RATE_LIMIT_EMAIL,
+    LOGIN_RATE_LIMIT_IP,
+    LOGIN_RATE_WINDOW,
+    RATE_LIMIT_BACKEND,
+    RATE_LIMIT_REDIS_URL,
+    RATE_LIMIT_SWEEP_INTERVAL,
+)
 
 security = HTTPBearer()
 
-def get_auth_service() -> AuthService:
-    """Get auth service instance with dependencies."""
-    return AuthService()
+# Login attempts per client IP and per email, counted before any DB lookup or hashing
+rate_limit_backend = get_backend(RATE_LIMIT_BACKEND, RATE_LIMIT_REDIS_URL, RATE_LIMIT_SWEEP_INTERVAL)
+login_ip_limiter = RateLimiter("login_ip", LOGIN_RATE_LIMIT_IP, LOGIN_RATE_WINDOW, rate_limit_backend)
+login_email_limiter = RateLimiter("login_email", LOGIN_RATE_LIMIT_EMAIL, LOGIN_RATE_WINDOW, rate_limit_backend)
+
+CallbackMetric(
+    "rate_limit_rejected_total", "Requests rejected by a rate limiter.",
+    lambda: [((limiter.name,), limiter.rejected) for limiter in (login_ip_limiter, login_email_limiter)],
+    ("limiter",), type="counter",
+)
+
+def get_auth_service(uow: UnitOfWorkDep) -> AuthService:
+    """Get the shared auth service; its queries run in the request's unit of work."""
+    return auth_service
 
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     auth_service: AuthService = Depends(get_auth_service),
-) -> User:
+) -> UserRecord:
     """Get current authenticated user from JWT token."""
     token = credentials.credentials
     payload = verify_token(token)
@@ -31,16 +55,32 @@ async def get_current_user(
     if user_id is None:
         raise InvalidTokenException()
 
-    user = auth_service.get_user_by_id(user_id)
+    user = await auth_service.get_user_by_id(user_id)
     if user is None:
         raise InvalidTokenException()
 
     return user
 
 
-def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+def get_current_active_user(current_user: UserRecord = Depends(get_current_user)) -> UserRecord:
     """Get current active user (additional validation can be added here)."""
     return current_user
 
+def get_current_admin_user(current_user: UserRecord = Depends(get_current_active_user)) -> UserRecord:
+    """Get current user, requiring their email to be listed in ADMIN_EMAILS."""
+    if current_user.email.lower() not in ADMIN_EMAILS:
+        raise ForbiddenException()
+    return current_user
+
+async def check_login_rate_limit(request: Request, login_data: LoginForm):
+    """Reject a login attempt with 429 once its IP or email is over the limit."""
+    client_ip = request.client.host if request.client else "unknown"
+    retry_after = await login_ip_limiter.hit(client_ip)
+    if not retry_after:
+        retry_after = await login_email_limiter.hit(login_data.email.lower())
+    if retry_after:
+        raise TooManyRequestsException(retry_after)
+
 AuthServiceDep = Annotated[AuthService, Depends(get_auth_service)]
-CurrentActiveUser = Annotated[User, Depends(get_current_active_user)]
+CurrentActiveUser = Annotated[UserRecord, Depends(get_current_active_user)]
+CurrentAdminUser = Annotated[UserRecord, Depends(get_current_admin_user)]
@@ -30,6 +30,13 @@ class InvalidTokenException(HTTPException):
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+class ForbiddenException(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions",
+        )
+
 class InvalidOTPException(HTTPException):
     def __init__(self):
         super().__init__(
@@ -43,3 +50,19 @@ class OTPExpiredException(HTTPException):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="OTP code has expired",
         )
+
+class HashingBusyException(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+class TooManyRequestsException(HTTPException):
+    def __init__(self, retry_after: int):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, please retry later",
+            headers={"Retry-After": str(retry_after)},
+        )
@@ -0,0 +1,111 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from app.auth.exceptions import HashingBusyException
+from app.config import logger, HASH_EXECUTOR, HASH_WORKERS, HASH_MAX_QUEUE
+from app.metrics import CallbackMetric, password_hash_seconds
+
+
+class PasswordHasher:
+    """
+    Runs CPU-bound password hashing off the event loop.
+
+    Work goes to a process pool (or a thread pool when processes are not
+    available or HASH_EXECUTOR=thread). At most `workers + max_queue` calls
+    may be in flight; past that, callers get a 503 straight away instead of
+    queueing behind every other login. A process pool whose worker died
+    (OOM kill, signal) is replaced once per call and the call retried.
+    """
+
+    def __init__(self, kind: str = HASH_EXECUTOR, workers: int = HASH_WORKERS, max_queue: int = HASH_MAX_QUEUE):
+        self.kind = kind
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[Executor] = None
+        self._in_flight = 0
+        self._rejected = 0
+        self._restarts = 0
+        self._completed = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+
+    def start(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                try:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+                except (OSError, NotImplementedError, ValueError) as e:
+                    logger.warning("Process pool unavailable (%s); hashing on threads instead.", e)
+                    self.kind = "thread"
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="hasher")
+            logger.info("Password hashing executor started (%s, workers=%s).", self.kind, self.workers)
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """Run fn(*args) on the executor, rejecting the call if the queue is full."""
+        if self._in_flight >= self.workers + self.max_queue:
+            self._rejected += 1
+            logger.warning("Password hashing saturated (%s in flight); rejecting request.", self._in_flight)
+            raise HashingBusyException()
+
+        executor = self.start()
+        self._in_flight += 1
+        started = time.perf_counter()
+        try:
+            try:
+                return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+            except BrokenProcessPool:
+                executor = self._replace_broken(executor)
+                return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        finally:
+            elapsed = time.perf_counter() - started
+            self._in_flight -= 1
+            self._completed += 1
+            self._total_latency += elapsed
+            self._max_latency = max(self._max_latency, elapsed)
+            password_hash_seconds.labels(getattr(fn, "__name__", "unknown")).observe(elapsed)
+
+    def _replace_broken(self, broken: Executor) -> Executor:
+        """Swap a broken process pool for a new one, unless a concurrent call already did."""
+        if self._executor is broken:
+            logger.warning("Password hashing process pool is broken (worker died); restarting it.")
+            self._executor = None
+            self._restarts += 1
+            broken.shutdown(wait=False, cancel_futures=True)
+        return self.start()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "in_flight": self._in_flight,
+            "queue_depth": max(self._in_flight - self.workers, 0),
+            "rejected": self._rejected,
+            "restarts": self._restarts,
+            "completed": self._completed,
+            "avg_latency_ms": (self._total_latency / self._completed * 1000) if self._completed else 0.0,
+            "max_latency_ms": self._max_latency * 1000,
+        }
+
+
+hasher = PasswordHasher()
+
+CallbackMetric(
+    "password_hash_queue",
+    "Hashing calls in flight, waiting for a worker, and rejected since start.",
+    lambda: [((key,), hasher.stats()[key]) for key in ("in_flight", "queue_depth", "rejected")],
+    ("state",),
+)
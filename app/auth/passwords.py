@@ -0,0 +1,152 @@
+import logging
+import math
+import time
+from functools import lru_cache
+from typing import Dict, Optional, Sequence, Tuple
+
+from passlib.context import CryptContext
+from passlib.registry import get_crypt_handler
+
+from app.config import (
+    logger,
+    PASSWORD_HASH_TARGET_MS,
+    PASSWORD_REHASH_TOLERANCE,
+    PASSWORD_ROUNDS,
+    PASSWORD_SCHEMES,
+)
+from app.metrics import CallbackMetric
+
+# passlib 1.7 logs a traceback reading the version of bcrypt >= 4.1; hashing itself works
+logging.getLogger("passlib.handlers.bcrypt").setLevel(logging.ERROR)
+
+_PROBE = "calibration-probe-password"
+
+
+class PasswordPolicy:
+    """
+    Which password hash schemes are accepted, and what new hashes cost.
+
+    The first of `schemes` hashes new passwords; the others are only
+    verified, and their hashes count as outdated. A hash also counts as
+    outdated when its rounds cost more than `tolerance` times more or less
+    than the policy's, so login can rehash it (see needs_update). Rounds
+    come from `rounds` or passlib's defaults, and calibrate() retunes the
+    first scheme's rounds so one hash takes about `target_ms` here.
+
+    `config` is the policy as a string, for hashing in worker processes
+    that cannot see this object (see context_for).
+    """
+
+    def __init__(
+        self,
+        schemes: Sequence[str] = PASSWORD_SCHEMES,
+        rounds: Optional[Dict[str, int]] = None,
+        target_ms: float = PASSWORD_HASH_TARGET_MS,
+        tolerance: float = PASSWORD_REHASH_TOLERANCE,
+    ):
+        self.schemes = list(schemes)
+        self.rounds = dict(PASSWORD_ROUNDS if rounds is None else rounds)
+        self.target_ms = target_ms
+        self.tolerance = tolerance
+        self._build()
+
+    @property
+    def scheme(self) -> str:
+        return self.schemes[0]
+
+    def _band(self, handler, rounds: int) -> Tuple[int, int]:
+        """Lowest and highest rounds that cost within `tolerance` of `rounds`."""
+        if handler.rounds_cost == "log2":
+            step = int(math.log2(max(self.tolerance, 1)))
+            low, high = rounds - step, rounds + step
+        else:
+            low, high = int(rounds / max(self.tolerance, 1)), int(rounds * max(self.tolerance, 1))
+        return max(low, handler.min_rounds), min(high, handler.max_rounds)
+
+    def _build(self):
+        settings = {}
+        for scheme in self.schemes:
+            handler = get_crypt_handler(scheme)
+            rounds = self.rounds.get(scheme)
+            if rounds is None or "rounds" not in handler.setting_kwds:
+                continue
+            low, high = self._band(handler, rounds)
+            settings[f"{scheme}__default_rounds"] = rounds
+            settings[f"{scheme}__min_rounds"] = low
+            settings[f"{scheme}__max_rounds"] = high
+        self.context = CryptContext(schemes=self.schemes, deprecated="auto", **settings)
+        self.config = self.context.to_string()
+
+    def hash(self, password: str) -> str:
+        return self.context.hash(password)
+
+    def verify(self, password: str, hashed: str) -> bool:
+        return self.context.verify(password, hashed)
+
+    def needs_update(self, hashed: Optional[str]) -> bool:
+        """True for hashes of a deprecated scheme or of rounds outside the policy's band."""
+        if not hashed:
+            return False
+        try:
+            return self.context.needs_update(hashed)
+        except ValueError:  # not a hash any accepted scheme recognizes
+            return False
+
+    def _measure(self, handler, rounds: int) -> float:
+        started = time.perf_counter()
+        handler.using(rounds=rounds).hash(_PROBE)
+        return (time.perf_counter() - started) * 1000
+
+    def calibrate(self) -> Optional[int]:
+        """
+        Set the first scheme's rounds so one hash takes about target_ms on
+        this machine; returns the rounds chosen, or None when disabled.
+        Probes start cheap and double until they take an eighth of the
+        target, then the cost is extrapolated from the last probe.
+        """
+        handler = get_crypt_handler(self.scheme)
+        if self.target_ms <= 0 or "rounds" not in handler.setting_kwds:
+            return None
+        log2 = handler.rounds_cost == "log2"
+        rounds = handler.min_rounds if log2 else max(handler.min_rounds, 1000)
+        self._measure(handler, rounds)  # loads the backend
+        elapsed = self._measure(handler, rounds)
+        while elapsed < self.target_ms / 8 and rounds < handler.max_rounds:
+            rounds = rounds + 1 if log2 else rounds * 2
+            elapsed = self._measure(handler, rounds)
+        ratio = self.target_ms / max(elapsed, 0.001)
+        if log2:
+            rounds += round(math.log2(ratio))
+        else:
+            # Two significant digits, so restarts land on the same rounds
+            rounds = int(float(f"{rounds * ratio:.2g}"))
+        rounds = min(max(rounds, handler.min_rounds), handler.max_rounds)
+        self.rounds[self.scheme] = rounds
+        self._build()
+        logger.info(
+            "Password hashing calibrated: %s rounds=%s (target %.0f ms per hash).", self.scheme, rounds, self.target_ms
+        )
+        return rounds
+
+
+password_policy = PasswordPolicy()
+
+
+@lru_cache(maxsize=8)
+def _context_from_string(config: str) -> CryptContext:
+    return CryptContext.from_string(config)
+
+
+def context_for(config: Optional[str] = None) -> CryptContext:
+    """The policy's CryptContext, or one rebuilt from a `config` string (cached per process)."""
+    if config is None or config == password_policy.config:
+        return password_policy.context
+    return _context_from_string(config)
+
+
+CallbackMetric(
+    "password_hash_rounds",
+    "Rounds new password hashes use, per scheme, after any startup calibration.",
+    lambda: [((scheme,), rounds) for scheme, rounds in password_policy.rounds.items()],
+    ("scheme",),
+)
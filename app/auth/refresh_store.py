@@ -0,0 +1,292 @@
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.auth.repository import RefreshTokenRepository
+from app.cache import TTLCache
+from app.config import (
+    logger,
+    REFRESH_STORE_FLUSH_INTERVAL,
+    REFRESH_STORE_MAX_PENDING,
+    REFRESH_STORE_SIZE,
+    REFRESH_SWEEP_BATCH_SIZE,
+    REFRESH_SWEEP_INTERVAL,
+    REFRESH_TOKEN_EXPIRE_DAYS,
+)
+from app.metrics import CallbackMetric, register_cache
+from app.repository import db
+
+# Rotations and family revocations are broadcast to the other workers here
+CHANNEL = "refresh_tokens"
+_MAX_PAYLOAD = 7900  # pg_notify payloads must stay under 8000 bytes
+
+
+def new_token_id() -> str:
+    return uuid.uuid4().hex
+
+
+def legacy_token_id(token: str) -> str:
+    """Stand-in jti for a refresh token issued before tokens carried one."""
+    return hashlib.sha256(token.encode()).hexdigest()[:32]
+
+
+class RefreshTokenStore:
+    """
+    Server-side state for refresh tokens, kept in memory and in the
+    refresh_tokens table.
+
+    Every refresh token carries a `jti`. Tokens issued at login start a new
+    family; each refresh rotates the presented token (it becomes used) and
+    issues the next one in the same family. Presenting a used token again
+    means it was copied, so the whole family is revoked and both the thief
+    and the victim must log in again.
+
+    Lookups are dict hits in a TTL cache that expires entries with the token
+    itself. New tokens are written before they are handed out, so any worker
+    can find them in the table on a memory miss (another worker issued it, or
+    this one restarted). Rotations and revocations are queued and flushed
+    every `flush_interval` seconds, then broadcast with NOTIFY; a rotation the
+    table already saw from another worker is caught at flush time and
+    revokes the family there.
+
+    Tokens issued before this store existed have no jti. They are claimed
+    once under legacy_token_id (see claim_legacy) and die out with
+    REFRESH_TOKEN_EXPIRE_DAYS.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = REFRESH_STORE_SIZE,
+        flush_interval: float = REFRESH_STORE_FLUSH_INTERVAL,
+        max_pending: int = REFRESH_STORE_MAX_PENDING,
+        sweep_interval: float = REFRESH_SWEEP_INTERVAL,
+        sweep_batch_size: int = REFRESH_SWEEP_BATCH_SIZE,
+    ):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.sweep_interval = sweep_interval
+        self.sweep_batch_size = sweep_batch_size
+        self.repo = RefreshTokenRepository()
+        # jti -> [family_id, user_id, used]
+        self.tokens = TTLCache(maxsize=maxsize, ttl=0, name="refresh_tokens")
+        self.revoked_families = TTLCache(
+            maxsize=maxsize, ttl=float(REFRESH_TOKEN_EXPIRE_DAYS) * 86400, name="revoked_token_families"
+        )
+        self._used: List[str] = []
+        self._revoked: List[str] = []
+        self._task: Optional[asyncio.Task] = None
+        self._listener = None
+        self._stats = {"issued": 0, "rotated": 0, "reuse_detected": 0, "families_revoked": 0, "db_lookups": 0,
+                       "flushes": 0, "flush_errors": 0, "flush_dropped": 0, "expired_purged": 0}
+
+    async def add(self, jti: str, user_id: int, expires_at: datetime, family_id: Optional[str] = None) -> str:
+        """Store a newly issued refresh token; returns its family, a new one unless given."""
+        family_id = family_id or new_token_id()
+        await self.repo.insert_many([(jti, family_id, int(user_id), expires_at, datetime.now(timezone.utc))])
+        self.tokens.set(jti, [family_id, int(user_id), False], ttl=expires_at.timestamp() - time.time())
+        self._stats["issued"] += 1
+        return family_id
+
+    async def claim_legacy(self, jti: str, user_id: int, expires_at: datetime) -> Optional[Tuple[str, int]]:
+        """
+        Consume a token issued without a jti, under its legacy_token_id. The
+        first claim starts a family, as a login would; a replay finds the
+        claimed row and revokes that family like any reused token.
+        """
+        family_id = new_token_id()
+        if await self.repo.claim(jti, family_id, int(user_id), expires_at, datetime.now(timezone.utc)):
+            self.tokens.set(jti, [family_id, int(user_id), True], ttl=expires_at.timestamp() - time.time())
+            self._stats["rotated"] += 1
+            return family_id, int(user_id)
+        await self.rotate(jti)
+        return None
+
+    async def _load(self, jti: str) -> Optional[list]:
+        self._stats["db_lookups"] += 1
+        row = await self.repo.get_by_jti(jti)
+        if not row:
+            return None
+        if row["revoked_at"] is not None:
+            self.revoked_families.set(row["family_id"], True)
+        expires_at = row["expires_at"].replace(tzinfo=timezone.utc)
+        entry = [row["family_id"], row["user_id"], row["used_at"] is not None]
+        # Another request may have loaded it while this one waited
+        current = self.tokens.get(jti)
+        if current is not None:
+            return current
+        self.tokens.set(jti, entry, ttl=expires_at.timestamp() - time.time())
+        return entry
+
+    async def rotate(self, jti: Optional[str]) -> Optional[Tuple[str, int]]:
+        """
+        Consume a refresh token. Returns (family_id, user_id) to issue the next
+        token in, or None if the token is unknown, revoked or being reused.
+        """
+        if not jti:
+            return None
+        entry = self.tokens.get(jti)
+        if entry is None:
+            entry = await self._load(jti)
+            if entry is None:
+                return None
+        family_id, user_id, used = entry
+        if family_id in self.revoked_families:
+            return None
+        if used:
+            self._stats["reuse_detected"] += 1
+            logger.warning("Refresh token reuse detected; revoking family %s.", family_id)
+            self.revoke_family(family_id)
+            return None
+        entry[2] = True
+        self._used.append(jti)
+        self._stats["rotated"] += 1
+        return family_id, user_id
+
+    def revoke_family(self, family_id: str):
+        if family_id in self.revoked_families:
+            return
+        self.revoked_families.set(family_id, True)
+        self._revoked.append(family_id)
+        self._stats["families_revoked"] += 1
+
+    async def revoke(self, jti: Optional[str]) -> bool:
+        """Revoke the family of a refresh token (logout); False if the token is unknown."""
+        entry = self.tokens.get(jti) if jti else None
+        if entry is None and jti:
+            entry = await self._load(jti)
+        if entry is None:
+            return False
+        self.revoke_family(entry[0])
+        return True
+
+    async def flush(self):
+        """
+        Write queued rotations and revocations; on failure they are retried
+        next time, keeping the newest `max_pending` of each kind.
+        """
+        used, revoked = self._used, self._revoked
+        if not (used or revoked):
+            return
+        self._used, self._revoked = [], []
+        now = datetime.now(timezone.utc)
+        rotated: List[str] = []
+        try:
+            if used:
+                rows = await self.repo.mark_used(used, now)
+                rotated, used = used, []
+                for row in rows:
+                    # Rotated by another worker too: reuse that memory could not see
+                    self._stats["reuse_detected"] += 1
+                    logger.warning("Refresh token reuse detected at flush; revoking family %s.", row["family_id"])
+                    if row["family_id"] not in revoked:
+                        revoked.append(row["family_id"])
+                    self.revoked_families.set(row["family_id"], True)
+            if revoked:
+                await self.repo.revoke_families(revoked, now)
+            await self._broadcast(rotated, revoked)
+            self._stats["flushes"] += 1
+        except Exception as e:
+            self._stats["flush_errors"] += 1
+            logger.error("Refresh token flush failed: %s", e)
+            self._used[:0], self._revoked[:0] = used, revoked
+            self._trim_pending()
+
+    def _trim_pending(self):
+        """Drop the oldest queued writes past max_pending, so a database outage cannot exhaust memory."""
+        for queue in (self._used, self._revoked):
+            excess = len(queue) - self.max_pending
+            if excess > 0:
+                del queue[:excess]
+                self._stats["flush_dropped"] += excess
+                logger.error("Refresh token store dropped %s queued writes after failed flushes.", excess)
+
+    async def _broadcast(self, used: List[str], revoked: List[str]):
+        events = [("used", jti) for jti in used] + [("revoked", family) for family in revoked]
+        chunk: Dict[str, List[str]] = {"used": [], "revoked": []}
+        size = 0
+        for kind, value in events:
+            if size + len(value) + 4 > _MAX_PAYLOAD - 30:
+                await db.execute("SELECT pg_notify($1, $2)", CHANNEL, json.dumps(chunk))
+                chunk, size = {"used": [], "revoked": []}, 0
+            chunk[kind].append(value)
+            size += len(value) + 4
+        if size:
+            await db.execute("SELECT pg_notify($1, $2)", CHANNEL, json.dumps(chunk))
+
+    def _on_notify(self, connection, pid, channel, payload: str):
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            return
+        for jti in event.get("used", ()):
+            entry = self.tokens.get(jti)
+            if entry is not None:
+                entry[2] = True
+        for family_id in event.get("revoked", ()):
+            self.revoked_families.set(family_id, True)
+
+    async def purge_expired(self) -> int:
+        """Delete expired tokens in batches until one comes up short; returns the rows removed."""
+        purged = 0
+        while True:
+            deleted = await self.repo.delete_expired(self.sweep_batch_size)
+            purged += deleted
+            if deleted < self.sweep_batch_size:
+                break
+        self._stats["expired_purged"] += purged
+        return purged
+
+    async def _run(self):
+        next_purge = time.monotonic() + self.sweep_interval
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            if self.sweep_interval > 0 and time.monotonic() >= next_purge:
+                next_purge = time.monotonic() + self.sweep_interval
+                try:
+                    await self.purge_expired()
+                except Exception as e:
+                    logger.error("Expired refresh token purge failed: %s", e)
+
+    async def start(self):
+        if self._task is not None:
+            return
+        try:
+            self._listener = await db.pool.acquire()
+            await self._listener.add_listener(CHANNEL, self._on_notify)
+        except Exception as e:
+            self._listener = None
+            logger.warning("Refresh token store not listening for other workers (%s).", e)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+        if self._listener is not None:
+            try:
+                await self._listener.remove_listener(CHANNEL, self._on_notify)
+                await db.pool.release(self._listener)
+            except Exception as e:
+                logger.warning("Refresh token store listener release failed: %s", e)
+            self._listener = None
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._stats, pending=len(self._used) + len(self._revoked))
+
+
+refresh_store = RefreshTokenStore()
+register_cache(refresh_store.tokens)
+
+CallbackMetric(
+    "refresh_token_store",
+    "Refresh-token store: tokens issued and rotated, reuse detected, families revoked, DB lookups and flushes.",
+    lambda: [((key,), value) for key, value in refresh_store.stats().items()],
+    ("stat",),
+)
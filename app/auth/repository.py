@@ -1,46 +1,173 @@
-from typing import Optional
-from app.repository import BaseRepository, db
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+from pydantic import BaseModel
+from app.repository import BaseRepository, db, reads, writes
+from app.query import UTC_NOW, delete_sql, params, select_sql
 from app.auth.model import OTP
+from app.users.model import User, UserRecord
 from app.config import logger
 
 class OTPRepository(BaseRepository):
     def __init__(self):
         super().__init__(OTP.table_name)
 
-    def get_by_user_and_code(self, user_id: int, code: str):
+    def _to_row(self, data: BaseModel) -> Dict[str, Any]:
+        row = super()._to_row(data)
+        if "user_id" in row:
+            row["user_id"] = int(row["user_id"])  # OTP.user_id is a str, the column is INT
+        return row
+
+    @reads
+    async def get_by_user_and_code(self, user_id: int, code: str):
         """Get activation by user ID and code (valid if not expired)."""
-        query = f"""
-        SELECT * FROM {self.table_name}
-        WHERE user_id={int(user_id)} AND code='{str(code)}' AND expires_at > NOW()
-        """
+        query = select_sql(self.table_name, ("user_id", "code"), extra=f"expires_at > {UTC_NOW}")
         try:
-            result = db.fetchOne(query)
+            result = await db.fetchOne(query, int(user_id), str(code))
             return result if result else None
         except Exception as e:
-            logger.error(f"DB error in get_by_user_and_code: {e}")
+            logger.error("DB error in get_by_user_and_code: %s", e)
             return None
 
-    def get_by_email_and_purpose(self, email: str, purpose: str):
-        query = f"""
-        SELECT * FROM {self.table_name}
-        WHERE email='{email}' AND purpose='{purpose}'
-        ORDER BY created_at DESC
-        LIMIT 1
-        """
+    @reads
+    async def get_by_email_and_purpose(self, email: str, purpose: str):
+        query = select_sql(
+            self.table_name, ("email", "purpose"), order_by="created_at DESC", limit=1
+        )
         try:
-            result = db.fetchOne(query)
+            result = await db.fetchOne(query, email, purpose)
             return result if result else None
         except Exception as e:
-            logger.error(f"DB error in get_by_email_and_purpose: {e}")
+            logger.error("DB error in get_by_email_and_purpose: %s", e)
             return None
 
-    def delete_by_email_and_purpose(self, email: str, purpose: str):
-        query = f"""
-        DELETE FROM {self.table_name}
-        WHERE email='{email}' AND purpose='{purpose}'
-        """
+    @writes
+    async def delete_by_email_and_purpose(self, email: str, purpose: str):
+        query = delete_sql(self.table_name, ("email", "purpose"))
         try:
-            return db.execute(query)
+            return await db.execute(query, email, purpose)
         except Exception as e:
-            logger.error(f"DB error in delete_by_email_and_purpose: {e}")
+            logger.error("DB error in delete_by_email_and_purpose: %s", e)
             return None
+
+    @writes
+    async def verify_and_activate(self, email: str, purpose: str, code: str) -> Optional[UserRecord]:
+        """
+        Consume the matching, unexpired OTP and activate its user in one statement.
+        Returns the activated user, or None if no such OTP exists.
+        """
+        query = f"""
+        WITH consumed AS (
+            DELETE FROM {self.table_name}
+            WHERE email=$1 AND purpose=$2 AND code=$3 AND expires_at > {UTC_NOW}
+            RETURNING user_id
+        )
+        UPDATE {User.table_name} SET is_active=TRUE
+        WHERE id IN (SELECT user_id FROM consumed)
+        RETURNING *
+        """
+        # Database errors propagate so the caller's transaction rolls back;
+        # only "no row" means the OTP did not match
+        result = await db.fetchOne(query, email, purpose, str(code))
+        return UserRecord.from_row(result) if result else None
+
+    @writes
+    async def delete_expired(self, limit: int) -> int:
+        """Delete up to `limit` expired activations; returns the number of rows removed."""
+        query = f"""
+        DELETE FROM {self.table_name}
+        WHERE id IN (
+            SELECT id FROM {self.table_name}
+            WHERE expires_at < {UTC_NOW}
+            ORDER BY id
+            LIMIT $1
+            FOR UPDATE SKIP LOCKED
+        )
+        """
+        status = await db.execute(query, int(limit))
+        return int(status.split()[-1]) if status else 0
+
+
+otp_repository = OTPRepository()
+
+
+REFRESH_TOKEN_COLUMNS = ("jti", "family_id", "user_id", "expires_at", "created_at")
+
+class RefreshTokenRepository(BaseRepository):
+    """Persistence behind the refresh-token store; read only on a memory miss."""
+
+    def __init__(self):
+        super().__init__("refresh_tokens")
+
+    @reads(confirm_miss=True)
+    async def get_by_jti(self, jti: str) -> Optional[Dict]:
+        return await db.fetchOne(select_sql(self.table_name, ("jti",)), jti)
+
+    @writes
+    async def insert_many(self, rows: Sequence[Sequence]) -> List[str]:
+        """
+        Insert (jti, family_id, user_id, expires_at, created_at) rows in one
+        statement; returns the jtis written. Replays and tokens whose user was
+        deleted meanwhile are skipped rather than failing the other rows.
+        """
+        query = f"""
+        INSERT INTO {self.table_name} ({', '.join(REFRESH_TOKEN_COLUMNS)})
+        SELECT t.* FROM unnest($1::text[], $2::text[], $3::int[], $4::timestamp[], $5::timestamp[])
+            AS t({', '.join(REFRESH_TOKEN_COLUMNS)})
+        WHERE EXISTS (SELECT 1 FROM {User.table_name} u WHERE u.id = t.user_id)
+        ON CONFLICT (jti) DO NOTHING
+        RETURNING jti
+        """
+        columns = zip(*(params(row) for row in rows))
+        inserted = await db.fetchAll(query, *(list(column) for column in columns))
+        return [row["jti"] for row in inserted]
+
+    @writes
+    async def claim(self, jti: str, family_id: str, user_id: int, expires_at: datetime, used_at: datetime) -> bool:
+        """Insert a token already marked used; False if the jti was claimed before (or its user is gone)."""
+        query = f"""
+        INSERT INTO {self.table_name} (jti, family_id, user_id, expires_at, used_at, created_at)
+        SELECT $1::text, $2::text, $3::int, $4::timestamp, $5::timestamp, $5::timestamp
+        WHERE EXISTS (SELECT 1 FROM {User.table_name} WHERE id = $3)
+        ON CONFLICT (jti) DO NOTHING
+        RETURNING jti
+        """
+        return await db.fetchOne(query, jti, family_id, int(user_id), *params((expires_at, used_at))) is not None
+
+    @writes
+    async def mark_used(self, jtis: List[str], used_at: datetime) -> List[Dict]:
+        """
+        Mark tokens as rotated. Returns {jti, family_id} for tokens that were
+        already rotated elsewhere, i.e. reuse that only shows up here.
+        """
+        query = f"""
+        WITH input AS (
+            SELECT unnest($1::text[]) AS jti
+        ), updated AS (
+            UPDATE {self.table_name} t SET used_at=$2
+            FROM input WHERE t.jti = input.jti AND t.used_at IS NULL
+            RETURNING t.jti
+        )
+        SELECT t.jti, t.family_id FROM {self.table_name} t JOIN input USING (jti)
+        WHERE t.jti NOT IN (SELECT jti FROM updated)
+        """
+        return await db.fetchAll(query, list(jtis), *params((used_at,)))
+
+    @writes
+    async def revoke_families(self, family_ids: List[str], revoked_at: datetime) -> str:
+        query = f"UPDATE {self.table_name} SET revoked_at=$2 WHERE family_id = ANY($1::text[]) AND revoked_at IS NULL"
+        return await db.execute(query, list(family_ids), *params((revoked_at,)))
+
+    @writes
+    async def delete_expired(self, limit: int) -> int:
+        """Delete up to `limit` expired tokens; returns the number of rows removed."""
+        query = f"""
+        DELETE FROM {self.table_name}
+        WHERE jti IN (
+            SELECT jti FROM {self.table_name}
+            WHERE expires_at < {UTC_NOW}
+            LIMIT $1
+            FOR UPDATE SKIP LOCKED
+        )
+        """
+        status = await db.execute(query, int(limit))
+        return int(status.split()[-1]) if status else 0
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, status
-from app.auth.dependencies import AuthServiceDep
+from fastapi import APIRouter, Depends, status
+from app.auth.dependencies import AuthServiceDep, check_login_rate_limit
 from app.auth.model import OTPResponse, LoginForm, RefreshTokenRequest, RegisterForm, TokenResponse, VerifyForm
+from app.dependencies import UnitOfWorkRoute
+from app.responses import ModelResponse
 
-router = APIRouter(prefix="/auth", tags=["Authentication"])
+router = APIRouter(prefix="/auth", tags=["Authentication"], route_class=UnitOfWorkRoute)
 
 @router.post(
     "/register",
@@ -13,9 +15,9 @@ router = APIRouter(prefix="/auth", tags=["Authentication"])
 )
 async def register(
     register_data: RegisterForm, auth_service: AuthServiceDep
-) -> OTPResponse:
+) -> ModelResponse:
     """Register a new user account."""
-    return auth_service.register(register_data)
+    return ModelResponse(await auth_service.register(register_data), status_code=status.HTTP_201_CREATED)
 
 
 @router.post(
@@ -26,19 +28,20 @@ async def register(
 )
 async def verify(
     verify_data: VerifyForm, auth_service: AuthServiceDep
-) -> TokenResponse:
+) -> ModelResponse:
     """Verify user registration with OTP."""
-    return auth_service.verify_registration(verify_data.email, verify_data.activation_code)
+    return ModelResponse(await auth_service.verify_registration(verify_data.email, verify_data.activation_code))
 
 @router.post(
     "/login",
     response_model=TokenResponse,
     summary="User login",
-    description="Authenticate user and return access and refresh tokens.",
+    description="Authenticate user and return access and refresh tokens. Attempts are rate limited per client IP and per email.",
+    dependencies=[Depends(check_login_rate_limit)],
 )
-async def login(login_data: LoginForm, auth_service: AuthServiceDep) -> TokenResponse:
+async def login(login_data: LoginForm, auth_service: AuthServiceDep) -> ModelResponse:
     """Authenticate user and return tokens."""
-    return auth_service.login(login_data)
+    return ModelResponse(await auth_service.login(login_data))
 
 @router.post(
     "/refresh",
@@ -48,6 +51,16 @@ async def login(login_data: LoginForm, auth_service: AuthServiceDep) -> TokenRes
 )
 async def refresh_token(
     request: RefreshTokenRequest, auth_service: AuthServiceDep
-) -> TokenResponse:
+) -> ModelResponse:
     """Refresh access token."""
-    return auth_service.refresh_token(request.refresh_token)
+    return ModelResponse(await auth_service.refresh_token(request.refresh_token))
+
+@router.post(
+    "/logout",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Log out",
+    description="Revoke the refresh token and every token rotated from the same login.",
+)
+async def logout(request: RefreshTokenRequest, auth_service: AuthServiceDep) -> None:
+    """Revoke a refresh token family."""
+    await auth_service.logout(request.refresh_token)
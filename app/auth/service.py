@@ -1,121 +1,136 @@
+import asyncio
+import contextvars
 from datetime import datetime, timedelta, timezone
-from typing import Optional
-from app.auth.exceptions import InvalidCredentialsException, InvalidOTPException, InvalidTokenException, OTPExpiredException, UserAlreadyExistsException, UserNotFoundException
-from app.auth.model import OTP, OTPResponse, LoginForm, RegisterForm, TokenResponse
-from app.auth.repository import OTPRepository
-from app.auth.utils import create_access_token, create_refresh_token, generate_one_time_password, hash_password, send_email_one_time_password, verify_password, verify_token
-from app.users.model import User
-from app.users.repository import UserRepository
-from app.config import logger
+from typing import Optional, Set, Tuple
+from app.auth.exceptions import InvalidCredentialsException, InvalidOTPException, InvalidTokenException, OTPExpiredException, UserAlreadyExistsException
+from app.auth.model import OTPResponse, LoginForm, RegisterForm, TokenResponse
+from app.auth.passwords import password_policy
+from app.auth.refresh_store import legacy_token_id, new_token_id, refresh_store
+from app.auth.repository import otp_repository
+from app.auth.utils import generate_one_time_password, issue_token_pair, hash_password_async, send_email_one_time_password, verify_password_async, verify_token
+from app.users.model import UserRecord
+from app.repository import after_commit, transactional
+from app.users.repository import user_cache, user_repository
+from app.config import LOG_REQUEST_LEVEL, logger
 
 
 class AuthService:
     def __init__(self):
-        self.users_repo = UserRepository()
-        self.activation_code_repo = OTPRepository()
+        self.users_repo = user_repository
+        self.activation_code_repo = otp_repository
+        self._rehashes: Set[asyncio.Task] = set()
         
-    def get_user_by_id(self, user_id: str) -> Optional[User]:
+    async def get_user_by_id(self, user_id: str) -> Optional[UserRecord]:
         """Get user by ID."""
-        return self.users_repo.get_by_id(user_id)
+        return await self.users_repo.get_by_id(user_id)
 
-    def register(self, register_data: RegisterForm) -> RegisterForm:
+    async def _issue_tokens(self, user_id, email: str, family_id: Optional[str] = None) -> TokenResponse:
+        """Issue a token pair whose refresh token is stored before it is handed out."""
+        jti = new_token_id()
+        tokens = issue_token_pair({"sub": str(user_id), "email": email}, jti=jti)
+        await refresh_store.add(jti, user_id, tokens.refresh_expires_at, family_id)
+        return TokenResponse(access_token=tokens.access_token, refresh_token=tokens.refresh_token)
+
+    async def register(self, register_data: RegisterForm) -> RegisterForm:
         """Register a new user and send OTP for verification."""
-        logger.info("Starting data processing...")
-        existing_user = self.users_repo.get_by_email(register_data.email)
-        if existing_user:
+        logger.log(LOG_REQUEST_LEVEL, "Starting data processing...")
+        # Cheap check first (mostly answered by the email index), so duplicate
+        # sign-ups never reach the hashing pool
+        if await self.users_repo.get_by_email(register_data.email):
             raise UserAlreadyExistsException()
+
+        hashed_password = await hash_password_async(register_data.password)
         
-        hashed_password = hash_password(register_data.password)
-        
-        new_user = User(
+        # RegisterForm already validated these fields
+        new_user = UserRecord(
+            id=None,
             email=register_data.email,
             firstname=register_data.firstname,
             lastname=register_data.lastname,
             password_hash=hashed_password,
             is_active=False,
+            created_at=datetime.now(timezone.utc),
         )
         
-        created_user = self.users_repo.insert(new_user) # returns user ID or None
-        if not created_user:
-            raise UserAlreadyExistsException()
-        
+        # One statement: skip on existing email (a concurrent sign-up), else create the user and its OTP
         activation_code = generate_one_time_password()
-        otp = OTP(
-            user_id=str(created_user),  # Placeholder for actual user ID after creation
+        created = await self.users_repo.register_with_otp(
+            new_user,
             code=str(activation_code),
-            email=register_data.email,
             purpose="registration",
             expires_at=datetime.now(timezone.utc) + timedelta(minutes=10),  # Set token expiry to 10 minutes
         )
-        
-        self.activation_code_repo.insert(otp)
+        if not created:
+            raise UserAlreadyExistsException()
 
-        send_email_one_time_password(register_data.email, otp)
+        send_email_one_time_password(register_data.email, activation_code)
         
         return OTPResponse(activation_code=activation_code)
     
-    def verify_registration(self, email: str, otp: int) -> TokenResponse:
+    @transactional
+    async def verify_registration(self, email: str, otp: int) -> TokenResponse:
         """Verify registration OTP and complete user registration."""
-        otp_record = self.activation_code_repo.get_by_email_and_purpose(email, "registration")
-
-        if not otp_record:
-            raise InvalidOTPException()
-        
-        # Access as dict
-        expires_at = otp_record['expires_at']
-        if expires_at.tzinfo is None:
-            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        # Consume a matching, unexpired OTP and activate its user in one statement
+        updated_user = await self.activation_code_repo.verify_and_activate(email, "registration", str(otp))
 
-        # Expiration check
-        if expires_at < datetime.now(timezone.utc):
-            raise OTPExpiredException()
-
-        # OTP match check
-        if str(otp_record['code']) != str(otp):
-            raise InvalidOTPException()
+        if not updated_user:
+            # Failure path only: look at the OTP to report why
+            otp_record = await self.activation_code_repo.get_by_email_and_purpose(email, "registration")
+            if not otp_record:
+                raise InvalidOTPException()
 
-        # Fetch user
-        user = self.users_repo.get_by_id(otp_record['user_id'])
-        if not user:
-            raise UserNotFoundException()
+            # Access as dict
+            expires_at = otp_record['expires_at']
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
 
-        # Delete OTP
-        self.activation_code_repo.delete_by_email_and_purpose(user['email'], "registration")
+            # Expiration check
+            if expires_at < datetime.now(timezone.utc):
+                raise OTPExpiredException()
 
-        # Update user is_active
-        updated_user = self.users_repo.update_user(
-            user_id=user['id'],
-            update_data={"is_active": True},
-            allow_is_active=True
-        )
+            raise InvalidOTPException()
 
-        if not updated_user:
-            raise Exception("Failed to activate user")  # safety check
+        # Drop any cached pre-activation copy of the user once the activation is
+        # visible; invalidating earlier lets a concurrent read re-cache the old row
+        user_id = updated_user.id
+        after_commit(lambda: user_cache.invalidate(user_id))
 
         # Generate tokens
-        access_token = create_access_token(data={"sub": str(updated_user.id), "email": updated_user.email})
-        refresh_token = create_refresh_token(data={"sub": str(updated_user.id), "email": updated_user.email})
-
-        return TokenResponse(access_token=access_token, refresh_token=refresh_token)
+        return await self._issue_tokens(updated_user.id, updated_user.email)
 
 
 
     
-    def login(self, login_data: LoginForm) -> TokenResponse:
+    async def login(self, login_data: LoginForm) -> TokenResponse:
         """Authenticate user and return tokens."""
-        user = self.users_repo.get_by_email(login_data.email)
+        user = await self.users_repo.get_by_email(login_data.email)
 
-        if not user or not verify_password(login_data.password, user.password_hash):
+        if not user or not await verify_password_async(login_data.password, user.password_hash):
             raise InvalidCredentialsException()
 
-        access_token = create_access_token(data={"sub": str(user.id), "email": user.email})
-        refresh_token = create_refresh_token(data={"sub": str(user.id), "email": user.email})
-
-        return TokenResponse(access_token=access_token, refresh_token=refresh_token)
+        if password_policy.needs_update(user.password_hash):
+            self._schedule_rehash(user, login_data.password)
+        return await self._issue_tokens(user.id, user.email)
+
+    def _schedule_rehash(self, user: UserRecord, password: str):
+        """Rehash an outdated password hash after the response; the request does not wait for it."""
+        # A fresh context: the task must not share the request's unit of work
+        task = asyncio.create_task(self._rehash(user, password), context=contextvars.Context())
+        self._rehashes.add(task)
+        task.add_done_callback(self._rehashes.discard)
+
+    async def _rehash(self, user: UserRecord, password: str):
+        try:
+            new_hash = await hash_password_async(password)
+            await self.users_repo.update_password_hash(user.id, user.password_hash, new_hash)
+            logger.debug("Rehashed password of user %s to the current policy.", user.id)
+        except Exception as e:
+            # Dropped when hashing is saturated or the DB is down; the next login tries again
+            logger.warning("Password rehash for user %s failed: %s", user.id, e)
 
     
-    def refresh_token(self, refresh_token: str) -> TokenResponse:
-        """Refresh access token using refresh token."""
+    async def refresh_token(self, refresh_token: str) -> TokenResponse:
+        """Rotate a refresh token: it is consumed and a new pair is issued in the same family."""
 
         payload = verify_token(refresh_token)
         if not payload or payload.get("type") != "refresh":
@@ -127,11 +142,36 @@ class AuthService:
         if not user_id_str or not email:
             raise InvalidTokenException()
 
-        user = self.get_user_by_id(user_id_str)
+        # Unknown, revoked or already rotated (reuse revokes the whole family)
+        rotated = await self._consume(refresh_token, payload)
+        if not rotated:
+            raise InvalidTokenException()
+        family_id, _ = rotated
+
+        user = await self.get_user_by_id(user_id_str)
         if not user:
             raise InvalidTokenException()
 
-        access_token = create_access_token(data={"sub": str(user['id']), "email": user['email']})
-        new_refresh_token = create_refresh_token(data={"sub": str(user['id']), "email": user['email']})
+        return await self._issue_tokens(user.id, user.email, family_id)
+
+    async def _consume(self, refresh_token: str, payload: dict) -> Optional[Tuple[str, int]]:
+        """Rotate the token in the refresh-token store, claiming it first if it predates jtis."""
+        if payload.get("jti"):
+            return await refresh_store.rotate(payload["jti"])
+        expires_at = datetime.fromtimestamp(payload["exp"], timezone.utc)
+        return await refresh_store.claim_legacy(legacy_token_id(refresh_token), payload["sub"], expires_at)
+
+    async def logout(self, refresh_token: str):
+        """Revoke the refresh token's family; access tokens already issued run until they expire."""
+        payload = verify_token(refresh_token)
+        if not payload or payload.get("type") != "refresh":
+            raise InvalidTokenException()
+        if payload.get("jti"):
+            await refresh_store.revoke(payload["jti"])
+        elif payload.get("sub"):
+            rotated = await self._consume(refresh_token, payload)
+            if rotated:
+                refresh_store.revoke_family(rotated[0])
+
 
-        return TokenResponse(access_token=access_token, refresh_token=new_refresh_token)
\ No newline at end of file
+auth_service = AuthService()
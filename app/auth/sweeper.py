@@ -0,0 +1,76 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+from app.auth.repository import OTPRepository
+from app.config import logger, OTP_SWEEP_BATCH_SIZE, OTP_SWEEP_INTERVAL
+from app.metrics import CallbackMetric
+
+
+class OTPSweeper:
+    """
+    Periodically deletes expired activations in bounded batches.
+
+    Each batch is one short DELETE ... WHERE id IN (SELECT ... LIMIT n), so
+    a backlog of abandoned registrations never turns into one long,
+    lock-heavy statement. Batches run back to back until one comes up
+    short, then the sweeper sleeps for `interval` seconds.
+    """
+
+    def __init__(self, interval: float = OTP_SWEEP_INTERVAL, batch_size: int = OTP_SWEEP_BATCH_SIZE):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.repo = OTPRepository()
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"sweeps": 0, "rows_purged": 0, "last_purged": 0, "last_duration_ms": 0.0, "errors": 0}
+
+    async def sweep_once(self) -> int:
+        started = time.perf_counter()
+        purged = 0
+        while True:
+            deleted = await self.repo.delete_expired(self.batch_size)
+            purged += deleted
+            if deleted < self.batch_size:
+                break
+        duration_ms = (time.perf_counter() - started) * 1000
+        self._stats["sweeps"] += 1
+        self._stats["rows_purged"] += purged
+        self._stats["last_purged"] = purged
+        self._stats["last_duration_ms"] = duration_ms
+        if purged:
+            logger.info("Purged %s expired activations in %.1f ms.", purged, duration_ms)
+        return purged
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep_once()
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.error("Expired OTP sweep failed: %s", e)
+
+    async def start(self):
+        if self.interval <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info("Expired OTP sweeper started (every %ss, batches of %s).", self.interval, self.batch_size)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._stats)
+
+
+otp_sweeper = OTPSweeper()
+
+CallbackMetric(
+    "otp_sweeper",
+    "Expired-OTP sweeper: sweeps, rows purged, errors and last sweep duration (ms).",
+    lambda: [((key,), value) for key, value in otp_sweeper.stats().items()],
+    ("stat",),
+)
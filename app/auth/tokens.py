@@ -0,0 +1,183 @@
+import base64
+import calendar
+import hashlib
+import hmac
+import json
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Sequence
+
+from jose import ExpiredSignatureError, JWTError, jwk, jwt
+
+from app.config import logger, ALGORITHM, SECRET_KEY, TOKEN_BACKEND
+
+_TIME_CLAIMS = ("exp", "iat", "nbf")
+
+
+class InvalidTokenError(Exception):
+    """Token is malformed, badly signed or carries invalid claims."""
+
+
+class ExpiredTokenError(InvalidTokenError):
+    """Token signature is valid but its exp is in the past."""
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+def _json(data: Dict[str, Any]) -> bytes:
+    return json.dumps(data, separators=(",", ":")).encode()
+
+
+def serialize_claims(claims: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn datetime exp/iat/nbf claims into NumericDate seconds, as python-jose does."""
+    out = dict(claims)
+    for claim in _TIME_CLAIMS:
+        if isinstance(out.get(claim), datetime):
+            out[claim] = calendar.timegm(out[claim].utctimetuple())
+    return out
+
+
+def validate_claims(claims: Dict[str, Any]):
+    """Apply the registered-claim checks python-jose runs on decode."""
+    now = calendar.timegm(time.gmtime())
+    exp = claims.get("exp")
+    if exp is not None:
+        if not isinstance(exp, (int, float)):
+            raise InvalidTokenError("Expiration Time claim (exp) must be an integer.")
+        if exp < now:
+            raise ExpiredTokenError("Signature has expired.")
+    nbf = claims.get("nbf")
+    if nbf is not None:
+        if not isinstance(nbf, (int, float)):
+            raise InvalidTokenError("Not Before claim (nbf) must be an integer.")
+        if nbf > now:
+            raise InvalidTokenError("The token is not yet valid (nbf)")
+    if "sub" in claims and not isinstance(claims["sub"], str):
+        raise InvalidTokenError("Subject must be a string.")
+
+
+def unverified_claims(token: str) -> Dict[str, Any]:
+    """Read a token's claims without checking its signature."""
+    try:
+        claims = json.loads(_b64decode(str(token).split(".")[1].encode("ascii")))
+    except (IndexError, ValueError, UnicodeError) as e:
+        raise InvalidTokenError(f"Error decoding token claims: {e}") from e
+    if not isinstance(claims, dict):
+        raise InvalidTokenError("Invalid payload string: must be a json object")
+    return claims
+
+
+class TokenCodec:
+    """Signs claims into a compact JWT and verifies them back."""
+
+    name = "base"
+
+    def encode(self, claims: Dict[str, Any]) -> str:
+        raise NotImplementedError
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def encode_batch(self, shared: Dict[str, Any], variants: Sequence[Dict[str, Any]]) -> List[str]:
+        """Encode one token per variant, each carrying the shared claims as well."""
+        return [self.encode({**shared, **variant}) for variant in variants]
+
+
+class JoseCodec(TokenCodec):
+    """python-jose backend; supports every algorithm jose does."""
+
+    name = "jose"
+
+    def __init__(self, secret: str = SECRET_KEY, algorithm: str = ALGORITHM):
+        self.algorithm = algorithm
+        self.key = jwk.construct(secret, algorithm)  # resolved once, not per call
+
+    def encode(self, claims: Dict[str, Any]) -> str:
+        return jwt.encode(claims, self.key, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        try:
+            return jwt.decode(str(token), self.key, algorithms=[self.algorithm])
+        except ExpiredSignatureError as e:
+            raise ExpiredTokenError(str(e)) from e
+        except JWTError as e:
+            raise InvalidTokenError(str(e)) from e
+
+
+class HMACCodec(TokenCodec):
+    """
+    HS256 on the stdlib. The header segment and the keyed HMAC state are
+    computed once; each token only costs one JSON dump and one digest.
+    """
+
+    name = "hmac"
+
+    def __init__(self, secret: str = SECRET_KEY):
+        self._mac = hmac.new(secret.encode(), digestmod=hashlib.sha256)
+        self.header = _b64encode(_json({"alg": "HS256", "typ": "JWT"}))
+
+    def sign(self, signing_input: bytes) -> bytes:
+        mac = self._mac.copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+    def _sign_payload(self, payload: bytes) -> str:
+        signing_input = self.header + b"." + _b64encode(payload)
+        return (signing_input + b"." + _b64encode(self.sign(signing_input))).decode()
+
+    def encode(self, claims: Dict[str, Any]) -> str:
+        return self._sign_payload(_json(serialize_claims(claims)))
+
+    def encode_batch(self, shared: Dict[str, Any], variants: Sequence[Dict[str, Any]]) -> List[str]:
+        if any(key in shared for variant in variants for key in variant):
+            return super().encode_batch(shared, variants)
+        # Serialize the shared claims once and splice each variant's claims onto them
+        shared_json = _json(serialize_claims(shared))
+        tokens = []
+        for variant in variants:
+            variant_json = _json(serialize_claims(variant))
+            if shared_json == b"{}":
+                payload = variant_json
+            elif variant_json == b"{}":
+                payload = shared_json
+            else:
+                payload = shared_json[:-1] + b"," + variant_json[1:]
+            tokens.append(self._sign_payload(payload))
+        return tokens
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        try:
+            signing_input, _, signature = str(token).encode("ascii").rpartition(b".")
+            header, _, payload = signing_input.partition(b".")
+            if not header or not payload or not signature:
+                raise InvalidTokenError("Not enough segments")
+            if header != self.header and json.loads(_b64decode(header)).get("alg") != "HS256":
+                raise InvalidTokenError("The specified alg value is not allowed")
+            if not hmac.compare_digest(_b64decode(signature), self.sign(signing_input)):
+                raise InvalidTokenError("Signature verification failed.")
+            claims = json.loads(_b64decode(payload))
+        except (ValueError, UnicodeError, AttributeError) as e:
+            raise InvalidTokenError(f"Error decoding token: {e}") from e
+        if not isinstance(claims, dict):
+            raise InvalidTokenError("Invalid payload string: must be a json object")
+        validate_claims(claims)
+        return claims
+
+
+BACKENDS = {"jose": JoseCodec, "hmac": HMACCodec}
+
+
+def get_codec(backend: str = TOKEN_BACKEND) -> TokenCodec:
+    """Build the configured codec; HS256 is the only algorithm the hmac backend signs."""
+    if backend == "hmac" and ALGORITHM != "HS256":
+        logger.warning("TOKEN_BACKEND=hmac only supports HS256; using jose for %s.", ALGORITHM)
+        backend = "jose"
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown TOKEN_BACKEND {backend!r}; expected one of {sorted(BACKENDS)}")
+    return BACKENDS[backend]()
@@ -1,22 +1,46 @@
 from datetime import datetime, timedelta, timezone
+import hashlib
 import random
-from typing import Optional
-from passlib.hash import pbkdf2_sha256
-from jose import ExpiredSignatureError, JWTError, jwt
+import time
+from typing import NamedTuple, Optional
+from app.auth.hashing import hasher
+from app.auth.passwords import context_for, password_policy
+from app.auth.tokens import ExpiredTokenError, InvalidTokenError, get_codec, unverified_claims
+from app.cache import TTLCache
+from app.mailer import build_message, mailer
+from app.metrics import jwt_seconds, register_cache
+from app.config import logger as service_logger, LOG_REQUEST_LEVEL, ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS, TOKEN_CACHE_SIZE
 
-from app.config import logger, ACCESS_TOKEN_EXPIRE_MINUTES, ALGORITHM, REFRESH_TOKEN_EXPIRE_DAYS, SECRET_KEY
+logger = service_logger.getChild("tokens")
+
+# JWT signer/verifier for the configured TOKEN_BACKEND, keys resolved once at import
+codec = get_codec()
+
+# Verified token payloads and revoked tokens, keyed by token digest and kept until the token's exp
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=0, name="tokens")
+revoked_tokens = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=0, name="revoked_tokens")
+register_cache(token_cache)
 
 def generate_one_time_password(length: int = 4) -> int:
     """Generate a random OTP code."""
     return random.randrange(10 ** (length - 1), 10 ** length)
 
-def hash_password(password: str) -> str:
-    """Hash a password using bcrypt."""
-    return pbkdf2_sha256.hash(password)
+def hash_password(password: str, policy: Optional[str] = None) -> str:
+    """Hash a password with the password policy's current scheme and rounds."""
+    return context_for(policy).hash(password)
+
+def verify_password(plain_password: str, hashed_password: str, policy: Optional[str] = None) -> bool:
+    """Verify a password against a hash of any scheme the policy accepts."""
+    return context_for(policy).verify(plain_password, hashed_password)
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the hashing executor without blocking the event loop."""
+    # Workers may be other processes: send the (possibly calibrated) policy along
+    return await hasher.run(hash_password, password, password_policy.config)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against its hash."""
-    return pbkdf2_sha256.verify(plain_password, hashed_password)
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the hashing executor without blocking the event loop."""
+    return await hasher.run(verify_password, plain_password, hashed_password, password_policy.config)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token."""
@@ -28,11 +52,12 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     
     to_encode.update({"exp": expire, "type": "access"})
     try:
-        encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-        logger.info("Access token created successfully.")
+        with jwt_seconds.labels("encode").time():
+            encoded_jwt = codec.encode(to_encode)
+        logger.log(LOG_REQUEST_LEVEL, "Access token created successfully.")
         return encoded_jwt
     except Exception as e:
-        logger.error(f"Failed to create Access token: {e}")
+        logger.error("Failed to create Access token: %s", e)
         raise
 
 def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -45,30 +70,91 @@ def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None):
     
     to_encode.update({"exp": expire, "type": "refresh"})
     try:
-        encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-        logger.info("Refresh token created successfully.")
+        with jwt_seconds.labels("encode").time():
+            encoded_jwt = codec.encode(to_encode)
+        logger.log(LOG_REQUEST_LEVEL, "Refresh token created successfully.")
         return encoded_jwt
     except Exception as e:
-        logger.error(f"Failed to create refresh token: {e}")
+        logger.error("Failed to create refresh token: %s", e)
         raise
 
+class TokenPair(NamedTuple):
+    access_token: str
+    refresh_token: str
+    access_expires_at: datetime
+    refresh_expires_at: datetime
+
+def issue_token_pair(
+    data: dict,
+    access_expires_delta: Optional[timedelta] = None,
+    refresh_expires_delta: Optional[timedelta] = None,
+    jti: Optional[str] = None,
+) -> TokenPair:
+    """
+    Create an access and a refresh token for the same claims in one pass.
+    `jti` identifies the refresh token in the refresh-token store.
+    """
+    now = datetime.now(timezone.utc)
+    access_expire = now + (access_expires_delta or timedelta(minutes=float(ACCESS_TOKEN_EXPIRE_MINUTES)))
+    refresh_expire = now + (refresh_expires_delta or timedelta(days=float(REFRESH_TOKEN_EXPIRE_DAYS)))
+    refresh_claims = {"exp": refresh_expire, "type": "refresh"}
+    if jti:
+        refresh_claims["jti"] = jti
+    try:
+        with jwt_seconds.labels("encode_pair").time():
+            access_token, refresh_token = codec.encode_batch(
+                data,
+                [{"exp": access_expire, "type": "access"}, refresh_claims],
+            )
+        logger.log(LOG_REQUEST_LEVEL, "Token pair created successfully.")
+        return TokenPair(access_token, refresh_token, access_expire, refresh_expire)
+    except Exception as e:
+        logger.error("Failed to create token pair: %s", e)
+        raise
+
+def _token_digest(token: str) -> bytes:
+    return hashlib.sha256(str(token).encode()).digest()
+
+def revoke_token(token: str):
+    """Drop a token from the verified cache and reject it until it would have expired anyway."""
+    digest = _token_digest(token)
+    token_cache.invalidate(digest)
+    try:
+        exp = unverified_claims(token).get("exp")
+    except InvalidTokenError:
+        return  # not a token we could have issued
+    if isinstance(exp, (int, float)) and exp > time.time():
+        revoked_tokens.set(digest, True, ttl=exp - time.time())
+
 def verify_token(token: str):
-    """Verify and decode a JWT token."""
+    """Verify and decode a JWT token, reusing the payload of a token already verified."""
+    digest = _token_digest(token)
+    if digest in revoked_tokens:
+        logger.error("JWT Error: Token has been revoked")
+        return None
+    cached = token_cache.get(digest)
+    if cached is not None:
+        return dict(cached)
     try:
-        payload = jwt.decode(str(token), SECRET_KEY, algorithms=[ALGORITHM])
-        logger.info("JWT verified successfully.")
-        return payload
-    except ExpiredSignatureError:
+        with jwt_seconds.labels("decode").time():
+            payload = codec.decode(token)
+        logger.log(LOG_REQUEST_LEVEL, "JWT verified successfully.")
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)) and exp > time.time():
+            token_cache.set(digest, payload, ttl=exp - time.time())
+        return dict(payload)
+    except ExpiredTokenError:
         logger.error("JWT Error: Expired Signature Error")
         return None
-    except JWTError as e:
-        logger.error(f"JWT Error: Invalid Token - {e}")
+    except InvalidTokenError as e:
+        logger.error("JWT Error: Invalid Token - %s", e)
         return None
     
 def send_email_one_time_password(email: str, otp: int):
-    """Send OTP via email. This is a placeholder - implement with your email service."""
-    # TODO: Implement actual email sending logic
-    print(f"Sending OTP {otp} to {email}")
-    logger.info("Send OTP via email....Sending OTP {otp} to {email}")
-    # In production, use services like SendGrid, AWS SES, or SMTP
-    pass
\ No newline at end of file
+    """Queue the OTP email for background delivery; returns without waiting on SMTP."""
+    mailer.enqueue(build_message(
+        to=email,
+        subject="Your activation code",
+        body=f"Your activation code is {otp}. It expires in 10 minutes.",
+    ))
+    logger.log(LOG_REQUEST_LEVEL, "Queued OTP email to %s", email)
@@ -0,0 +1,53 @@
+import hashlib
+import math
+
+
+class BloomFilter:
+    """
+    Set membership with no false negatives and a bounded false-positive rate.
+
+    Sized for `capacity` items at `error_rate`; past capacity it keeps
+    working but the false-positive rate climbs (see `estimated_fp_rate`).
+    The k bit positions come from one blake2b digest by double hashing.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(int(capacity), 1)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def add(self, item: str):
+        bits = self._bits
+        added = False
+        for position in self._positions(item):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                added = True
+        # Re-adding a known item changes nothing and is not counted (nor is
+        # a new one that was already a false positive), so count is approximate
+        if added:
+            self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self._bits)
+
+    def estimated_fp_rate(self) -> float:
+        """Expected false-positive rate for the items added so far."""
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
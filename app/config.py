@@ -2,6 +2,8 @@ from dotenv import load_dotenv
 import os
 import logging
 
+from app.log import parse_level, parse_levels, setup_logging
+
 # Load environment variables from .env
 load_dotenv()
 
@@ -17,28 +19,107 @@ DB_NAME = os.getenv("POSTGRES_DB", "mydb")
 DB_USER = os.getenv("POSTGRES_USER", "admin")
 DB_PASSWORD = os.getenv("POSTGRES_PASSWORD", "admin")
 
+# Connection pool settings
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 2))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", 5))  # seconds to wait for a free connection
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", 300))  # close connections idle longer than this
+DB_POOL_HEALTH_CHECK_IDLE = float(os.getenv("DB_POOL_HEALTH_CHECK_IDLE", 30))  # ping connections idle longer than this
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", 10))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 256))  # prepared statements kept per connection
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", 200))  # log queries slower than this
+DB_QUERY_STATS_SIZE = int(os.getenv("DB_QUERY_STATS_SIZE", 1000))  # distinct query fingerprints tracked
+
+# Read replicas: comma-separated host[:port] of streaming replicas of the primary, same database and credentials
+DB_REPLICAS = [h.strip() for h in os.getenv("DB_REPLICAS", "").split(",") if h.strip()]
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", 5))  # seconds behind the primary before reads fall back to it
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", 5))  # seconds between replica lag checks
+
 
 # JWT Settings
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")  # Change this in production
 ALGORITHM =  os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30) 
 REFRESH_TOKEN_EXPIRE_DAYS = os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 7)
+TOKEN_BACKEND = os.getenv("TOKEN_BACKEND", "hmac")  # "hmac" (stdlib HS256) or "jose"
 
+# Admin access: comma-separated emails allowed on admin endpoints
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
 
-# Logger Configuration
-logger = logging.getLogger("service_logger")
-logger.setLevel(logging.INFO)  # Change to DEBUG for more details
+# Authenticated-user cache
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 60))  # seconds
+
+# Verified-token cache
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 50000))
+
+# Refresh-token store
+REFRESH_STORE_SIZE = int(os.getenv("REFRESH_STORE_SIZE", 1000000))  # refresh tokens kept in memory per worker
+REFRESH_STORE_FLUSH_INTERVAL = float(os.getenv("REFRESH_STORE_FLUSH_INTERVAL", 1))  # seconds between write-behind flushes
+REFRESH_STORE_MAX_PENDING = int(os.getenv("REFRESH_STORE_MAX_PENDING", 100000))  # queued writes kept for retry while flushes fail
+REFRESH_SWEEP_INTERVAL = float(os.getenv("REFRESH_SWEEP_INTERVAL", 300))  # seconds between purges of expired tokens, 0 disables
+REFRESH_SWEEP_BATCH_SIZE = int(os.getenv("REFRESH_SWEEP_BATCH_SIZE", 1000))  # rows deleted per statement
+
+# Expired-OTP sweeper
+OTP_SWEEP_INTERVAL = float(os.getenv("OTP_SWEEP_INTERVAL", 300))  # seconds between sweeps, 0 disables
+OTP_SWEEP_BATCH_SIZE = int(os.getenv("OTP_SWEEP_BATCH_SIZE", 1000))  # rows deleted per statement
 
-# Create console handler
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
+# Password hashing executor
+HASH_EXECUTOR = os.getenv("HASH_EXECUTOR", "process")  # "process" or "thread"
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", os.cpu_count() or 1))
+HASH_MAX_QUEUE = int(os.getenv("HASH_MAX_QUEUE", 64))  # waiting hashes before answering 503
+
+# Password hashing policy
+PASSWORD_SCHEMES = [s.strip() for s in os.getenv("PASSWORD_SCHEMES", "bcrypt_sha256,pbkdf2_sha256").split(",") if s.strip()]  # the first hashes new passwords; the others are verified and rehashed on login
+PASSWORD_ROUNDS = {scheme: int(rounds) for scheme, rounds in parse_levels(os.getenv("PASSWORD_ROUNDS", "")).items()}  # e.g. "bcrypt_sha256=12"; passlib's defaults otherwise
+PASSWORD_HASH_TARGET_MS = float(os.getenv("PASSWORD_HASH_TARGET_MS", 100))  # calibrate the first scheme's rounds to this at startup, 0 keeps PASSWORD_ROUNDS
+PASSWORD_REHASH_TOLERANCE = float(os.getenv("PASSWORD_REHASH_TOLERANCE", 2))  # rehash on login when a hash costs this many times more or less than the policy
+
+
+# Outbound mail
+SMTP_HOST = os.getenv("SMTP_HOST", "")  # empty: print emails to the console instead
+SMTP_PORT = int(os.getenv("SMTP_PORT", 25))
+SMTP_USER = os.getenv("SMTP_USER", "")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "false").lower() == "true"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", 10))
+MAIL_FROM = os.getenv("MAIL_FROM", "no-reply@localhost")
+MAIL_CONCURRENCY = int(os.getenv("MAIL_CONCURRENCY", 2))  # parallel SMTP connections
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", 20))  # messages sent per connection
+MAIL_MAX_RETRIES = int(os.getenv("MAIL_MAX_RETRIES", 5))
+MAIL_RETRY_BACKOFF = float(os.getenv("MAIL_RETRY_BACKOFF", 1))  # seconds, doubled per retry
+MAIL_QUEUE_SIZE = int(os.getenv("MAIL_QUEUE_SIZE", 10000))
+MAIL_SPOOL_DIR = os.getenv("MAIL_SPOOL_DIR", "")  # empty: no spill-to-disk
+
+# Email existence index
+EMAIL_FILTER_CAPACITY = int(os.getenv("EMAIL_FILTER_CAPACITY", 1000000))  # emails the Bloom filter is sized for (at least 2x the table)
+EMAIL_FILTER_ERROR_RATE = float(os.getenv("EMAIL_FILTER_ERROR_RATE", 0.01))  # target false-positive rate
+EMAIL_NEGATIVE_TTL = float(os.getenv("EMAIL_NEGATIVE_TTL", 30))  # seconds a confirmed-absent email is remembered
+EMAIL_INDEX_REFRESH = float(os.getenv("EMAIL_INDEX_REFRESH", 30))  # seconds between catch-ups from users.id
+
+# Login rate limiting
+LOGIN_RATE_WINDOW = float(os.getenv("LOGIN_RATE_WINDOW", 60))  # seconds
+LOGIN_RATE_LIMIT_IP = int(os.getenv("LOGIN_RATE_LIMIT_IP", 30))  # attempts per window per client IP, 0 disables
+LOGIN_RATE_LIMIT_EMAIL = int(os.getenv("LOGIN_RATE_LIMIT_EMAIL", 5))  # attempts per window per email, 0 disables
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # "memory" (per worker) or "redis" (shared)
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+RATE_LIMIT_SWEEP_INTERVAL = float(os.getenv("RATE_LIMIT_SWEEP_INTERVAL", 60))  # seconds between evictions of idle keys
+
+# Logger Configuration
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")  # Change to DEBUG for more details
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # "json" or "text"
+LOG_LEVELS = parse_levels(os.getenv("LOG_LEVELS", ""))  # per-logger levels, e.g. "service_logger.db=WARNING"
+LOG_SAMPLE_RATES = {name: float(rate) for name, rate in parse_levels(os.getenv("LOG_SAMPLE_RATES", "")).items()}  # e.g. "service_logger.tokens=0.01"
+LOG_REQUEST_LEVEL = parse_level(os.getenv("LOG_REQUEST_LEVEL", "INFO"))  # DEBUG in production
 
-# Define log format
-formatter = logging.Formatter(
-    "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+logger = setup_logging(
+    "service_logger",
+    level=LOG_LEVEL,
+    fmt=LOG_FORMAT,
+    levels=LOG_LEVELS,
+    sample_rates=LOG_SAMPLE_RATES,
 )
-console_handler.setFormatter(formatter)
 
-# Avoid duplicate handlers if re-imported
-if not logger.handlers:
-    logger.addHandler(console_handler)
\ No newline at end of file
+if LOG_REQUEST_LEVEL is None:
+    logger.warning("Unknown LOG_REQUEST_LEVEL %r; logging request messages at INFO.", os.getenv("LOG_REQUEST_LEVEL"))
+    LOG_REQUEST_LEVEL = logging.INFO
@@ -0,0 +1,37 @@
+from typing import Annotated, AsyncIterator
+
+from fastapi import Depends, Request, Response
+from fastapi.routing import APIRoute
+
+from app.repository import UnitOfWork, db
+
+
+async def get_unit_of_work(request: Request) -> AsyncIterator[UnitOfWork]:
+    """The request's unit of work; its pooled connection is acquired on the first query."""
+    async with UnitOfWork(db) as uow:
+        request.state.unit_of_work = uow
+        yield uow
+
+
+class UnitOfWorkRoute(APIRoute):
+    """
+    Releases the request's connection as soon as the handler returns.
+    Exit code of dependencies with yield only runs once the response has
+    been sent, which would hold the connection through a streamed body.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            try:
+                return await handler(request)
+            finally:
+                uow = getattr(request.state, "unit_of_work", None)
+                if uow is not None:
+                    await uow.release()
+
+        return route_handler
+
+
+UnitOfWorkDep = Annotated[UnitOfWork, Depends(get_unit_of_work)]
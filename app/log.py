@@ -0,0 +1,163 @@
+"""
+Non-blocking, structured logging for the service.
+
+Loggers only put records on an in-memory queue; a QueueListener thread
+formats them (JSON by default) and writes them out, so neither string
+formatting nor stream I/O runs on the event loop. Messages use lazy
+%-style arguments, which are never rendered when the level is disabled.
+
+High-frequency success messages can be sampled per logger
+(LOG_SAMPLE_RATES=service_logger.tokens=0.01 keeps one in a hundred
+below WARNING), and request-path messages are logged at LOG_REQUEST_LEVEL
+so production can demote them to DEBUG.
+"""
+import atexit
+import json
+import logging
+import queue
+import threading
+from datetime import datetime, timezone
+from itertools import count
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+# Attributes every LogRecord has; anything else was passed through `extra=`.
+_RESERVED = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """Parse "name=value,name=value" into a dict, skipping blanks."""
+    pairs = (item.split("=", 1) for item in spec.split(",") if "=" in item)
+    return {name.strip(): value.strip() for name, value in pairs if name.strip()}
+
+
+def parse_level(name: str) -> Optional[int]:
+    """A level number from a name ("DEBUG") or a number ("15"); None if neither."""
+    name = str(name).strip()
+    if name.isdigit():
+        return int(name)
+    # getLevelName maps unknown names to the string "Level NAME", not an error
+    level = logging.getLevelName(name.upper())
+    return level if isinstance(level, int) else None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra=` fields are included as keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep every Nth record below WARNING for the configured loggers.
+
+    Rates apply to a logger and its children (the longest configured
+    prefix wins). Counting instead of drawing random numbers keeps the
+    filter cheap and the output predictable.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = {name: float(rate) for name, rate in rates.items()}
+        self._every: Dict[str, int] = {}
+        self._counters: Dict[str, count] = {}
+        self.dropped = 0
+
+    def _every_for(self, name: str) -> int:
+        every = self._every.get(name)
+        if every is None:
+            rate, prefix = 1.0, name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            every = 0 if rate <= 0 else max(1, round(1 / rate))
+            self._every[name] = every
+        return every
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        every = self._every_for(record.name)
+        if every == 1:
+            return True
+        # next() on itertools.count is atomic under the GIL
+        counter = self._counters.setdefault(record.name, count())
+        if every and next(counter) % every == 0:
+            return True
+        self.dropped += 1
+        return False
+
+
+class _DeferredQueueHandler(QueueHandler):
+    # The stock prepare() renders the message on the calling thread; the
+    # queue is in-process, so hand the record over as-is and let the
+    # listener thread do all formatting. Arguments are rendered later, so
+    # pass values that the caller will not mutate afterwards.
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+_listener: Optional[QueueListener] = None
+_lock = threading.Lock()
+
+
+def setup_logging(
+    name: str = "service_logger",
+    level: str = "INFO",
+    fmt: str = "json",
+    levels: Optional[Dict[str, str]] = None,
+    sample_rates: Optional[Dict[str, float]] = None,
+    stream=None,
+) -> logging.Logger:
+    """Route `name` and its children through a background QueueListener."""
+    global _listener
+    logger = logging.getLogger(name)
+    logger.setLevel(level.upper())
+    for child, child_level in (levels or {}).items():
+        logging.getLogger(child).setLevel(child_level.upper())
+
+    with _lock:
+        # Avoid duplicate handlers if re-imported
+        if _listener is not None:
+            return logger
+
+        output = logging.StreamHandler(stream)
+        output.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+
+        records: queue.SimpleQueue = queue.SimpleQueue()
+        handler = _DeferredQueueHandler(records)
+        if sample_rates:
+            handler.addFilter(SamplingFilter(sample_rates))
+        logger.addHandler(handler)
+
+        _listener = QueueListener(records, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+    return logger
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
@@ -0,0 +1,232 @@
+import asyncio
+import email
+import os
+import smtplib
+import time
+import uuid
+from dataclasses import dataclass
+from email.message import EmailMessage
+from email.policy import default as default_policy
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.metrics import CallbackMetric
+from app.config import (
+    logger,
+    MAIL_BATCH_SIZE,
+    MAIL_CONCURRENCY,
+    MAIL_FROM,
+    MAIL_MAX_RETRIES,
+    MAIL_QUEUE_SIZE,
+    MAIL_RETRY_BACKOFF,
+    MAIL_SPOOL_DIR,
+    SMTP_HOST,
+    SMTP_PASSWORD,
+    SMTP_PORT,
+    SMTP_STARTTLS,
+    SMTP_TIMEOUT,
+    SMTP_USER,
+)
+
+
+def build_message(to: str, subject: str, body: str, sender: str = MAIL_FROM) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = sender
+    message["To"] = to
+    message["Subject"] = subject
+    message.set_content(body)
+    return message
+
+
+# Transports
+class ConsoleTransport:
+    """Development stand-in used when no SMTP_HOST is configured."""
+
+    def send_batch(self, messages: List[EmailMessage]) -> List[EmailMessage]:
+        for message in messages:
+            print(f"Sending email '{message['Subject']}' to {message['To']}")
+            logger.info("Email '%s' to %s written to console.", message['Subject'], message['To'])
+        return []
+
+
+class SMTPTransport:
+    """Delivers a batch of messages over a single SMTP connection."""
+
+    def __init__(self, host: str = SMTP_HOST, port: int = SMTP_PORT, user: str = SMTP_USER,
+                 password: str = SMTP_PASSWORD, starttls: bool = SMTP_STARTTLS, timeout: float = SMTP_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+
+    def send_batch(self, messages: List[EmailMessage]) -> List[EmailMessage]:
+        """Send messages in order; return the ones that were not delivered."""
+        sent = 0
+        try:
+            with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+                if self.starttls:
+                    smtp.starttls()
+                if self.user:
+                    smtp.login(self.user, self.password)
+                for message in messages:
+                    smtp.send_message(message)
+                    sent += 1
+        except (smtplib.SMTPException, OSError) as e:
+            logger.warning("SMTP delivery to %s:%s failed after %s/%s messages: %s", self.host, self.port, sent, len(messages), e)
+            return messages[sent:]
+        return []
+
+
+@dataclass
+class _Envelope:
+    message: EmailMessage
+    attempts: int = 0
+
+
+# Queue
+class MailQueue:
+    """
+    In-process outbound mail queue drained by background workers.
+
+    enqueue() never blocks the request: messages are picked up by
+    `concurrency` workers, each sending up to `batch_size` messages per
+    SMTP connection and retrying failures with exponential backoff. With
+    a spool directory configured, messages that do not fit in the queue,
+    exhaust their retries or are still pending at shutdown are written
+    there as .eml files and re-queued on the next start.
+    """
+
+    def __init__(
+        self,
+        transport=None,
+        concurrency: int = MAIL_CONCURRENCY,
+        batch_size: int = MAIL_BATCH_SIZE,
+        max_retries: int = MAIL_MAX_RETRIES,
+        retry_backoff: float = MAIL_RETRY_BACKOFF,
+        maxsize: int = MAIL_QUEUE_SIZE,
+        spool_dir: Optional[str] = MAIL_SPOOL_DIR,
+    ):
+        self.transport = transport or (SMTPTransport() if SMTP_HOST else ConsoleTransport())
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.spool_dir = Path(spool_dir) if spool_dir else None
+        self._queue: "asyncio.Queue[_Envelope]" = asyncio.Queue(maxsize=maxsize)
+        self._workers: List[asyncio.Task] = []
+        self._stats = {"queued": 0, "sent": 0, "retried": 0, "failed": 0, "spilled": 0}
+
+    def enqueue(self, message: EmailMessage):
+        """Queue a message for background delivery; returns immediately."""
+        self._put(_Envelope(message))
+
+    def _put(self, envelope: _Envelope):
+        try:
+            self._queue.put_nowait(envelope)
+            self._stats["queued"] += 1
+        except asyncio.QueueFull:
+            logger.warning("Mail queue is full.")
+            self._spill(envelope.message)
+
+    def _spill(self, message: EmailMessage):
+        if self.spool_dir is None:
+            self._stats["failed"] += 1
+            logger.error("Dropping email '%s' to %s: no MAIL_SPOOL_DIR configured.", message['Subject'], message['To'])
+            return
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        path = self.spool_dir / f"{time.time_ns()}-{uuid.uuid4().hex}.eml"
+        path.write_bytes(message.as_bytes())
+        self._stats["spilled"] += 1
+        logger.info("Spooled email '%s' to %s", message['Subject'], path)
+
+    def _load_spool(self):
+        if self.spool_dir is None or not self.spool_dir.exists():
+            return
+        for path in sorted(self.spool_dir.glob("*.eml")):
+            if self._queue.full():
+                break
+            # Workers share the spool: the rename decides which one sends it
+            claimed = path.with_name(f"{path.name}.{os.getpid()}-{uuid.uuid4().hex}.claimed")
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue
+            message = email.message_from_bytes(claimed.read_bytes(), policy=default_policy)
+            claimed.unlink()
+            self._put(_Envelope(message))
+            logger.info("Re-queued spooled email %s", path.name)
+
+    async def start(self):
+        if self._workers:
+            return
+        self._load_spool()
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.concurrency)]
+        logger.info("Mail queue started with %s workers.", self.concurrency)
+
+    async def stop(self, timeout: float = 5.0):
+        """Give workers `timeout` seconds to drain the queue, then spool what is left."""
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Mail queue not drained after %ss; spooling %s messages.", timeout, self._queue.qsize())
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        while not self._queue.empty():
+            self._spill(self._queue.get_nowait().message)
+            self._queue.task_done()
+
+    async def _next_batch(self) -> List[_Envelope]:
+        batch = [await self._queue.get()]
+        while len(batch) < self.batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _worker(self, index: int):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._deliver(batch)
+            except Exception as e:
+                logger.error("Mail worker %s failed to deliver a batch: %s", index, e)
+                for envelope in batch:
+                    self._spill(envelope.message)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _deliver(self, batch: List[_Envelope]):
+        pending = batch
+        while pending:
+            unsent = await asyncio.to_thread(self.transport.send_batch, [e.message for e in pending])
+            self._stats["sent"] += len(pending) - len(unsent)
+            if not unsent:
+                return
+            pending = pending[len(pending) - len(unsent):]
+            for envelope in pending:
+                envelope.attempts += 1
+            if pending[0].attempts > self.max_retries:
+                logger.error("Giving up on %s emails after %s retries.", len(pending), self.max_retries)
+                for envelope in pending:
+                    self._spill(envelope.message)
+                return
+            self._stats["retried"] += len(pending)
+            await asyncio.sleep(self.retry_backoff * 2 ** (pending[0].attempts - 1))
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "depth": self._queue.qsize(), "workers": len(self._workers)}
+
+
+mailer = MailQueue()
+
+CallbackMetric(
+    "mail_queue",
+    "Outbound mail: queue depth and messages queued, sent, retried, failed and spilled since start.",
+    lambda: [((key,), value) for key, value in mailer.stats().items() if key != "workers"],
+    ("state",),
+)
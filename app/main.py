@@ -1,27 +1,46 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
-import asyncpg
+from app.auth.dependencies import CurrentAdminUser
 from app.auth.router import router as auth_router
 from app.users.router import router as users_router
-from app.config import DB_HOST, DB_NAME, DB_PASSWORD, DB_PORT, DB_USER
+from app.repository import db
+from app.auth.hashing import hasher
+from app.auth.passwords import password_policy
+from app.auth.refresh_store import refresh_store
+from app.auth.sweeper import otp_sweeper
+from app.users.email_index import email_index
+from app.mailer import mailer
+from app.metrics import REGISTRY, MetricsMiddleware
+from app.responses import ORJSONResponse
 
+@asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Connect to the PostgreSQL database on startup."""
-    app.state.db = await asyncpg.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME
-    )
+    """Open the PostgreSQL connection pool on startup."""
+    await db.connect()
+    app.state.db = db
     print("Connected to PostgreSQL")
+    await db.replicas.start()
+    password_policy.calibrate()
+    hasher.start()
+    await mailer.start()
+    await otp_sweeper.start()
+    await email_index.start()
+    await refresh_store.start()
     
     yield  # Control is handed to the app
 
-    # Shutdown: close the connection
-    await app.state.db.close()
-    print("PostgreSQL connection closed")
+    # Shutdown: stop background tasks, flush queued mail and close the pool
+    await refresh_store.stop()
+    await email_index.stop()
+    await otp_sweeper.stop()
+    await mailer.stop()
+    hasher.shutdown()
+    await db.replicas.stop()
+    await db.close()
+    print("PostgreSQL connection pool closed")
 
 
 app = FastAPI(
@@ -29,6 +48,7 @@ app = FastAPI(
     description="User registration Management System with Authentication",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # Add CORS middleware
@@ -40,6 +60,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Record per-route latency for /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(auth_router)
 app.include_router(users_router)
@@ -57,6 +80,21 @@ async def health_check():
     """Health check endpoint."""
     return {"status": "healthy"}
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/admin/queries")
+async def slowest_queries(admin: CurrentAdminUser, limit: int = Query(20, ge=1, le=500)):
+    """Query fingerprints with the highest total time in this worker, plus prepared statement reuse."""
+    return {
+        "slow_query_ms": db.slow_query_ms,
+        "queries": db.query_stats.top(limit),
+        "statements": db.statements.stats(),
+        "replicas": db.replicas.stats(),
+    }
+
 @app.get("/test-db")
 async def test_db_connection():
     """
@@ -64,7 +102,7 @@ async def test_db_connection():
     Returns a simple success message if the connection works.
     """
     try:
-        row = await app.state.db.fetchrow("SELECT NOW() AS current_time;")
+        row = await db.fetchOne("SELECT NOW() AS current_time;")
         return {
             "status": "success",
             "message": "Connection to PostgreSQL is working",
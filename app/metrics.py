@@ -0,0 +1,299 @@
+"""
+Prometheus-compatible metrics with a cheap hot path.
+
+Counters and histograms keep one shard of plain floats per thread, so
+recording a sample is a list increment with no lock; shards are summed
+only when /metrics is scraped. Values that already live elsewhere (pool
+size, cache hit ratios, queue depths) are read by callbacks at scrape
+time instead of being pushed on every change.
+
+Every uvicorn worker process exposes its own samples.
+"""
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Sharded:
+    """Per-thread float arrays, summed on read."""
+
+    def __init__(self, width: int):
+        self._width = width
+        self._local = threading.local()
+        self._shards: List[List[float]] = []
+        self._lock = threading.Lock()
+
+    def shard(self) -> List[float]:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = [0.0] * self._width
+            self._local.shard = shard
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def totals(self) -> List[float]:
+        totals = [0.0] * self._width
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for i, v in enumerate(shard):
+                totals[i] += v
+        return totals
+
+
+class _CounterChild(_Sharded):
+    def __init__(self):
+        super().__init__(1)
+
+    def inc(self, amount: float = 1.0):
+        self.shard()[0] += amount
+
+
+class _HistogramChild(_Sharded):
+    def __init__(self, bounds: Tuple[float, ...]):
+        # one slot per bucket, one for +Inf, one for the sum
+        super().__init__(len(bounds) + 2)
+        self._bounds = bounds
+
+    def observe(self, value: float):
+        shard = self.shard()
+        shard[bisect_left(self._bounds, value)] += 1
+        shard[-1] += value
+
+    def time(self) -> "_Timer":
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child: _HistogramChild):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+        return False
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry: Optional["Registry"] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, Any] = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: Any, **kwargs: Any):
+        key = tuple(str(kwargs[n]) for n in self.labelnames) if kwargs else tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def render(self) -> Iterable[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def render(self):
+        for key, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.totals()[0])}"
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS, registry=None):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def render(self):
+        for key, child in list(self._children.items()):
+            totals = child.totals()
+            cumulative = 0.0
+            for bound, count in zip(self.bounds + (float("inf"),), totals[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(cumulative)}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(totals[-1])}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {_format_value(cumulative)}"
+
+
+class CallbackMetric(Metric):
+    """A gauge (or counter) whose samples are read from `callback` at scrape time."""
+
+    def __init__(self, name, documentation, callback: Callable[[], Iterable[Tuple[Sequence[Any], float]]],
+                 labelnames=(), type: str = "gauge", registry=None):
+        self.callback = callback
+        self.type = type
+        super().__init__(name, documentation, labelnames, registry)
+
+    def render(self):
+        for values, value in self.callback():
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def unregister(self, name: str):
+        self._metrics.pop(name, None)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            try:
+                samples = list(metric.render())
+            except Exception as e:  # a broken callback must not take the scrape down
+                samples = []
+                lines.append(f"# {metric.name} collection failed: {e}")
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# Application metrics
+http_request_seconds = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status")
+)
+db_method_seconds = Histogram(
+    "db_repository_method_duration_seconds", "Repository method latency, including pool wait.", ("method",)
+)
+password_hash_seconds = Histogram(
+    "password_hash_duration_seconds", "Password hashing latency, including executor queueing.", ("operation",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+jwt_seconds = Histogram(
+    "jwt_duration_seconds", "JWT encode/decode latency.", ("operation",),
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005),
+)
+
+
+_caches: Dict[str, Any] = {}
+
+
+def _cache_samples(key: str):
+    return lambda: [((name,), cache.stats()[key]) for name, cache in list(_caches.items())]
+
+
+CallbackMetric("cache_hits_total", "Cache lookups served from the cache.", _cache_samples("hits"), ("cache",), type="counter")
+CallbackMetric("cache_misses_total", "Cache lookups that missed.", _cache_samples("misses"), ("cache",), type="counter")
+CallbackMetric("cache_entries", "Entries currently held.", _cache_samples("size"), ("cache",))
+CallbackMetric("cache_hit_ratio", "Hits over lookups since start.", _cache_samples("hit_ratio"), ("cache",))
+
+
+def register_cache(cache):
+    """Expose a TTLCache's hits, misses, size and hit ratio under its name."""
+    _caches[cache.name] = cache
+
+
+def timed(histogram_child):
+    """Decorator timing a coroutine function into a histogram child."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                histogram_child.observe(time.perf_counter() - start)
+        wrapper.__wrapped_metric__ = True
+        return wrapper
+    return decorator
+
+
+def instrument_methods(cls):
+    """Time every public coroutine method defined on cls into db_method_seconds."""
+    for name, attr in list(vars(cls).items()):
+        if name.startswith("_") or not inspect.iscoroutinefunction(attr) or getattr(attr, "__wrapped_metric__", False):
+            continue
+        setattr(cls, name, timed(db_method_seconds.labels(method=f"{cls.__name__}.{name}"))(attr))
+    return cls
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            http_request_seconds.labels(scope["method"], path, status["code"]).observe(time.perf_counter() - start)
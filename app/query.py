@@ -0,0 +1,185 @@
+import re
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+from app.config import logger
+
+# SQL builders
+#
+# Each builder is memoized on its shape (table, column set, operation), so the
+# SQL text for a given shape is built once and is byte-for-byte identical on
+# every call. That identical text is what lets the statement cache below hand
+# back the same server-side prepared statement.
+
+def _where(columns: Tuple[str, ...], start: int = 1, extra: Optional[str] = None) -> str:
+    conditions = [f"{col}=${i}" for i, col in enumerate(columns, start=start)]
+    if extra:
+        conditions.append(extra)
+    return f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+@lru_cache(maxsize=None)
+def select_sql(
+    table: str,
+    where: Tuple[str, ...] = (),
+    columns: Tuple[str, ...] = ("*",),
+    extra: Optional[str] = None,
+    order_by: Optional[str] = None,
+    limit: Optional[Union[int, str]] = None,
+) -> str:
+    """limit is either a fixed row count or a parameter placeholder such as "$2"."""
+    query = f"SELECT {', '.join(columns)} FROM {table}{_where(where, extra=extra)}"
+    if order_by:
+        query += f" ORDER BY {order_by}"
+    if limit is not None:
+        query += f" LIMIT {limit if isinstance(limit, str) else int(limit)}"
+    return query
+
+@lru_cache(maxsize=None)
+def insert_sql(table: str, columns: Tuple[str, ...], returning: Optional[str] = "id") -> str:
+    placeholders = ", ".join(f"${i}" for i in range(1, len(columns) + 1))
+    query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+    if returning:
+        query += f" RETURNING {returning}"
+    return query
+
+@lru_cache(maxsize=None)
+def update_sql(
+    table: str,
+    columns: Tuple[str, ...],
+    where: Tuple[str, ...] = ("id",),
+    returning: Optional[str] = None,
+) -> str:
+    set_clause = ", ".join(f"{col}=${i}" for i, col in enumerate(columns, start=1))
+    query = f"UPDATE {table} SET {set_clause}{_where(where, start=len(columns) + 1)}"
+    if returning:
+        query += f" RETURNING {returning}"
+    return query
+
+@lru_cache(maxsize=None)
+def delete_sql(table: str, where: Tuple[str, ...], extra: Optional[str] = None) -> str:
+    return f"DELETE FROM {table}{_where(where, extra=extra)}"
+
+# The current time as a naive UTC TIMESTAMP. Bare NOW() is a timestamptz, and
+# comparing it with our columns converts through the session TimeZone.
+UTC_NOW = "(NOW() AT TIME ZONE 'UTC')"
+
+def to_db(value: Any) -> Any:
+    """Adapt a Python value for asyncpg; our columns are naive UTC TIMESTAMPs."""
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def params(values: Iterable[Any]) -> Tuple[Any, ...]:
+    return tuple(to_db(v) for v in values)
+
+
+# Statement cache
+class StatementCache:
+    """
+    Bookkeeping for the prepared statements held by each pooled connection.
+
+    asyncpg already keeps an LRU of named prepared statements per physical
+    connection, keyed by SQL text, and it survives pool releases (unlike a
+    PreparedStatement object, which is bound to one acquire). The Database
+    sizes that cache via DB_STATEMENT_CACHE_SIZE and disables its expiry;
+    this class records which statements each backend pid has already
+    prepared, so we can report per-statement prepare (miss) and reuse (hit)
+    counts under a stable name. It mirrors that LRU, `max_per_connection`
+    statements per pid, so statements asyncpg evicted count as prepares again.
+    """
+
+    def __init__(self, max_per_connection: int = 256):
+        self.max_per_connection = max_per_connection
+        self._names: Dict[str, str] = {}
+        self._prepared: Dict[int, "OrderedDict[str, None]"] = defaultdict(OrderedDict)
+        self._hits: Dict[str, int] = defaultdict(int)
+        self._prepares: Dict[str, int] = defaultdict(int)
+
+    def name_for(self, query: str) -> str:
+        name = self._names.get(query)
+        if name is None:
+            name = f"stmt_{len(self._names) + 1}"
+            self._names[query] = name
+        return name
+
+    def record(self, pid: int, query: str) -> bool:
+        """Record one execution of query on connection pid; True if it was a reuse."""
+        name = self.name_for(query)
+        prepared = self._prepared[pid]
+        if query in prepared:
+            prepared.move_to_end(query)
+            self._hits[name] += 1
+            return True
+        if self.max_per_connection > 0:
+            prepared[query] = None
+            if len(prepared) > self.max_per_connection:
+                prepared.popitem(last=False)
+        self._prepares[name] += 1
+        logger.debug("Preparing statement %s on connection pid=%s", name, pid)
+        return False
+
+    def discard(self, pid: int, query: Optional[str] = None):
+        """Forget what a connection has prepared (or one of its statements)."""
+        if query is None:
+            self._prepared.pop(pid, None)
+        else:
+            self._prepared.get(pid, {}).pop(query, None)
+
+    def clear(self):
+        self._prepared.clear()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-statement prepare (miss) and reuse (hit) counts."""
+        return {
+            name: {"query": query, "prepares": self._prepares[name], "hits": self._hits[name]}
+            for query, name in self._names.items()
+        }
+
+
+# Query fingerprints and timing
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+@lru_cache(maxsize=4096)
+def fingerprint(query: str) -> str:
+    """Normalize a query: literals become ?, IN lists collapse, whitespace is squeezed."""
+    normalized = _STRING_LITERAL.sub("?", query)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _IN_LIST.sub("(?)", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+class QueryStats:
+    """Running totals per query fingerprint, bounded to `max_fingerprints` entries."""
+
+    def __init__(self, max_fingerprints: int = 1000):
+        self.max_fingerprints = max_fingerprints
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def record(self, query: str, duration_ms: float, rows: int) -> str:
+        key = fingerprint(query)
+        entry = self._stats.get(key)
+        if entry is None:
+            if len(self._stats) >= self.max_fingerprints:
+                # Make room by forgetting the cheapest fingerprint
+                del self._stats[min(self._stats, key=lambda k: self._stats[k]["total_ms"])]
+            entry = self._stats[key] = {"calls": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0}
+        entry["calls"] += 1
+        entry["total_ms"] += duration_ms
+        entry["max_ms"] = max(entry["max_ms"], duration_ms)
+        entry["rows"] += rows
+        return key
+
+    def top(self, n: int = 20) -> List[Dict[str, Any]]:
+        """The n fingerprints with the highest total time."""
+        ranked = sorted(self._stats.items(), key=lambda item: item[1]["total_ms"], reverse=True)[:n]
+        return [
+            {"query": key, **entry, "mean_ms": entry["total_ms"] / entry["calls"]}
+            for key, entry in ranked
+        ]
+
+    def clear(self):
+        self._stats.clear()
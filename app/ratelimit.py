@@ -0,0 +1,134 @@
+"""
+Sliding-window rate limiting.
+
+Each key keeps two fixed-window counters (the current and the previous
+window); the sliding count is the current one plus the previous one
+weighted by how much of it still overlaps the sliding window. That is
+within a few percent of an exact log of timestamps, at a constant few
+numbers per key.
+
+MemoryBackend limits each worker on its own; RedisBackend shares the
+counters between workers and hosts.
+"""
+import math
+import time
+from typing import Dict, Optional, Tuple
+
+from app.config import logger
+
+
+def _retry_after(limit: int, window: float, elapsed: float, previous: int, current: int) -> float:
+    """Seconds until the sliding count drops below `limit` again."""
+    if current >= limit or previous == 0:
+        return window - elapsed
+    # previous * (1 - t / window) + current < limit  <=>  t > window * (1 - (limit - current) / previous)
+    return max(window * (1 - (limit - current) / previous) - elapsed, 0.001)
+
+
+class MemoryBackend:
+    """Per-process counters; idle keys are evicted every `sweep_interval` seconds."""
+
+    def __init__(self, sweep_interval: float = 60.0):
+        self.sweep_interval = sweep_interval
+        self._windows: Dict[str, Tuple[int, int, int, float]] = {}  # key -> (window index, previous, current, window)
+        self._next_sweep = time.monotonic() + sweep_interval
+        self.evictions = 0
+
+    def _sweep(self, now: float):
+        # Keys with no hit in the last two windows count zero either way
+        stale = [key for key, (index, _, _, window) in self._windows.items() if (index + 2) * window <= now]
+        for key in stale:
+            del self._windows[key]
+        self.evictions += len(stale)
+        self._next_sweep = now + self.sweep_interval
+
+    async def hit(self, key: str, limit: int, window: float, now: Optional[float] = None) -> float:
+        """Count one hit; return 0 when allowed, else seconds to wait (the hit is not counted)."""
+        now = time.monotonic() if now is None else now
+        if now >= self._next_sweep:
+            self._sweep(now)
+
+        index = int(now // window)
+        stored, previous, current, _ = self._windows.get(key, (index, 0, 0, window))
+        if stored != index:
+            previous = current if stored == index - 1 else 0
+            current = 0
+
+        elapsed = now - index * window
+        if previous * (1 - elapsed / window) + current >= limit:
+            self._windows[key] = (index, previous, current, window)
+            return _retry_after(limit, window, elapsed, previous, current)
+
+        self._windows[key] = (index, previous, current + 1, window)
+        return 0.0
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+
+# KEYS[1] current window, KEYS[2] previous window; ARGV limit, window, elapsed
+_SLIDING_WINDOW_LUA = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local limit, window, elapsed = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+if previous * (1 - elapsed / window) + current >= limit then
+    return {previous, current, 0}
+end
+redis.call('INCR', KEYS[1])
+redis.call('PEXPIRE', KEYS[1], math.ceil(window * 2000))
+return {previous, current + 1, 1}
+"""
+
+
+class RedisBackend:
+    """Counters shared through Redis; each hit is one atomic script call."""
+
+    def __init__(self, url: str = "", prefix: str = "ratelimit:", client=None):
+        if client is None:
+            try:
+                from redis import asyncio as redis
+            except ImportError as e:
+                raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package (see requirements.txt).") from e
+            client = redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self._script = self.client.register_script(_SLIDING_WINDOW_LUA)
+
+    async def hit(self, key: str, limit: int, window: float, now: Optional[float] = None) -> float:
+        # Wall clock, so that every worker agrees on the window boundaries
+        now = time.time() if now is None else now
+        index = int(now // window)
+        elapsed = now - index * window
+        keys = [f"{self.prefix}{key}:{index}", f"{self.prefix}{key}:{index - 1}"]
+        previous, current, allowed = await self._script(keys=keys, args=[limit, window, elapsed])
+        if allowed:
+            return 0.0
+        return _retry_after(limit, window, elapsed, int(previous), int(current))
+
+
+class RateLimiter:
+    """A named limit of `limit` hits per `window` seconds, applied per key."""
+
+    def __init__(self, name: str, limit: int, window: float, backend):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.backend = backend
+        self.rejected = 0
+
+    async def hit(self, key: str) -> int:
+        """Count a hit for `key`; return 0 when allowed, else whole seconds to wait."""
+        if self.limit <= 0:
+            return 0
+        wait = await self.backend.hit(f"{self.name}:{key}", self.limit, self.window)
+        if not wait:
+            return 0
+        self.rejected += 1
+        logger.info("Rate limit %s exceeded for %s.", self.name, key)
+        return max(1, math.ceil(wait))
+
+
+def get_backend(kind: str, url: str = "", sweep_interval: float = 60.0):
+    if kind == "redis":
+        return RedisBackend(url)
+    return MemoryBackend(sweep_interval)
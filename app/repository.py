@@ -1,117 +1,596 @@
-from typing import List, Optional, TypeVar, Generic, Dict, Any
+import asyncio
+import functools
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Callable, List, Optional, Sequence, TypeVar, Generic, Dict, Any
 from pydantic import BaseModel
 from datetime import datetime, timezone
-from app.config import logger
+import asyncpg
+from app.config import (
+    logger as service_logger,
+    LOG_REQUEST_LEVEL,
+    DB_HOST,
+    DB_PORT,
+    DB_NAME,
+    DB_USER,
+    DB_PASSWORD,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_ACQUIRE_TIMEOUT,
+    DB_POOL_MAX_IDLE,
+    DB_POOL_HEALTH_CHECK_IDLE,
+    DB_COMMAND_TIMEOUT,
+    DB_STATEMENT_CACHE_SIZE,
+    DB_SLOW_QUERY_MS,
+    DB_QUERY_STATS_SIZE,
+    DB_REPLICAS,
+    DB_REPLICA_MAX_LAG,
+    DB_REPLICA_CHECK_INTERVAL,
+)
+from app.metrics import CallbackMetric, instrument_methods
+from app.query import QueryStats, StatementCache, delete_sql, insert_sql, params, select_sql, update_sql
+
+logger = service_logger.getChild("db")
 
 T = TypeVar("T")
 
+# Where the current repository call may read from: "primary", "replica", or
+# "replica-confirm" (a replica, re-checking misses on the primary)
+_route: ContextVar[str] = ContextVar("db_route", default="primary")
+# Set by the first write; later reads in the same request stay on the primary
+_wrote: ContextVar[bool] = ContextVar("db_wrote", default=False)
+# The current request's unit of work, if any
+_unit_of_work: ContextVar[Optional["UnitOfWork"]] = ContextVar("db_unit_of_work", default=None)
+
+
+def reads(method=None, *, confirm_miss: bool = False):
+    """
+    Tag a repository method as read-only so its queries may go to a replica.
+    With confirm_miss, a fetchOne that finds nothing on a replica is repeated
+    on the primary, for lookups of rows that may have only just been written.
+    """
+    def decorate(method):
+        route = "replica-confirm" if confirm_miss else "replica"
+
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs):
+            token = _route.set(route)
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                _route.reset(token)
+        return wrapper
+    return decorate(method) if method is not None else decorate
+
+
+def writes(method):
+    """Tag a repository method as writing; it and every later read in the request use the primary."""
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        _wrote.set(True)
+        token = _route.set("primary")
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            _route.reset(token)
+    return wrapper
+
+
+def transactional(method):
+    """Run a (service) method's queries in one transaction on the request's connection."""
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        async with db.transaction():
+            return await method(*args, **kwargs)
+    return wrapper
+
+
+def after_commit(callback: Callable[[], Any]):
+    """Call `callback` once the current transaction commits (not at all if it rolls back), or now outside one."""
+    uow = _unit_of_work.get()
+    if uow is not None and uow.in_transaction:
+        uow.after_commit(callback)
+    else:
+        callback()
+
+
 # Database
 class Database:
-    def __init__(self):
-        self.conn = None
+    def __init__(
+        self,
+        min_size: int = DB_POOL_MIN_SIZE,
+        max_size: int = DB_POOL_MAX_SIZE,
+        acquire_timeout: float = DB_POOL_ACQUIRE_TIMEOUT,
+        max_idle: float = DB_POOL_MAX_IDLE,
+        health_check_idle: float = DB_POOL_HEALTH_CHECK_IDLE,
+        slow_query_ms: float = DB_SLOW_QUERY_MS,
+        host: str = DB_HOST,
+        port: int = DB_PORT,
+        name: str = "primary",
+        replicas: Sequence["Database"] = (),
+    ):
+        self.pool: Optional[asyncpg.Pool] = None
+        self.host = host
+        self.port = port
+        self.name = name
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.max_idle = max_idle
+        self.health_check_idle = health_check_idle
+        # Last release time per backend pid, used to decide when to ping
+        self._last_used: Dict[int, float] = {}
+        self._lock: Optional[asyncio.Lock] = None
+        self.statements = StatementCache(DB_STATEMENT_CACHE_SIZE)
+        self.slow_query_ms = slow_query_ms
+        self.query_stats = QueryStats(DB_QUERY_STATS_SIZE)
+        self.replicas = ReplicaSet(replicas)
 
-    def connect(self):
-        if self.conn is None:
-            try:
-                import psycopg2
-                from psycopg2.extras import RealDictCursor
-                from app.config import DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD
-
-                self.conn = psycopg2.connect(
-                    host=DB_HOST,
-                    port=DB_PORT,
-                    database=DB_NAME,
-                    user=DB_USER,
-                    password=DB_PASSWORD
-                )
-                self.conn.autocommit = True
-                logger.info("Database connection established.")
-            except Exception as e:
-                logger.error(f"Failed to connect to DB: {e}")
-                raise
-        return self.conn
+    async def connect(self) -> asyncpg.Pool:
+        if self.pool is None:
+            if self._lock is None:
+                self._lock = asyncio.Lock()
+            async with self._lock:
+                if self.pool is None:
+                    try:
+                        self.pool = await asyncpg.create_pool(
+                            host=self.host,
+                            port=self.port,
+                            database=DB_NAME,
+                            user=DB_USER,
+                            password=DB_PASSWORD,
+                            min_size=self.min_size,
+                            max_size=self.max_size,
+                            max_inactive_connection_lifetime=self.max_idle,
+                            command_timeout=DB_COMMAND_TIMEOUT,
+                            statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+                            max_cached_statement_lifetime=0,  # keep plans for the connection's lifetime
+                            init=self._init_connection,
+                        )
+                        logger.info(
+                            "Database pool established (%s, min=%s, max=%s).", self.name, self.min_size, self.max_size
+                        )
+                    except Exception as e:
+                        logger.error("Failed to connect to DB (%s): %s", self.name, e)
+                        raise
+        return self.pool
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+            self._last_used.clear()
+            self.statements.clear()
+            logger.info("Database pool closed (%s).", self.name)
+
+    async def _init_connection(self, conn):
+        """A new physical connection starts with no prepared statements."""
+        self.statements.discard(conn.get_server_pid())
+        # The pool closes idle connections (DB_POOL_MAX_IDLE) without telling us
+        conn.add_termination_listener(self._forget_connection)
 
-    def execute(self, query: str):
-        conn = self.connect()
+    def _forget_connection(self, conn):
+        """Drop the bookkeeping kept per backend pid once its connection is gone."""
+        self._last_used.pop(conn.get_server_pid(), None)
+        self.statements.discard(conn.get_server_pid())
+
+    async def _is_healthy(self, conn) -> bool:
+        """Ping connections that sat idle long enough to have been dropped server-side."""
+        last_used = self._last_used.get(conn.get_server_pid())
+        if last_used is None or time.monotonic() - last_used < self.health_check_idle:
+            return True
+        try:
+            await conn.execute("SELECT 1", timeout=self.acquire_timeout)
+            return True
+        except Exception as e:
+            logger.warning("Discarding unhealthy pooled connection: %s", e)
+            self._forget_connection(conn)
+            conn.terminate()
+            return False
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[asyncpg.Connection]:
+        pool = await self.connect()
+        try:
+            conn = await pool.acquire(timeout=self.acquire_timeout)
+            if not await self._is_healthy(conn):
+                await pool.release(conn)
+                conn = await pool.acquire(timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            logger.error("Timed out after %ss waiting for a DB connection.", self.acquire_timeout)
+            raise
+        try:
+            yield conn
+        finally:
+            if conn.is_closed():
+                self._forget_connection(conn)
+            else:
+                self._last_used[conn.get_server_pid()] = time.monotonic()
+            await pool.release(conn)
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[asyncpg.Connection]:
+        """The request's shared connection inside a unit of work, otherwise one acquired for this block."""
+        uow = _unit_of_work.get()
+        if uow is not None and uow.db is self and not uow.closed:
+            async with uow.lock:
+                yield await uow.connection()
+        else:
+            async with self.acquire() as conn:
+                yield conn
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator["UnitOfWork"]:
+        """
+        Run the block's queries in one transaction, joining the current unit
+        of work or opening one for the block. Nothing is acquired or begun
+        until the first query.
+        """
+        uow = _unit_of_work.get()
+        if uow is not None and uow.db is self and not uow.closed:
+            async with uow.transaction():
+                yield uow
+        else:
+            async with UnitOfWork(self) as uow, uow.transaction():
+                yield uow
+
+    def pool_stats(self) -> Dict[str, int]:
+        if self.pool is None:
+            return {"size": 0, "idle": 0, "max": self.max_size}
+        return {"size": self.pool.get_size(), "idle": self.pool.get_idle_size(), "max": self.pool.get_max_size()}
+
+    def _record_timing(self, query: str, started: float, rows: int):
+        duration_ms = (time.perf_counter() - started) * 1000
+        key = self.query_stats.record(query, duration_ms, rows)
+        if duration_ms >= self.slow_query_ms:
+            logger.warning("Slow query (%.1f ms, %s rows): %s", duration_ms, rows, key)
+
+    async def execute(self, query: str, *args) -> str:
         try:
-            with conn.cursor() as cur:
-                cur.execute(query)
-                logger.debug(f"Executed query: {query}")
+            async with self.connection() as conn:
+                # asyncpg prepares (and caches) every fetch/fetchrow, but sends an
+                # execute() without arguments over the simple query protocol
+                if args:
+                    self.statements.record(conn.get_server_pid(), query)
+                started = time.perf_counter()
+                status = await conn.execute(query, *args)
+                last = status.rsplit(" ", 1)[-1] if status else ""
+                self._record_timing(query, started, int(last) if last.isdigit() else 0)
+                logger.debug("Executed query: %s", query)
+                return status
         except Exception as e:
-            logger.error(f"DB Error executing query: {query} | Error: {e}")
+            logger.error("DB Error executing query: %s | Error: %s", query, e)
             raise
 
-    def fetchAll(self, query: str) -> List[Dict]:
-        conn = self.connect()
+    def _read_replica(self) -> Optional["Database"]:
+        """The replica to send the current read to, or None for the primary."""
+        if _route.get() == "primary" or _wrote.get():
+            return None
+        uow = _unit_of_work.get()
+        if uow is not None and uow.in_transaction:
+            return None
+        return self.replicas.pick()
+
+    async def fetchAll(self, query: str, *args) -> List[Dict]:
+        replica = self._read_replica()
+        if replica is not None:
+            try:
+                return await replica.fetchAll(query, *args)
+            except Exception as e:
+                self.replicas.mark_failed(replica, e)
         try:
-            from psycopg2.extras import RealDictCursor
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(query)
-                results = cur.fetchall()
-                logger.debug(f"Executed query: {query} | Fetched all: {results}")
+            async with self.connection() as conn:
+                self.statements.record(conn.get_server_pid(), query)
+                started = time.perf_counter()
+                results = [dict(row) for row in await conn.fetch(query, *args)]
+                self._record_timing(query, started, len(results))
+                logger.debug("Executed query: %s | Fetched all: %s", query, results)
                 return results
         except Exception as e:
-            logger.error(f"DB Error executing query: {query} | Error: {e}")
+            logger.error("DB Error executing query: %s | Error: %s", query, e)
             raise
 
-    def fetchOne(self, query: str) -> Optional[Dict]:
-        conn = self.connect()
+    async def fetchOne(self, query: str, *args) -> Optional[Dict]:
+        replica = self._read_replica()
+        if replica is not None:
+            try:
+                result = await replica.fetchOne(query, *args)
+                if result is not None or _route.get() != "replica-confirm":
+                    return result
+                self.replicas.misses += 1
+            except Exception as e:
+                self.replicas.mark_failed(replica, e)
         try:
-            from psycopg2.extras import RealDictCursor
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(query)
-                result = cur.fetchone()
-                logger.debug(f"Executed query: {query} | Fetched one: {result}")
+            async with self.connection() as conn:
+                self.statements.record(conn.get_server_pid(), query)
+                started = time.perf_counter()
+                row = await conn.fetchrow(query, *args)
+                self._record_timing(query, started, 0 if row is None else 1)
+                result = dict(row) if row is not None else None
+                logger.debug("Executed query: %s | Fetched one: %s", query, result)
                 return result
         except Exception as e:
-            logger.error(f"DB Error executing query: {query} | Error: {e}")
+            logger.error("DB Error executing query: %s | Error: %s", query, e)
             raise
 
-db = Database()
+
+class UnitOfWork:
+    """
+    One request's database work. The first query acquires a pooled
+    connection, which every repository call in the request then shares
+    until release(). Transactions begin lazily on that connection too; a
+    transaction block inside another joins it rather than nesting.
+    """
+
+    def __init__(self, database: Database):
+        self.db = database
+        self.conn: Optional[asyncpg.Connection] = None
+        self.closed = False
+        # Queries from concurrent tasks of one request take turns on the connection
+        self.lock = asyncio.Lock()
+        self._stack = AsyncExitStack()
+        self._depth = 0
+        self._tx = None
+        self._on_commit: List[Callable[[], Any]] = []
+        self._token = None
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._depth > 0
+
+    async def connection(self) -> asyncpg.Connection:
+        if self.closed:
+            raise RuntimeError("Unit of work already released")
+        if self.conn is None:
+            self.conn = await self._stack.enter_async_context(self.db.acquire())
+        if self._depth and self._tx is None:
+            self._tx = self.conn.transaction()
+            await self._tx.start()
+        return self.conn
+
+    def after_commit(self, callback: Callable[[], Any]):
+        """Run callback after the outermost transaction block commits; dropped on rollback."""
+        self._on_commit.append(callback)
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator["UnitOfWork"]:
+        """Commit the block's queries together, or roll them back if it raises."""
+        self._depth += 1
+        succeeded = False
+        try:
+            yield self
+            succeeded = True
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                callbacks, self._on_commit = self._on_commit, []
+                if self._tx is not None:
+                    tx, self._tx = self._tx, None
+                    await (tx.commit() if succeeded else tx.rollback())
+                if succeeded:
+                    for callback in callbacks:
+                        callback()
+
+    async def release(self):
+        """Return the connection to the pool; later queries acquire their own."""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            if self._tx is not None:
+                tx, self._tx = self._tx, None
+                await tx.rollback()
+        finally:
+            self.conn = None
+            await self._stack.aclose()
+
+    async def __aenter__(self) -> "UnitOfWork":
+        self._token = _unit_of_work.set(self)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        try:
+            await self.release()
+        finally:
+            _unit_of_work.reset(self._token)
+
+
+def _replica_address(address: str):
+    host, _, port = address.partition(":")
+    return host, int(port) if port else DB_PORT
+
+
+class ReplicaSet:
+    """
+    Read replicas of a primary, each with its own pool. A replica serves
+    reads only while its last lag check succeeded and showed it at most
+    `max_lag` seconds behind; otherwise reads go to the primary. A read that
+    fails on a replica is retried on the primary and takes the replica out
+    until the next check.
+    """
+
+    # 0 when every received WAL record is replayed, even if the primary has been idle
+    LAG_QUERY = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END AS lag
+    """
+
+    def __init__(
+        self,
+        databases: Sequence[Database],
+        max_lag: float = DB_REPLICA_MAX_LAG,
+        check_interval: float = DB_REPLICA_CHECK_INTERVAL,
+    ):
+        self.databases = list(databases)
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        # Seconds behind the primary per replica; None until checked, or when unreachable
+        self.lag: Dict[str, Optional[float]] = {replica.name: None for replica in self.databases}
+        self.available: List[Database] = []
+        self._next = 0
+        self._task: Optional[asyncio.Task] = None
+        self.reads = 0
+        self.misses = 0
+        self.errors = 0
+
+    def pick(self) -> Optional[Database]:
+        """Next available replica, round-robin; None sends the read to the primary."""
+        available = self.available
+        if not available:
+            return None
+        self._next = (self._next + 1) % len(available)
+        self.reads += 1
+        return available[self._next]
+
+    def mark_failed(self, replica: Database, error: Exception):
+        self.errors += 1
+        logger.warning("Read on replica %s failed, retrying on the primary: %s", replica.name, error)
+        self.lag[replica.name] = None
+        self._update()
+
+    def _update(self):
+        self.available = [
+            replica for replica in self.databases
+            if self.lag[replica.name] is not None and self.lag[replica.name] <= self.max_lag
+        ]
+
+    async def _check_one(self, replica: Database) -> Optional[float]:
+        try:
+            row = await asyncio.wait_for(replica.fetchOne(self.LAG_QUERY), replica.acquire_timeout)
+        except Exception as e:
+            logger.warning("Replica %s lag check failed: %s", replica.name, e)
+            return None
+        return float(row["lag"] or 0)
+
+    async def check(self):
+        """Measure every replica's lag and recompute which ones serve reads."""
+        lags = await asyncio.gather(*(self._check_one(replica) for replica in self.databases))
+        for replica, lag in zip(self.databases, lags):
+            if lag is not None and lag > self.max_lag:
+                logger.warning("Replica %s is %.1fs behind; reading from the primary.", replica.name, lag)
+            self.lag[replica.name] = lag
+        self._update()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.check()
+
+    async def start(self):
+        if not self.databases or self._task is not None:
+            return
+        await self.check()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for replica in self.databases:
+            await replica.close()
+        self.available = []
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "reads": self.reads,
+            "misses": self.misses,
+            "errors": self.errors,
+            "replicas": {
+                replica.name: {"lag_seconds": self.lag[replica.name], "available": replica in self.available}
+                for replica in self.databases
+            },
+        }
+
+
+db = Database(replicas=[
+    Database(host=host, port=port, name=f"replica-{host}:{port}")
+    for host, port in map(_replica_address, DB_REPLICAS)
+])
+
+def _pool_samples():
+    stats = db.pool_stats()
+    return [
+        (("in_use",), stats["size"] - stats["idle"]),
+        (("idle",), stats["idle"]),
+        (("max",), stats["max"]),
+    ]
+
+CallbackMetric("db_pool_connections", "Pooled connections by state.", _pool_samples, ("state",))
+
+def _replica_samples():
+    stats = db.replicas.stats()
+    samples = [(("all", key), stats[key]) for key in ("reads", "misses", "errors")]
+    for name, replica in stats["replicas"].items():
+        samples.append(((name, "available"), int(replica["available"])))
+        if replica["lag_seconds"] is not None:
+            samples.append(((name, "lag_seconds"), replica["lag_seconds"]))
+    return samples
+
+CallbackMetric(
+    "db_replicas",
+    "Read replicas: reads routed, misses confirmed on the primary, failed reads, availability and lag.",
+    _replica_samples,
+    ("replica", "stat"),
+)
 
 # Base Repository
 class BaseRepository(Generic[T]):
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        instrument_methods(cls)
+
     def __init__(self, table_name: str):
         self.table_name = table_name
 
-    def get_all(self) -> List[T]:
-        query = f"SELECT * FROM {self.table_name}"
-        logger.info(f"Fetching all rows from {self.table_name}")
-        results = db.fetchAll(query)
+    def _to_row(self, data: BaseModel) -> Dict[str, Any]:
+        """Column values for an insert; override to coerce model fields to column types."""
+        return data.model_dump(exclude_unset=True, exclude_none=True)
+
+    @reads
+    async def get_all(self) -> List[T]:
+        query = select_sql(self.table_name)
+        logger.log(LOG_REQUEST_LEVEL, "Fetching all rows from %s", self.table_name)
+        results = await db.fetchAll(query)
         return results if results else []
 
-    def get_by_id(self, entity_id) -> Optional[T]:
-        query = f"SELECT * FROM {self.table_name} WHERE id={entity_id}"
-        logger.info(f"Fetching from {self.table_name} where id={entity_id}")
-        return db.fetchOne(query)
+    @reads
+    async def get_by_id(self, entity_id) -> Optional[T]:
+        query = select_sql(self.table_name, ("id",))
+        logger.log(LOG_REQUEST_LEVEL, "Fetching from %s where id=%s", self.table_name, entity_id)
+        return await db.fetchOne(query, int(entity_id))
 
-    def insert(self, data: BaseModel) -> int:
-        data_dict = data.model_dump(exclude_unset=True, exclude_none=True)
+    @writes
+    async def insert(self, data: BaseModel) -> int:
+        data_dict = self._to_row(data)
         data_dict.setdefault("created_at", datetime.now(timezone.utc))
 
-        keys = ", ".join(data_dict.keys())
-        values = ", ".join([f"'{v}'" if not isinstance(v, (int, float)) else str(v) for v in data_dict.values()])
-
-        query = f"INSERT INTO {self.table_name} ({keys}) VALUES ({values}) RETURNING id"
-        logger.info(f"Inserting into {self.table_name}")
-        result = db.fetchOne(query)
+        query = insert_sql(self.table_name, tuple(data_dict))
+        logger.log(LOG_REQUEST_LEVEL, "Inserting into %s", self.table_name)
+        result = await db.fetchOne(query, *params(data_dict.values()))
         new_id = result["id"]
-        logger.info(f"Inserted new row with id={new_id}")
+        logger.log(LOG_REQUEST_LEVEL, "Inserted new row with id=%s", new_id)
         return new_id
 
-    def update(self, entity_id, data: Dict[str, Any]):
-        set_clause = ", ".join([f"{k}='{v}'" if not isinstance(v, (int, float)) else f"{k}={v}" for k, v in data.items()])
-        query = f"UPDATE {self.table_name} SET {set_clause} WHERE id={entity_id}"
-        logger.info(f"Updating {self.table_name} id={entity_id}")
-        db.execute(query)
-
-    def delete_by_id(self, entity_id):
-        query = f"DELETE FROM {self.table_name} WHERE id={entity_id}"
-        logger.info(f"Deleting from {self.table_name} id={entity_id}")
-        db.execute(query)
-
-    def delete(self, conditions: Dict[str, Any]):
-        where_clause = " AND ".join([f"{k}='{v}'" if not isinstance(v, (int, float)) else f"{k}={v}" for k, v in conditions.items()])
-        query = f"DELETE FROM {self.table_name} WHERE {where_clause}"
-        logger.info(f"Deleting from {self.table_name} where {conditions}")
-        db.execute(query)
+    @writes
+    async def update(self, entity_id, data: Dict[str, Any]):
+        query = update_sql(self.table_name, tuple(data))
+        logger.log(LOG_REQUEST_LEVEL, "Updating %s id=%s", self.table_name, entity_id)
+        await db.execute(query, *params(data.values()), int(entity_id))
+
+    @writes
+    async def delete_by_id(self, entity_id):
+        query = delete_sql(self.table_name, ("id",))
+        logger.log(LOG_REQUEST_LEVEL, "Deleting from %s id=%s", self.table_name, entity_id)
+        await db.execute(query, int(entity_id))
+
+    @writes
+    async def delete(self, conditions: Dict[str, Any]):
+        query = delete_sql(self.table_name, tuple(conditions))
+        logger.log(LOG_REQUEST_LEVEL, "Deleting from %s where %s", self.table_name, conditions)
+        await db.execute(query, *params(conditions.values()))
+
+instrument_methods(BaseRepository)
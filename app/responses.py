@@ -0,0 +1,44 @@
+"""
+Response classes that encode JSON once, in compiled code.
+
+FastAPI's default path for a route with a response_model validates the
+returned model again, dumps it to a dict, walks that through
+jsonable_encoder and finally runs stdlib json.dumps. Routes here instead
+return a ModelResponse, which FastAPI passes through untouched: the model
+is serialized straight to bytes by pydantic-core, and response_model is
+kept only for the OpenAPI schema. Anything still returned as plain data
+goes through the app's default response class, which uses orjson.
+"""
+from typing import Any, Mapping, Optional
+
+import orjson
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from starlette.responses import JSONResponse, Response
+
+
+class ORJSONResponse(JSONResponse):
+    """Default response class: plain data encoded with orjson."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ModelResponse(Response):
+    """
+    A Pydantic model serialized directly to JSON bytes.
+
+    Returning one from a route skips FastAPI's response_model validation and
+    jsonable_encoder, so build the model from data that is already trusted.
+    """
+
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        model: BaseModel,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        background: Optional[BackgroundTask] = None,
+    ):
+        super().__init__(model.__pydantic_serializer__.to_json(model), status_code, headers, background=background)
@@ -0,0 +1,90 @@
+import asyncio
+import os
+import threading
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+from unittest.mock import AsyncMock
+from fastapi import HTTPException
+
+from app.auth.hashing import PasswordHasher
+from app.auth.utils import hash_password, verify_password
+
+@pytest.fixture
+def thread_hasher():
+    hasher = PasswordHasher(kind="thread", workers=1, max_queue=1)
+    yield hasher
+    hasher.shutdown()
+
+@pytest.mark.asyncio
+async def test_hash_and_verify_on_thread_pool(thread_hasher):
+    hashed = await thread_hasher.run(hash_password, "mypassword123")
+    assert await thread_hasher.run(verify_password, "mypassword123", hashed) is True
+    assert await thread_hasher.run(verify_password, "wrongpassword", hashed) is False
+
+    stats = thread_hasher.stats()
+    assert stats["completed"] == 3
+    assert stats["in_flight"] == 0
+    assert stats["avg_latency_ms"] > 0
+
+@pytest.mark.asyncio
+async def test_hash_and_verify_on_process_pool():
+    hasher = PasswordHasher(kind="process", workers=1, max_queue=1)
+    try:
+        hashed = await hasher.run(hash_password, "mypassword123")
+        assert await hasher.run(verify_password, "mypassword123", hashed) is True
+    finally:
+        hasher.shutdown()
+
+@pytest.mark.asyncio
+async def test_broken_process_pool_is_restarted():
+    hasher = PasswordHasher(kind="process", workers=1, max_queue=1)
+    try:
+        # The worker dies, and dies again on the one retry
+        with pytest.raises(BrokenProcessPool):
+            await hasher.run(os._exit, 1)
+        assert hasher.stats()["restarts"] == 1
+
+        hashed = await hasher.run(hash_password, "mypassword123")
+        assert await hasher.run(verify_password, "mypassword123", hashed) is True
+        assert hasher.stats()["restarts"] == 2
+    finally:
+        hasher.shutdown()
+
+@pytest.mark.asyncio
+async def test_saturated_hasher_rejects_with_503(thread_hasher):
+    release = threading.Event()
+    blocked = [asyncio.create_task(thread_hasher.run(release.wait)) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    assert thread_hasher.stats()["queue_depth"] == 1
+    with pytest.raises(HTTPException) as exc:
+        await thread_hasher.run(hash_password, "mypassword123")
+    assert exc.value.status_code == 503
+    assert thread_hasher.stats()["rejected"] == 1
+
+    release.set()
+    await asyncio.gather(*blocked)
+
+# ---------------------------
+# Test AuthService.register
+# ---------------------------
+@pytest.mark.asyncio
+async def test_duplicate_email_is_rejected_before_hashing(monkeypatch):
+    from app.auth import service as module
+    from app.auth.exceptions import UserAlreadyExistsException
+    from app.auth.model import RegisterForm
+    from app.users.model import UserRecord
+
+    service = module.AuthService()
+    existing = UserRecord(id=1, email="a@example.com", firstname="Al", lastname="Ex")
+    monkeypatch.setattr(service.users_repo, "get_by_email", AsyncMock(return_value=existing))
+    hash_async = AsyncMock()
+    monkeypatch.setattr(module, "hash_password_async", hash_async)
+    register = AsyncMock()
+    monkeypatch.setattr(service.users_repo, "register_with_otp", register)
+
+    form = RegisterForm(email="a@example.com", firstname="Al", lastname="Ex", password="mypassword123")
+    with pytest.raises(UserAlreadyExistsException):
+        await service.register(form)
+    hash_async.assert_not_awaited()
+    register.assert_not_awaited()
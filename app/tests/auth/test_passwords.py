@@ -0,0 +1,102 @@
+import pytest
+from unittest.mock import AsyncMock
+from passlib.hash import bcrypt_sha256, pbkdf2_sha256
+
+from app.auth.passwords import PasswordPolicy, context_for
+from app.users.model import UserRecord
+
+def fast_policy(**kwargs):
+    return PasswordPolicy(schemes=["pbkdf2_sha256", "bcrypt_sha256"], rounds={"pbkdf2_sha256": 2000}, **kwargs)
+
+# ---------------------------
+# Test needs_update
+# ---------------------------
+def test_current_hash_is_up_to_date():
+    policy = fast_policy()
+    hashed = policy.hash("mypassword123")
+    assert policy.verify("mypassword123", hashed)
+    assert not policy.needs_update(hashed)
+
+def test_deprecated_scheme_needs_update():
+    policy = fast_policy()
+    hashed = bcrypt_sha256.using(rounds=4).hash("mypassword123")
+    assert policy.verify("mypassword123", hashed)
+    assert policy.needs_update(hashed)
+
+def test_rounds_outside_tolerance_need_update():
+    policy = fast_policy(tolerance=2)
+    assert not policy.needs_update(pbkdf2_sha256.using(rounds=1500).hash("pw"))
+    assert policy.needs_update(pbkdf2_sha256.using(rounds=900).hash("pw"))
+    assert policy.needs_update(pbkdf2_sha256.using(rounds=5000).hash("pw"))
+
+def test_unknown_hash_does_not_need_update():
+    assert not fast_policy().needs_update("$pbkdf2")
+    assert not fast_policy().needs_update(None)
+
+# ---------------------------
+# Test calibration
+# ---------------------------
+def test_calibrate_sets_rounds_near_target():
+    policy = fast_policy(target_ms=5)
+    rounds = policy.calibrate()
+
+    assert rounds >= 1000
+    assert policy.rounds["pbkdf2_sha256"] == rounds
+    assert policy.hash("pw").startswith(f"$pbkdf2-sha256${rounds}$")
+    assert f"pbkdf2_sha256__default_rounds = {rounds}" in policy.config
+
+def test_calibrate_disabled_keeps_configured_rounds():
+    policy = fast_policy(target_ms=0)
+    assert policy.calibrate() is None
+    assert policy.rounds == {"pbkdf2_sha256": 2000}
+
+def test_context_from_config_matches_policy():
+    policy = fast_policy()
+    hashed = context_for(policy.config).hash("pw")
+    assert hashed.startswith("$pbkdf2-sha256$2000$")
+    assert policy.verify("pw", hashed)
+
+# ---------------------------
+# Test rehash on login
+# ---------------------------
+@pytest.mark.asyncio
+async def test_login_rehashes_outdated_hash_in_background(monkeypatch):
+    from app.auth import service as module
+    from app.auth.model import LoginForm
+
+    service = module.AuthService()
+    old_hash = pbkdf2_sha256.using(rounds=29000).hash("mypassword123")
+    user = UserRecord(id=3, email="a@example.com", firstname="Al", lastname="Ex", password_hash=old_hash, is_active=True)
+    monkeypatch.setattr(module, "password_policy", fast_policy())
+    monkeypatch.setattr(module, "verify_password_async", AsyncMock(return_value=True))
+    monkeypatch.setattr(module, "hash_password_async", AsyncMock(return_value="new-hash"))
+    monkeypatch.setattr(service.users_repo, "get_by_email", AsyncMock(return_value=user))
+    monkeypatch.setattr(module.refresh_store.repo, "insert_many", AsyncMock(return_value=[]))
+    update = AsyncMock(return_value=True)
+    monkeypatch.setattr(service.users_repo, "update_password_hash", update)
+
+    tokens = await service.login(LoginForm(email="a@example.com", password="mypassword123"))
+    assert tokens.access_token
+    assert len(service._rehashes) == 1
+    update.assert_not_awaited()
+
+    for task in list(service._rehashes):
+        await task
+    update.assert_awaited_once_with(3, old_hash, "new-hash")
+
+@pytest.mark.asyncio
+async def test_login_with_current_hash_does_not_rehash(monkeypatch):
+    from app.auth import service as module
+    from app.auth.model import LoginForm
+
+    policy = fast_policy()
+    service = module.AuthService()
+    user = UserRecord(id=3, email="a@example.com", firstname="Al", lastname="Ex",
+                      password_hash=policy.hash("mypassword123"), is_active=True)
+    monkeypatch.setattr(module, "password_policy", policy)
+    monkeypatch.setattr(module, "verify_password_async", AsyncMock(return_value=True))
+    monkeypatch.setattr(service.users_repo, "get_by_email", AsyncMock(return_value=user))
+    monkeypatch.setattr(module.refresh_store.repo, "insert_many", AsyncMock(return_value=[]))
+
+    await service.login(LoginForm(email="a@example.com", password="mypassword123"))
+    assert not service._rehashes
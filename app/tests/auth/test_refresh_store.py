@@ -0,0 +1,221 @@
+import json
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock
+from app.auth.refresh_store import RefreshTokenStore, new_token_id
+
+def expires_in(days=7):
+    return datetime.now(timezone.utc) + timedelta(days=days)
+
+@pytest.fixture
+def store(monkeypatch):
+    store = RefreshTokenStore(maxsize=1000)
+    store.repo = AsyncMock()
+    store.repo.get_by_jti.return_value = None
+    store.repo.mark_used.return_value = []
+    store.repo.claim.return_value = True
+    return store
+
+# ---------------------------
+# Test rotation and reuse detection
+# ---------------------------
+@pytest.mark.asyncio
+async def test_issued_token_is_stored_before_it_is_returned(store):
+    jti = new_token_id()
+    family = await store.add(jti, 7, expires_in())
+
+    rows = store.repo.insert_many.await_args.args[0]
+    assert [row[:3] for row in rows] == [(jti, family, 7)]
+    assert store.stats()["pending"] == 0  # nothing left for the flush
+
+@pytest.mark.asyncio
+async def test_rotation_consumes_token_without_db(store):
+    jti = new_token_id()
+    family = await store.add(jti, 7, expires_in())
+
+    assert await store.rotate(jti) == (family, 7)
+    store.repo.get_by_jti.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_reuse_revokes_the_whole_family(store):
+    first, second = new_token_id(), new_token_id()
+    family = await store.add(first, 7, expires_in())
+    await store.rotate(first)
+    await store.add(second, 7, expires_in(), family)
+
+    assert await store.rotate(first) is None  # replayed
+    assert await store.rotate(second) is None  # the legitimate successor dies with it
+    assert family in store.revoked_families
+    assert store.stats()["reuse_detected"] == 1
+
+@pytest.mark.asyncio
+async def test_unknown_token_is_rejected(store):
+    assert await store.rotate(new_token_id()) is None
+    assert await store.rotate(None) is None
+
+@pytest.mark.asyncio
+async def test_memory_miss_loads_from_table_once(store):
+    jti = new_token_id()
+    store.repo.get_by_jti.return_value = {
+        "jti": jti, "family_id": "fam", "user_id": 3, "used_at": None, "revoked_at": None,
+        "expires_at": expires_in().replace(tzinfo=None),
+    }
+
+    assert await store.rotate(jti) == ("fam", 3)
+    assert await store.rotate(jti) is None  # now known to be used
+    store.repo.get_by_jti.assert_awaited_once_with(jti)
+
+@pytest.mark.asyncio
+async def test_legacy_token_is_claimed_once(store):
+    assert await store.claim_legacy("legacy", 7, expires_in()) is not None
+    family = store.repo.claim.await_args.args[1]
+
+    # Replayed: the claimed row is already used, so its family is revoked
+    store.tokens.clear()
+    store.repo.claim.return_value = False
+    store.repo.get_by_jti.return_value = {
+        "jti": "legacy", "family_id": family, "user_id": 7, "used_at": datetime.now(), "revoked_at": None,
+        "expires_at": expires_in().replace(tzinfo=None),
+    }
+    assert await store.claim_legacy("legacy", 7, expires_in()) is None
+    assert family in store.revoked_families
+
+@pytest.mark.asyncio
+async def test_logout_revokes_family(store):
+    jti = new_token_id()
+    await store.add(jti, 7, expires_in())
+    assert await store.revoke(jti) is True
+    assert await store.rotate(jti) is None
+
+# ---------------------------
+# Test write-behind flush
+# ---------------------------
+@pytest.mark.asyncio
+async def test_flush_writes_queued_changes_and_broadcasts(store, monkeypatch):
+    from app.auth import refresh_store as module
+    execute = AsyncMock()
+    monkeypatch.setattr(module.db, "execute", execute)
+    jti = new_token_id()
+    family = await store.add(jti, 7, expires_in())
+    await store.rotate(jti)
+    await store.revoke(jti)
+
+    store.repo.insert_many.reset_mock()
+    await store.flush()
+
+    store.repo.insert_many.assert_not_awaited()
+    assert store.repo.mark_used.await_args.args[0] == [jti]
+    assert store.repo.revoke_families.await_args.args[0] == [family]
+    payload = json.loads(execute.await_args.args[2])
+    assert payload == {"used": [jti], "revoked": [family]}
+    assert store.stats()["pending"] == 0
+
+@pytest.mark.asyncio
+async def test_flush_revokes_family_rotated_by_another_worker(store, monkeypatch):
+    from app.auth import refresh_store as module
+    monkeypatch.setattr(module.db, "execute", AsyncMock())
+    jti = new_token_id()
+    family = await store.add(jti, 7, expires_in())
+    await store.rotate(jti)
+    store.repo.mark_used.return_value = [{"jti": jti, "family_id": family}]
+
+    await store.flush()
+
+    assert family in store.revoked_families
+    assert store.repo.revoke_families.await_args.args[0] == [family]
+
+@pytest.mark.asyncio
+async def test_failed_flush_is_retried(store):
+    jti = new_token_id()
+    await store.add(jti, 7, expires_in())
+    await store.rotate(jti)
+    store.repo.mark_used.side_effect = ConnectionError("gone")
+
+    await store.flush()
+    assert store.stats()["pending"] == 1
+    assert store.stats()["flush_errors"] == 1
+
+@pytest.mark.asyncio
+async def test_retry_queue_keeps_only_the_newest_writes(store):
+    store.max_pending = 2
+    store.repo.mark_used.side_effect = ConnectionError("gone")
+    jtis = [new_token_id() for _ in range(3)]
+    for jti in jtis:
+        await store.add(jti, 7, expires_in())
+        await store.rotate(jti)
+
+    await store.flush()
+    assert store._used == jtis[1:]
+    assert store.stats()["flush_dropped"] == 1
+
+@pytest.mark.asyncio
+async def test_purge_deletes_batches_until_one_is_short(store):
+    store.sweep_batch_size = 100
+    store.repo.delete_expired.side_effect = [100, 100, 7]
+
+    assert await store.purge_expired() == 207
+    assert store.repo.delete_expired.await_count == 3
+    store.repo.delete_expired.assert_awaited_with(100)
+    assert store.stats()["expired_purged"] == 207
+
+@pytest.mark.asyncio
+async def test_notifications_from_other_workers_update_memory(store):
+    jti = new_token_id()
+    await store.add(jti, 7, expires_in())
+
+    store._on_notify(None, 1, "refresh_tokens", json.dumps({"used": [jti], "revoked": ["other"]}))
+    assert store.tokens.get(jti)[2] is True
+    assert "other" in store.revoked_families
+
+# ---------------------------
+# Test AuthService.refresh_token
+# ---------------------------
+@pytest.mark.asyncio
+async def test_refresh_rotates_and_rejects_replay(monkeypatch):
+    from app.auth import refresh_store as module
+    from app.auth.exceptions import InvalidTokenException
+    from app.auth.service import AuthService
+    from app.auth.utils import verify_token
+    from app.users.model import UserRecord
+
+    monkeypatch.setattr(module, "refresh_store", RefreshTokenStore(maxsize=100))
+    monkeypatch.setattr("app.auth.service.refresh_store", module.refresh_store)
+    module.refresh_store.repo = AsyncMock()
+    service = AuthService()
+    user = UserRecord(id=5, email="a@example.com", firstname="Al", lastname="Ex")
+    monkeypatch.setattr(service, "get_user_by_id", AsyncMock(return_value=user))
+
+    login = await service._issue_tokens(5, "a@example.com")
+    assert verify_token(login.refresh_token)["jti"]
+
+    rotated = await service.refresh_token(login.refresh_token)
+    assert rotated.refresh_token != login.refresh_token
+    with pytest.raises(InvalidTokenException):
+        await service.refresh_token(login.refresh_token)
+    # Reuse revoked the family, including the token issued by the rotation
+    with pytest.raises(InvalidTokenException):
+        await service.refresh_token(rotated.refresh_token)
+
+@pytest.mark.asyncio
+async def test_refresh_token_without_jti_is_accepted_once(monkeypatch):
+    from app.auth import refresh_store as module
+    from app.auth.exceptions import InvalidTokenException
+    from app.auth.service import AuthService
+    from app.auth.utils import create_refresh_token
+    from app.users.model import UserRecord
+
+    store = RefreshTokenStore(maxsize=100)
+    store.repo = AsyncMock()
+    store.repo.claim.side_effect = [True, False]
+    store.repo.get_by_jti.return_value = None
+    monkeypatch.setattr("app.auth.service.refresh_store", store)
+    service = AuthService()
+    user = UserRecord(id=5, email="a@example.com", firstname="Al", lastname="Ex")
+    monkeypatch.setattr(service, "get_user_by_id", AsyncMock(return_value=user))
+
+    # Issued before refresh tokens carried a jti
+    legacy = create_refresh_token({"sub": "5", "email": "a@example.com"})
+    assert (await service.refresh_token(legacy)).refresh_token
+    assert store.repo.claim.await_args.args[0] == module.legacy_token_id(legacy)
+    with pytest.raises(InvalidTokenException):
+        await service.refresh_token(legacy)
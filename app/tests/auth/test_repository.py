@@ -1,7 +1,8 @@
 import pytest
-from unittest.mock import MagicMock, ANY
+from unittest.mock import AsyncMock, ANY
 from datetime import datetime, timezone, timedelta
 from app.auth.repository import OTPRepository
+from app.query import UTC_NOW
 
 # Helper to create fake OTP dict
 def fake_otp_dict(user_id=1, email="test@example.com", purpose="activation", code="1234"):
@@ -19,7 +20,7 @@ def fake_otp_dict(user_id=1, email="test@example.com", purpose="activation", cod
 def mock_db_fetchOne(monkeypatch):
     """Patch Database.fetchOne to return controlled results"""
     from app.repository import db
-    mock_fetchOne = MagicMock()
+    mock_fetchOne = AsyncMock()
     monkeypatch.setattr(db, "fetchOne", mock_fetchOne)
     return mock_fetchOne
 
@@ -27,59 +28,149 @@ def mock_db_fetchOne(monkeypatch):
 def mock_db_execute(monkeypatch):
     """Patch Database.execute for deletes"""
     from app.repository import db
-    mock_execute = MagicMock()
+    mock_execute = AsyncMock()
     monkeypatch.setattr(db, "execute", mock_execute)
     return mock_execute
 
 # ---------------------------
 # Test get_by_user_and_code
 # ---------------------------
-def test_get_by_user_and_code_returns_result(mock_db_fetchOne):
+@pytest.mark.asyncio
+async def test_get_by_user_and_code_returns_result(mock_db_fetchOne):
     repo = OTPRepository()
     user_id = 1
     code = "123456"
     fake_otp = fake_otp_dict(user_id=user_id, code=code)
     mock_db_fetchOne.return_value = fake_otp
 
-    result = repo.get_by_user_and_code(user_id, code)
+    result = await repo.get_by_user_and_code(user_id, code)
     assert result == fake_otp
-    mock_db_fetchOne.assert_called_once_with(ANY)
+    mock_db_fetchOne.assert_awaited_once_with(ANY, user_id, code)
 
-def test_get_by_user_and_code_returns_none_if_no_result(mock_db_fetchOne):
+@pytest.mark.asyncio
+async def test_get_by_user_and_code_returns_none_if_no_result(mock_db_fetchOne):
     repo = OTPRepository()
     mock_db_fetchOne.return_value = None
 
-    result = repo.get_by_user_and_code(1, "wrongcode")
+    result = await repo.get_by_user_and_code(1, "wrongcode")
     assert result is None
-    mock_db_fetchOne.assert_called_once_with(ANY)
+    mock_db_fetchOne.assert_awaited_once_with(ANY, 1, "wrongcode")
 
 # ---------------------------
 # Test get_by_email_and_purpose
 # ---------------------------
-def test_get_by_email_and_purpose_returns_result(mock_db_fetchOne):
+@pytest.mark.asyncio
+async def test_get_by_email_and_purpose_returns_result(mock_db_fetchOne):
     repo = OTPRepository()
     otp_dict = fake_otp_dict(email="test@example.com", purpose="registration")
     mock_db_fetchOne.return_value = otp_dict
 
-    result = repo.get_by_email_and_purpose(otp_dict["email"], otp_dict["purpose"])
+    result = await repo.get_by_email_and_purpose(otp_dict["email"], otp_dict["purpose"])
     assert result == otp_dict
-    mock_db_fetchOne.assert_called_once_with(ANY)
+    mock_db_fetchOne.assert_awaited_once_with(ANY, otp_dict["email"], otp_dict["purpose"])
 
-def test_get_by_email_and_purpose_returns_none_if_no_result(mock_db_fetchOne):
+@pytest.mark.asyncio
+async def test_get_by_email_and_purpose_returns_none_if_no_result(mock_db_fetchOne):
     repo = OTPRepository()
     mock_db_fetchOne.return_value = None
 
-    result = repo.get_by_email_and_purpose("noone@example.com", "registration")
+    result = await repo.get_by_email_and_purpose("noone@example.com", "registration")
     assert result is None
-    mock_db_fetchOne.assert_called_once_with(ANY)
+    mock_db_fetchOne.assert_awaited_once_with(ANY, "noone@example.com", "registration")
 
 # ---------------------------
 # Test delete_by_email_and_purpose
 # ---------------------------
-def test_delete_by_email_and_purpose_calls_execute(mock_db_execute):
+@pytest.mark.asyncio
+async def test_delete_by_email_and_purpose_calls_execute(mock_db_execute):
     repo = OTPRepository()
     mock_db_execute.return_value = None
 
-    result = repo.delete_by_email_and_purpose("test@example.com", "registration")
+    result = await repo.delete_by_email_and_purpose("test@example.com", "registration")
     assert result is None
-    mock_db_execute.assert_called_once_with(ANY)
+    mock_db_execute.assert_awaited_once_with(ANY, "test@example.com", "registration")
+
+# ---------------------------
+# Test delete_expired
+# ---------------------------
+@pytest.mark.asyncio
+async def test_delete_expired_returns_deleted_row_count(mock_db_execute):
+    repo = OTPRepository()
+    mock_db_execute.return_value = "DELETE 17"
+
+    result = await repo.delete_expired(500)
+    assert result == 17
+    mock_db_execute.assert_awaited_once_with(ANY, 500)
+    assert f"expires_at < {UTC_NOW}" in mock_db_execute.await_args.args[0]
+
+# ---------------------------
+# Test verify_and_activate
+# ---------------------------
+@pytest.mark.asyncio
+async def test_verify_and_activate_returns_activated_user(mock_db_fetchOne):
+    from app.users.model import UserRecord
+    repo = OTPRepository()
+    mock_db_fetchOne.return_value = {
+        "id": 3,
+        "email": "test@example.com",
+        "firstname": "John",
+        "lastname": "Doe",
+        "password_hash": "hashed_pw",
+        "is_active": True,
+        "created_at": datetime.now(timezone.utc),
+    }
+
+    user = await repo.verify_and_activate("test@example.com", "registration", 1234)
+    assert isinstance(user, UserRecord)
+    assert user.id == 3
+    assert user.is_active is True
+    mock_db_fetchOne.assert_awaited_once_with(ANY, "test@example.com", "registration", "1234")
+
+@pytest.mark.asyncio
+async def test_verify_and_activate_returns_none_without_matching_otp(mock_db_fetchOne):
+    repo = OTPRepository()
+    mock_db_fetchOne.return_value = None
+
+    assert await repo.verify_and_activate("test@example.com", "registration", "0000") is None
+
+@pytest.mark.asyncio
+async def test_verify_and_activate_propagates_database_errors(mock_db_fetchOne):
+    repo = OTPRepository()
+    mock_db_fetchOne.side_effect = ConnectionError("server closed the connection")
+
+    with pytest.raises(ConnectionError):
+        await repo.verify_and_activate("test@example.com", "registration", "1234")
+
+@pytest.mark.asyncio
+async def test_otp_expiry_is_compared_in_utc(mock_db_fetchOne):
+    repo = OTPRepository()
+    mock_db_fetchOne.return_value = None
+
+    await repo.verify_and_activate("test@example.com", "registration", "0000")
+    await repo.get_by_user_and_code(1, "0000")
+    for call in mock_db_fetchOne.await_args_list:
+        query = call.args[0]
+        assert f"expires_at > {UTC_NOW}" in query
+        assert "> NOW()" not in query
+
+@pytest.mark.asyncio
+async def test_refresh_token_delete_expired_handles_missing_status(mock_db_execute):
+    from app.auth.repository import RefreshTokenRepository
+    mock_db_execute.return_value = None
+
+    assert await RefreshTokenRepository().delete_expired(100) == 0
+
+@pytest.mark.asyncio
+async def test_refresh_token_insert_skips_rows_of_deleted_users(monkeypatch):
+    from app.auth.repository import RefreshTokenRepository
+    from app.repository import db
+    fetch_all = AsyncMock(return_value=[{"jti": "a"}])
+    monkeypatch.setattr(db, "fetchAll", fetch_all)
+    now = datetime.now(timezone.utc)
+
+    inserted = await RefreshTokenRepository().insert_many([("a", "f", 1, now, now), ("b", "f", 2, now, now)])
+    assert inserted == ["a"]
+    query, jtis, families, user_ids, expires, created = fetch_all.await_args.args
+    assert "WHERE EXISTS" in query and "ON CONFLICT (jti) DO NOTHING" in query
+    assert jtis == ["a", "b"] and user_ids == [1, 2]
+    assert expires[0].tzinfo is None
@@ -0,0 +1,46 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+
+from app.auth.sweeper import OTPSweeper
+
+@pytest.mark.asyncio
+async def test_sweep_deletes_batches_until_one_comes_up_short():
+    sweeper = OTPSweeper(interval=60, batch_size=100)
+    sweeper.repo.delete_expired = AsyncMock(side_effect=[100, 100, 42])
+
+    purged = await sweeper.sweep_once()
+    assert purged == 242
+    assert sweeper.repo.delete_expired.await_count == 3
+    sweeper.repo.delete_expired.assert_awaited_with(100)
+
+    stats = sweeper.stats()
+    assert stats["sweeps"] == 1
+    assert stats["rows_purged"] == 242
+    assert stats["last_purged"] == 242
+
+@pytest.mark.asyncio
+async def test_background_task_runs_on_interval_and_survives_errors():
+    sweeper = OTPSweeper(interval=0.01, batch_size=100)
+    results = [ConnectionError("db down"), 3]
+
+    async def delete_expired(limit):
+        result = results.pop(0) if results else 0
+        if isinstance(result, Exception):
+            raise result
+        return result
+    sweeper.repo.delete_expired = delete_expired
+
+    await sweeper.start()
+    await asyncio.sleep(0.1)
+    await sweeper.stop()
+
+    stats = sweeper.stats()
+    assert stats["errors"] == 1
+    assert stats["rows_purged"] == 3
+
+@pytest.mark.asyncio
+async def test_zero_interval_disables_sweeper():
+    sweeper = OTPSweeper(interval=0)
+    await sweeper.start()
+    assert sweeper._task is None
@@ -0,0 +1,79 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from jose import jwt
+
+from app.auth.tokens import ExpiredTokenError, HMACCodec, InvalidTokenError, JoseCodec, get_codec
+from app.config import SECRET_KEY
+
+def claims(**overrides):
+    data = {
+        "sub": "1",
+        "email": "test@example.com",
+        "type": "access",
+        "exp": datetime.now(timezone.utc) + timedelta(minutes=5),
+    }
+    data.update(overrides)
+    return data
+
+@pytest.mark.parametrize("signer, verifier", [
+    (HMACCodec(), JoseCodec()),
+    (JoseCodec(), HMACCodec()),
+    (HMACCodec(), HMACCodec()),
+])
+def test_backends_are_interchangeable(signer, verifier):
+    payload = verifier.decode(signer.encode(claims()))
+    assert payload["sub"] == "1"
+    assert payload["email"] == "test@example.com"
+    assert payload["type"] == "access"
+    assert isinstance(payload["exp"], int)
+
+def test_hmac_tokens_match_python_jose():
+    data = claims()
+    assert HMACCodec().encode(data) == jwt.encode(data, SECRET_KEY, algorithm="HS256")
+
+@pytest.mark.parametrize("codec", [HMACCodec(), JoseCodec()])
+def test_expired_token_raises_expired(codec):
+    token = codec.encode(claims(exp=datetime.now(timezone.utc) - timedelta(seconds=5)))
+    with pytest.raises(ExpiredTokenError):
+        codec.decode(token)
+
+@pytest.mark.parametrize("codec", [HMACCodec(), JoseCodec()])
+def test_tampered_token_raises_invalid(codec):
+    header, payload, signature = codec.encode(claims()).split(".")
+    forged = HMACCodec("another-secret").encode(claims(sub="2")).split(".")[1]
+    with pytest.raises(InvalidTokenError):
+        codec.decode(f"{header}.{forged}.{signature}")
+
+def test_hmac_rejects_other_algorithms_and_garbage():
+    codec = HMACCodec()
+    hs512_token = jwt.encode(claims(), SECRET_KEY, algorithm="HS512")
+    for token in (hs512_token, "invalid.token.string", "", "a.b"):
+        with pytest.raises(InvalidTokenError):
+            codec.decode(token)
+
+def test_hmac_validates_registered_claims():
+    codec = HMACCodec()
+    with pytest.raises(InvalidTokenError):
+        codec.decode(codec.encode(claims(sub=1)))
+    with pytest.raises(InvalidTokenError):
+        codec.decode(codec.encode(claims(nbf=datetime.now(timezone.utc) + timedelta(minutes=1))))
+
+def test_get_codec_rejects_unknown_backend():
+    assert get_codec("jose").name == "jose"
+    with pytest.raises(ValueError):
+        get_codec("rsa")
+
+@pytest.mark.parametrize("codec", [HMACCodec(), JoseCodec()])
+def test_encode_batch_matches_individual_encodes(codec):
+    shared = {"sub": "1", "email": "test@example.com"}
+    exp = datetime.now(timezone.utc) + timedelta(minutes=5)
+    variants = [{"exp": exp, "type": "access"}, {"exp": exp, "type": "refresh"}, {}]
+
+    tokens = codec.encode_batch(shared, variants)
+    assert tokens == [codec.encode({**shared, **variant}) for variant in variants]
+
+def test_encode_batch_lets_variants_override_shared_claims():
+    codec = HMACCodec()
+    access, refresh = codec.encode_batch({"sub": "1", "type": "access"}, [{}, {"type": "refresh"}])
+    assert codec.decode(access)["type"] == "access"
+    assert codec.decode(refresh)["type"] == "refresh"
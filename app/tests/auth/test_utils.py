@@ -49,7 +49,48 @@ def test_expired_token_returns_none():
 def test_invalid_token_returns_none():
     assert verify_token("invalid.token.string") is None
 
-def test_send_email_otp(capsys):
+def test_send_email_otp_is_queued(monkeypatch):
+    from app.auth import utils
+    queued = []
+    monkeypatch.setattr(utils.mailer, "enqueue", queued.append)
+
     send_email_one_time_password("test@example.com", 1234)
-    captured = capsys.readouterr()
-    assert "Sending OTP 1234 to test@example.com" in captured.out
+    assert len(queued) == 1
+    assert queued[0]["To"] == "test@example.com"
+    assert "1234" in queued[0].get_content()
+
+def test_verify_token_reuses_verified_payload(monkeypatch):
+    from app.auth import utils
+    token = create_access_token({"sub": "1"})
+    assert verify_token(token)["sub"] == "1"
+
+    def fail_decode(*args, **kwargs):
+        raise AssertionError("token should be served from the cache")
+    monkeypatch.setattr(utils.codec, "decode", fail_decode)
+
+    payload = verify_token(token)
+    assert payload["sub"] == "1"
+    payload["sub"] = "2"  # callers get a copy
+    assert verify_token(token)["sub"] == "1"
+
+def test_revoked_token_is_rejected():
+    from app.auth.utils import revoke_token
+    token = create_refresh_token({"sub": "1"})
+    assert verify_token(token) is not None
+
+    revoke_token(token)
+    assert verify_token(token) is None
+
+def test_issue_token_pair_returns_both_tokens_and_expiries():
+    from app.auth.utils import issue_token_pair
+    pair = issue_token_pair({"sub": "7", "email": "pair@example.com"})
+
+    access = verify_token(pair.access_token)
+    refresh = verify_token(pair.refresh_token)
+    assert access["type"] == "access"
+    assert refresh["type"] == "refresh"
+    assert access["sub"] == refresh["sub"] == "7"
+    assert access["email"] == refresh["email"] == "pair@example.com"
+    assert access["exp"] == int(pair.access_expires_at.timestamp())
+    assert refresh["exp"] == int(pair.refresh_expires_at.timestamp())
+    assert pair.access_expires_at < pair.refresh_expires_at
@@ -0,0 +1,70 @@
+import asyncio
+import email
+from email.policy import default as default_policy
+from typing import List
+
+
+class SMTPSink:
+    """
+    Minimal local SMTP server that stores every message it receives.
+
+    Enough of the protocol for smtplib: HELO/EHLO, MAIL, RCPT, DATA, RSET,
+    NOOP and QUIT. `reject_connections` makes the first N connections get
+    a 421 greeting, to exercise retries.
+    """
+
+    def __init__(self, reject_connections: int = 0):
+        self.messages: List[email.message.EmailMessage] = []
+        self.connections = 0
+        self.finished = 0
+        self.reject_connections = reject_connections
+        self.server = None
+        self.port = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+
+        async def reply(line: str):
+            writer.write(f"{line}\r\n".encode())
+            await writer.drain()
+
+        try:
+            if self.connections <= self.reject_connections:
+                await reply("421 sink busy")
+                return
+            await reply("220 sink ESMTP")
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                command = line.decode().strip().upper()
+                if command.startswith(("HELO", "EHLO")):
+                    await reply("250 sink")
+                elif command.startswith(("MAIL", "RCPT", "RSET", "NOOP")):
+                    await reply("250 OK")
+                elif command == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    data = bytearray()
+                    while (chunk := await reader.readline()) != b".\r\n":
+                        if not chunk:
+                            return  # client went away mid-DATA; drop the partial message
+                        data += chunk[1:] if chunk.startswith(b"..") else chunk
+                    self.messages.append(email.message_from_bytes(bytes(data), policy=default_policy))
+                    await reply("250 OK queued")
+                elif command == "QUIT":
+                    await reply("221 Bye")
+                    return
+                else:
+                    await reply("502 Command not implemented")
+        finally:
+            self.finished += 1
+            writer.close()
@@ -0,0 +1,49 @@
+import pytest
+from app import cache as cache_module
+from app.cache import TTLCache
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable monotonic clock."""
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+def test_get_returns_cached_value_and_counts_hits():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set(1, {"id": 1})
+
+    assert cache.get(1) == {"id": 1}
+    assert cache.get(2) is None
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+
+def test_entries_expire_after_ttl(clock):
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=120)
+
+    clock[0] += 61
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # "b" is now least recently used
+    cache.set("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_invalidate_removes_entry():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.invalidate("a")
+    cache.invalidate("missing")
+    assert cache.get("a") is None
@@ -0,0 +1,301 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from app.repository import Database, ReplicaSet, UnitOfWork, after_commit, reads, writes
+
+# ---------------------------
+# Helpers to fake an asyncpg pool
+# ---------------------------
+def fake_connection(pid=1, healthy=True):
+    conn = MagicMock()
+    conn.get_server_pid.return_value = pid
+    conn.is_closed.return_value = False
+    conn.execute = AsyncMock(return_value="SELECT 1" if healthy else None)
+    if not healthy:
+        conn.execute.side_effect = ConnectionError("server closed the connection")
+    conn.fetchrow = AsyncMock(return_value={"id": 1})
+    conn.fetch = AsyncMock(return_value=[{"id": 1}, {"id": 2}])
+    return conn
+
+def fake_pool(*connections):
+    pool = MagicMock()
+    pool.acquire = AsyncMock(side_effect=list(connections))
+    pool.release = AsyncMock()
+    return pool
+
+@pytest.fixture
+def database():
+    return Database(min_size=1, max_size=2, acquire_timeout=1, health_check_idle=30)
+
+# ---------------------------
+# Test fetch helpers
+# ---------------------------
+@pytest.mark.asyncio
+async def test_fetch_one_returns_dict_and_releases(database):
+    conn = fake_connection()
+    database.pool = fake_pool(conn)
+
+    result = await database.fetchOne("SELECT * FROM users WHERE id=$1", 1)
+    assert result == {"id": 1}
+    conn.fetchrow.assert_awaited_once_with("SELECT * FROM users WHERE id=$1", 1)
+    database.pool.release.assert_awaited_once_with(conn)
+
+@pytest.mark.asyncio
+async def test_fetch_all_returns_list_of_dicts(database):
+    conn = fake_connection()
+    database.pool = fake_pool(conn)
+
+    results = await database.fetchAll("SELECT * FROM users")
+    assert results == [{"id": 1}, {"id": 2}]
+
+# ---------------------------
+# Test query timing
+# ---------------------------
+@pytest.mark.asyncio
+async def test_queries_are_timed_by_fingerprint(database):
+    conn = fake_connection()
+    conn.execute = AsyncMock(return_value="DELETE 3")
+    database.pool = fake_pool(conn, conn)
+    database._last_used[1] = float("inf")
+
+    await database.fetchAll("SELECT * FROM users WHERE id = 5")
+    await database.execute("DELETE FROM activations WHERE id = $1", 9)
+
+    rows = {row["query"]: row for row in database.query_stats.top()}
+    assert rows["SELECT * FROM users WHERE id = ?"]["rows"] == 2
+    assert rows["DELETE FROM activations WHERE id = $1"]["rows"] == 3
+
+@pytest.mark.asyncio
+async def test_slow_query_is_logged(database, caplog):
+    conn = fake_connection()
+    database.pool = fake_pool(conn)
+    database._last_used[1] = float("inf")
+    database.slow_query_ms = 0
+
+    with caplog.at_level("WARNING", logger="service_logger"):
+        await database.fetchOne("SELECT * FROM users WHERE email = 'a@b.c'")
+    assert "Slow query" in caplog.text
+    assert "email = ?" in caplog.text
+
+# ---------------------------
+# Test idle health checks
+# ---------------------------
+@pytest.mark.asyncio
+async def test_recently_used_connection_is_not_pinged(database):
+    conn = fake_connection(pid=7)
+    database.pool = fake_pool(conn)
+    database._last_used[7] = float("inf")
+
+    await database.fetchOne("SELECT 1")
+    conn.execute.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_unhealthy_idle_connection_is_replaced(database):
+    stale = fake_connection(pid=7, healthy=False)
+    fresh = fake_connection(pid=8)
+    database.pool = fake_pool(stale, fresh)
+    database._last_used[7] = 0.0
+
+    result = await database.fetchOne("SELECT 1")
+    assert result == {"id": 1}
+    stale.terminate.assert_called_once()
+    fresh.fetchrow.assert_awaited_once()
+    assert 7 not in database._last_used
+    assert 8 in database._last_used
+
+@pytest.mark.asyncio
+async def test_closed_connection_is_forgotten(database):
+    conn = fake_connection(pid=7)
+    database.pool = fake_pool(conn)
+    await database._init_connection(conn)
+    await database.fetchOne("SELECT * FROM users WHERE id=$1", 1)
+    assert 7 in database._last_used
+    assert 7 in database.statements._prepared
+
+    # asyncpg calls termination listeners when the pool closes an idle connection
+    listener = conn.add_termination_listener.call_args.args[0]
+    listener(conn)
+    assert 7 not in database._last_used
+    assert 7 not in database.statements._prepared
+
+# ---------------------------
+# Test read replica routing
+# ---------------------------
+@pytest.fixture
+def routed(database):
+    """The database fixture as primary, with one caught-up replica."""
+    replica = Database(min_size=1, max_size=2, acquire_timeout=1, name="replica-1")
+    database.replicas = ReplicaSet([replica], max_lag=5)
+    database.replicas.lag["replica-1"] = 0.0
+    database.replicas._update()
+    for db_ in (database, replica):
+        db_.pool = fake_pool(*[fake_connection() for _ in range(4)])
+        db_._last_used[1] = float("inf")
+    return database, replica
+
+@pytest.mark.asyncio
+async def test_only_tagged_reads_go_to_the_replica(routed):
+    primary, replica = routed
+
+    @reads
+    async def tagged():
+        return await primary.fetchAll("SELECT * FROM users")
+
+    await tagged()
+    await primary.fetchAll("SELECT * FROM users")
+    assert replica.pool.acquire.await_count == 1
+    assert primary.pool.acquire.await_count == 1
+
+@pytest.mark.asyncio
+async def test_reads_after_a_write_stay_on_the_primary(routed):
+    primary, replica = routed
+
+    @writes
+    async def write():
+        return await primary.execute("UPDATE users SET is_active=TRUE WHERE id=$1", 1)
+
+    @reads
+    async def read():
+        return await primary.fetchOne("SELECT * FROM users WHERE id=$1", 1)
+
+    await write()
+    await read()
+    replica.pool.acquire.assert_not_awaited()
+    assert primary.pool.acquire.await_count == 2
+
+@pytest.mark.asyncio
+async def test_miss_on_replica_is_confirmed_on_primary(routed):
+    primary, replica = routed
+    replica.fetchOne = AsyncMock(return_value=None)
+
+    @reads(confirm_miss=True)
+    async def read():
+        return await primary.fetchOne("SELECT * FROM users WHERE id=$1", 1)
+
+    assert await read() == {"id": 1}
+    replica.fetchOne.assert_awaited_once()
+    assert primary.replicas.misses == 1
+
+@pytest.mark.asyncio
+async def test_failed_replica_read_falls_back_and_removes_replica(routed):
+    primary, replica = routed
+    replica.fetchAll = AsyncMock(side_effect=ConnectionError("replica down"))
+
+    @reads
+    async def read():
+        return await primary.fetchAll("SELECT * FROM users")
+
+    assert await read() == [{"id": 1}, {"id": 2}]
+    assert primary.replicas.available == []
+    assert primary.replicas.lag["replica-1"] is None
+
+@pytest.mark.asyncio
+async def test_lag_check_drops_lagging_and_unreachable_replicas():
+    caught_up, lagging, down = (Database(acquire_timeout=1, name=name) for name in ("a", "b", "c"))
+    caught_up.fetchOne = AsyncMock(return_value={"lag": None})
+    lagging.fetchOne = AsyncMock(return_value={"lag": 30.0})
+    down.fetchOne = AsyncMock(side_effect=OSError("connection refused"))
+    replicas = ReplicaSet([caught_up, lagging, down], max_lag=5)
+
+    await replicas.check()
+    assert replicas.available == [caught_up]
+    assert replicas.lag == {"a": 0.0, "b": 30.0, "c": None}
+
+    lagging.fetchOne.return_value = {"lag": 1.5}
+    await replicas.check()
+    assert replicas.available == [caught_up, lagging]
+
+# ---------------------------
+# Test unit of work
+# ---------------------------
+def fake_transaction(conn):
+    tx = MagicMock()
+    tx.start, tx.commit, tx.rollback = AsyncMock(), AsyncMock(), AsyncMock()
+    conn.transaction.return_value = tx
+    return tx
+
+@pytest.mark.asyncio
+async def test_unit_of_work_shares_one_connection_until_released(database):
+    conn = fake_connection()
+    database.pool = fake_pool(conn, fake_connection(pid=2))
+
+    async with UnitOfWork(database):
+        await database.fetchOne("SELECT * FROM users WHERE id=$1", 1)
+        await database.fetchAll("SELECT * FROM users")
+        await database.execute("UPDATE users SET is_active=TRUE WHERE id=$1", 1)
+        database.pool.release.assert_not_awaited()
+    assert database.pool.acquire.await_count == 1
+    database.pool.release.assert_awaited_once_with(conn)
+
+    # Outside the unit of work each query acquires its own connection again
+    await database.fetchOne("SELECT 1")
+    assert database.pool.acquire.await_count == 2
+
+@pytest.mark.asyncio
+async def test_unit_of_work_without_queries_acquires_nothing(database):
+    database.pool = fake_pool()
+    async with UnitOfWork(database):
+        pass
+    database.pool.acquire.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_transaction_begins_on_first_query_and_commits(database):
+    conn = fake_connection()
+    tx = fake_transaction(conn)
+    database.pool = fake_pool(conn)
+
+    async with UnitOfWork(database) as uow:
+        async with database.transaction():
+            tx.start.assert_not_awaited()
+            await database.execute("DELETE FROM activations WHERE id=$1", 1)
+            async with database.transaction():  # joins the outer one
+                await database.fetchOne("SELECT * FROM users WHERE id=$1", 1)
+        assert not uow.in_transaction
+    tx.start.assert_awaited_once()
+    tx.commit.assert_awaited_once()
+    tx.rollback.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_transaction_rolls_back_when_block_raises(database):
+    conn = fake_connection()
+    tx = fake_transaction(conn)
+    database.pool = fake_pool(conn)
+
+    with pytest.raises(ValueError):
+        async with database.transaction():
+            await database.execute("DELETE FROM activations WHERE id=$1", 1)
+            raise ValueError("boom")
+    tx.rollback.assert_awaited_once()
+    tx.commit.assert_not_awaited()
+    database.pool.release.assert_awaited_once_with(conn)
+
+@pytest.mark.asyncio
+async def test_after_commit_callbacks_wait_for_the_commit(database):
+    conn = fake_connection()
+    tx = fake_transaction(conn)
+    database.pool = fake_pool(conn)
+    calls = []
+    tx.commit.side_effect = lambda: calls.append("commit")
+
+    async with UnitOfWork(database):
+        async with database.transaction():
+            await database.execute("DELETE FROM activations WHERE id=$1", 1)
+            after_commit(lambda: calls.append("callback"))
+            assert calls == []
+    assert calls == ["commit", "callback"]
+
+    after_commit(lambda: calls.append("outside"))  # no transaction: runs now
+    assert calls[-1] == "outside"
+
+@pytest.mark.asyncio
+async def test_after_commit_callbacks_are_dropped_on_rollback(database):
+    conn = fake_connection()
+    fake_transaction(conn)
+    database.pool = fake_pool(conn)
+    calls = []
+
+    with pytest.raises(ValueError):
+        async with database.transaction():
+            await database.execute("DELETE FROM activations WHERE id=$1", 1)
+            after_commit(lambda: calls.append("callback"))
+            raise ValueError("boom")
+    assert calls == []
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.dependencies import UnitOfWorkDep, UnitOfWorkRoute
+
+# ---------------------------
+# Test UnitOfWorkRoute
+# ---------------------------
+def test_unit_of_work_is_released_before_the_body_is_streamed():
+    router = APIRouter(route_class=UnitOfWorkRoute)
+    seen = {}
+
+    @router.get("/stream")
+    async def stream(uow: UnitOfWorkDep):
+        seen["uow"] = uow
+
+        async def body():
+            seen["closed_while_streaming"] = uow.closed
+            yield b"done"
+        return StreamingResponse(body())
+
+    app = FastAPI()
+    app.include_router(router)
+    response = TestClient(app).get("/stream")
+
+    assert response.text == "done"
+    assert seen["closed_while_streaming"] is True
+
+def test_dependency_shares_one_unit_of_work_per_request():
+    router = APIRouter(route_class=UnitOfWorkRoute)
+    seen = []
+
+    def service(uow: UnitOfWorkDep):
+        return uow
+
+    @router.get("/twice")
+    async def twice(uow: UnitOfWorkDep, other=Depends(service)):
+        seen.extend([uow, other])
+        return {}
+
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+    client.get("/twice")
+    client.get("/twice")
+
+    assert seen[0] is seen[1]
+    assert seen[2] is not seen[0]
+    assert all(uow.closed for uow in seen)
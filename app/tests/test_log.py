@@ -0,0 +1,60 @@
+import json
+import logging
+import queue
+from app.log import JsonFormatter, SamplingFilter, _DeferredQueueHandler, parse_level, parse_levels
+
+def make_record(name="service_logger", level=logging.INFO, msg="hello %s", args=("world",), **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+# ---------------------------
+# Test JSON output
+# ---------------------------
+def test_json_formatter_renders_message_and_extra_fields():
+    line = JsonFormatter().format(make_record(user_id=7))
+    entry = json.loads(line)
+    assert entry["msg"] == "hello world"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "service_logger"
+    assert entry["user_id"] == 7
+
+def test_parse_levels():
+    assert parse_levels("service_logger.db=WARNING, service_logger.tokens=0.01,,") == {
+        "service_logger.db": "WARNING",
+        "service_logger.tokens": "0.01",
+    }
+
+def test_parse_level_rejects_unknown_names():
+    assert parse_level("debug") == logging.DEBUG
+    assert parse_level("15") == 15
+    assert parse_level("VERBOSE") is None  # logging.getLevelName gives "Level VERBOSE"
+
+# ---------------------------
+# Test sampling
+# ---------------------------
+def test_sampling_keeps_every_nth_record_of_sampled_logger():
+    sampler = SamplingFilter({"service_logger.tokens": 0.25})
+    kept = [sampler.filter(make_record("service_logger.tokens")) for _ in range(8)]
+    assert kept.count(True) == 2
+    assert sampler.dropped == 6
+
+def test_sampling_never_drops_warnings_or_other_loggers():
+    sampler = SamplingFilter({"service_logger.tokens": 0})
+    assert sampler.filter(make_record("service_logger.tokens", level=logging.ERROR))
+    assert sampler.filter(make_record("service_logger.db"))
+    assert not sampler.filter(make_record("service_logger.tokens.child"))
+
+# ---------------------------
+# Test queue hand-off
+# ---------------------------
+def test_queue_handler_defers_formatting_to_the_listener():
+    records = queue.SimpleQueue()
+    handler = _DeferredQueueHandler(records)
+    record = make_record()
+    handler.handle(record)
+
+    queued = records.get_nowait()
+    assert queued is record
+    assert queued.args == ("world",)
+    assert not hasattr(queued, "message")
@@ -0,0 +1,116 @@
+import asyncio
+import pytest
+import pytest_asyncio
+
+from app.mailer import MailQueue, SMTPTransport, build_message
+from app.tests.smtp_sink import SMTPSink
+
+async def wait_for(predicate, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "condition not met in time"
+        await asyncio.sleep(0.01)
+
+@pytest_asyncio.fixture
+async def sink():
+    sink = await SMTPSink().start()
+    yield sink
+    await sink.stop()
+
+def message(n=0):
+    return build_message(to=f"user{n}@example.com", subject=f"Code {n}", body=f"Your code is {n}")
+
+# ---------------------------
+# Test delivery
+# ---------------------------
+@pytest.mark.asyncio
+async def test_queued_messages_are_batched_per_connection(sink):
+    queue = MailQueue(transport=SMTPTransport("127.0.0.1", sink.port), concurrency=1, batch_size=10)
+    for n in range(5):
+        queue.enqueue(message(n))
+
+    await queue.start()
+    await wait_for(lambda: len(sink.messages) == 5)
+    await queue.stop()
+
+    assert sink.connections == 1
+    assert [m["To"] for m in sink.messages] == [f"user{n}@example.com" for n in range(5)]
+    assert queue.stats()["sent"] == 5
+
+@pytest.mark.asyncio
+async def test_sink_drops_a_message_cut_off_mid_data(sink):
+    reader, writer = await asyncio.open_connection("127.0.0.1", sink.port)
+    await reader.readline()
+    writer.write(b"DATA\r\nSubject: half\r\n")
+    await writer.drain()
+    await reader.readline()
+    writer.close()
+
+    await wait_for(lambda: sink.finished == 1)
+    assert sink.messages == []
+
+@pytest.mark.asyncio
+async def test_failed_delivery_is_retried_with_backoff():
+    sink = await SMTPSink(reject_connections=2).start()
+    queue = MailQueue(transport=SMTPTransport("127.0.0.1", sink.port), concurrency=1, retry_backoff=0.01)
+    try:
+        await queue.start()
+        queue.enqueue(message())
+        await wait_for(lambda: len(sink.messages) == 1)
+        await queue.stop()
+    finally:
+        await sink.stop()
+
+    assert sink.connections == 3
+    assert queue.stats()["retried"] == 2
+    assert queue.stats()["sent"] == 1
+
+# ---------------------------
+# Test spill-to-disk
+# ---------------------------
+@pytest.mark.asyncio
+async def test_undelivered_messages_are_spooled_and_reloaded(tmp_path, sink):
+    queue = MailQueue(transport=SMTPTransport("127.0.0.1", 1), max_retries=0, spool_dir=str(tmp_path))
+    await queue.start()
+    queue.enqueue(message(1))
+    await wait_for(lambda: queue.stats()["spilled"] == 1)
+    await queue.stop()
+    assert len(list(tmp_path.glob("*.eml"))) == 1
+
+    queue = MailQueue(transport=SMTPTransport("127.0.0.1", sink.port), spool_dir=str(tmp_path))
+    await queue.start()
+    await wait_for(lambda: len(sink.messages) == 1)
+    await queue.stop()
+
+    assert sink.messages[0]["Subject"] == "Code 1"
+    assert list(tmp_path.glob("*.eml")) == []
+
+@pytest.mark.asyncio
+async def test_full_queue_spills_instead_of_blocking(tmp_path):
+    queue = MailQueue(maxsize=1, spool_dir=str(tmp_path))
+    queue.enqueue(message(1))
+    queue.enqueue(message(2))
+
+    assert queue.stats()["depth"] == 1
+    assert queue.stats()["spilled"] == 1
+
+@pytest.mark.asyncio
+async def test_spooled_message_claimed_by_another_worker_is_skipped(tmp_path, monkeypatch):
+    import os
+    from app import mailer as module
+    MailQueue(maxsize=0, spool_dir=str(tmp_path))._spill(message(1))
+    MailQueue(maxsize=0, spool_dir=str(tmp_path))._spill(message(2))
+    first, second = sorted(tmp_path.glob("*.eml"))
+
+    real_rename = os.rename
+    def rename(src, dst):
+        if src == first:
+            src.unlink()  # another worker got there first
+        return real_rename(src, dst)
+    monkeypatch.setattr(module.os, "rename", rename)
+
+    queue = MailQueue(spool_dir=str(tmp_path))
+    queue._load_spool()
+    assert queue.stats()["depth"] == 1
+    assert queue._queue.get_nowait().message["Subject"] == "Code 2"
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,71 @@
+import threading
+import pytest
+from fastapi.testclient import TestClient
+
+from app.metrics import CallbackMetric, Counter, Histogram, Registry, instrument_methods, db_method_seconds
+
+@pytest.fixture
+def registry():
+    return Registry()
+
+def test_counter_sums_shards_from_every_thread(registry):
+    counter = Counter("logins_total", "Logins.", ("result",), registry=registry)
+    threads = [threading.Thread(target=lambda: [counter.labels("ok").inc() for _ in range(1000)]) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    counter.labels(result="failed").inc(2)
+
+    text = registry.render()
+    assert "# TYPE logins_total counter" in text
+    assert 'logins_total{result="ok"} 4000' in text
+    assert 'logins_total{result="failed"} 2' in text
+
+def test_histogram_renders_cumulative_buckets(registry):
+    histogram = Histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0), registry=registry)
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+
+    text = registry.render()
+    assert 'latency_seconds_bucket{le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{le="1"} 3' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in text
+    assert "latency_seconds_sum 3.65" in text
+    assert "latency_seconds_count 4" in text
+
+def test_broken_callback_does_not_break_scrape(registry):
+    def broken():
+        raise RuntimeError("boom")
+    CallbackMetric("broken", "Broken.", broken, registry=registry)
+    CallbackMetric("pool", "Pool.", lambda: [(("idle",), 3)], ("state",), registry=registry)
+
+    text = registry.render()
+    assert "collection failed: boom" in text
+    assert 'pool{state="idle"} 3' in text
+
+@pytest.mark.asyncio
+async def test_instrument_methods_times_public_coroutines():
+    @instrument_methods
+    class FakeRepository:
+        async def find(self):
+            return "found"
+
+        async def _private(self):
+            return "hidden"
+
+    assert await FakeRepository().find() == "found"
+    bucket_counts = db_method_seconds.labels(method="FakeRepository.find").totals()[:-1]
+    assert sum(bucket_counts) == 1
+    assert ("FakeRepository._private",) not in db_method_seconds._children
+
+def test_metrics_endpoint_reports_route_latency():
+    from app.main import app
+    client = TestClient(app)
+    client.get("/health")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert 'http_request_duration_seconds_count{method="GET",route="/health",status="200"}' in response.text
+    assert "db_pool_connections" in response.text
+    assert 'cache_hit_ratio{cache="users"}' in response.text
@@ -0,0 +1,94 @@
+from datetime import datetime, timezone, timedelta
+from app.query import QueryStats, StatementCache, fingerprint, delete_sql, insert_sql, params, select_sql, update_sql
+
+# ---------------------------
+# Test SQL builders
+# ---------------------------
+def test_select_sql_is_parameterized():
+    assert select_sql("users", ("email",)) == "SELECT * FROM users WHERE email=$1"
+    assert (
+        select_sql("activations", ("email", "purpose"), order_by="created_at DESC", limit=1)
+        == "SELECT * FROM activations WHERE email=$1 AND purpose=$2 ORDER BY created_at DESC LIMIT 1"
+    )
+    assert (
+        select_sql("activations", ("user_id", "code"), extra="expires_at > NOW()")
+        == "SELECT * FROM activations WHERE user_id=$1 AND code=$2 AND expires_at > NOW()"
+    )
+
+def test_select_sql_is_built_once_per_shape():
+    assert select_sql("users", ("id",)) is select_sql("users", ("id",))
+
+def test_insert_update_delete_sql():
+    assert insert_sql("users", ("email", "firstname")) == (
+        "INSERT INTO users (email, firstname) VALUES ($1, $2) RETURNING id"
+    )
+    assert update_sql("users", ("firstname", "is_active"), returning="*") == (
+        "UPDATE users SET firstname=$1, is_active=$2 WHERE id=$3 RETURNING *"
+    )
+    assert delete_sql("activations", ("email", "purpose")) == (
+        "DELETE FROM activations WHERE email=$1 AND purpose=$2"
+    )
+
+def test_params_converts_aware_datetimes_to_naive_utc():
+    aware = datetime(2025, 1, 1, 12, 0, tzinfo=timezone(timedelta(hours=2)))
+    assert params([aware, "x", 1]) == (datetime(2025, 1, 1, 10, 0), "x", 1)
+
+# ---------------------------
+# Test statement cache stats
+# ---------------------------
+def test_statement_cache_counts_prepares_per_connection():
+    cache = StatementCache()
+    query = select_sql("users", ("email",))
+
+    assert cache.record(101, query) is False
+    assert cache.record(101, query) is True
+    assert cache.record(101, query) is True
+    assert cache.record(202, query) is False
+
+    stats = cache.stats()[cache.name_for(query)]
+    assert stats == {"query": query, "prepares": 2, "hits": 2}
+
+def test_statement_cache_forgets_what_the_connection_lru_evicted():
+    cache = StatementCache(max_per_connection=2)
+    cache.record(101, "SELECT 1")
+    cache.record(101, "SELECT 2")
+    assert cache.record(101, "SELECT 1") is True  # now the most recently used
+    cache.record(101, "SELECT 3")  # evicts SELECT 2
+
+    assert cache.record(101, "SELECT 1") is True
+    assert cache.record(101, "SELECT 2") is False
+
+def test_statement_cache_discard_forgets_connection():
+    cache = StatementCache()
+    cache.record(101, "SELECT 1")
+    cache.discard(101)
+    assert cache.record(101, "SELECT 1") is False
+
+# ---------------------------
+# Test query fingerprints and stats
+# ---------------------------
+def test_fingerprint_strips_literals_and_whitespace():
+    query = "SELECT *  FROM users\n WHERE email = 'a@b.c' AND id = 42 AND x IN (1, 2, 3) LIMIT $1"
+    assert fingerprint(query) == "SELECT * FROM users WHERE email = ? AND id = ? AND x IN (?) LIMIT $1"
+
+def test_query_stats_aggregates_by_fingerprint():
+    stats = QueryStats()
+    stats.record("SELECT * FROM users WHERE id = 1", 10.0, 1)
+    stats.record("SELECT * FROM users WHERE id = 2", 30.0, 1)
+    stats.record("DELETE FROM activations", 5.0, 3)
+
+    top = stats.top(1)
+    assert len(top) == 1
+    assert top[0]["query"] == "SELECT * FROM users WHERE id = ?"
+    assert top[0]["calls"] == 2
+    assert top[0]["total_ms"] == 40.0
+    assert top[0]["max_ms"] == 30.0
+    assert top[0]["mean_ms"] == 20.0
+
+def test_query_stats_evicts_cheapest_fingerprint_when_full():
+    stats = QueryStats(max_fingerprints=2)
+    stats.record("SELECT 1", 50.0, 1)
+    stats.record("SELECT now()", 1.0, 1)
+    stats.record("SELECT version()", 20.0, 1)
+
+    assert [row["query"] for row in stats.top()] == ["SELECT ?", "SELECT version()"]
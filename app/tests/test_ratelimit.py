@@ -0,0 +1,127 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.auth.model import TokenResponse
+from app.ratelimit import MemoryBackend, RateLimiter, RedisBackend
+
+# ---------------------------
+# Test sliding window counters
+# ---------------------------
+@pytest.mark.asyncio
+async def test_allows_up_to_limit_then_reports_wait():
+    backend = MemoryBackend()
+    for _ in range(3):
+        assert await backend.hit("k", limit=3, window=60, now=1000) == 0
+    wait = await backend.hit("k", limit=3, window=60, now=1000)
+    # Window [960, 1020) is 40s in; the current window's hits only expire with it
+    assert wait == pytest.approx(20)
+
+@pytest.mark.asyncio
+async def test_previous_window_is_weighted_by_overlap():
+    backend = MemoryBackend()
+    for _ in range(4):
+        await backend.hit("k", limit=4, window=60, now=1010)  # window index 16
+    # 15s into the next window, 3 of the 4 previous hits still count
+    assert await backend.hit("k", limit=4, window=60, now=1035) == 0
+    assert await backend.hit("k", limit=4, window=60, now=1035) > 0
+    # 45s in, only one previous hit still counts
+    assert await backend.hit("k", limit=4, window=60, now=1065) == 0
+
+@pytest.mark.asyncio
+async def test_keys_are_counted_separately():
+    backend = MemoryBackend()
+    assert await backend.hit("a", limit=1, window=60, now=0) == 0
+    assert await backend.hit("b", limit=1, window=60, now=0) == 0
+    assert await backend.hit("a", limit=1, window=60, now=0) > 0
+
+@pytest.mark.asyncio
+async def test_idle_keys_are_evicted():
+    backend = MemoryBackend(sweep_interval=10)
+    backend._next_sweep = 0
+    await backend.hit("old", limit=5, window=60, now=0)
+    await backend.hit("new", limit=5, window=60, now=130)
+    assert len(backend) == 1
+    assert backend.evictions == 1
+
+@pytest.mark.asyncio
+async def test_limiter_rounds_wait_up_and_counts_rejections():
+    limiter = RateLimiter("test", limit=1, window=60, backend=MemoryBackend())
+    assert await limiter.hit("x") == 0
+    wait = await limiter.hit("x")
+    assert 1 <= wait <= 60
+    assert limiter.rejected == 1
+
+# ---------------------------
+# Test the shared Redis backend
+# ---------------------------
+class FakeRedis:
+    """Stand-in for one Redis server: runs the sliding-window script's steps on a dict."""
+
+    def __init__(self):
+        self.data = {}
+        self.calls = []
+
+    def register_script(self, lua):
+        assert "INCR" in lua and "PEXPIRE" in lua
+
+        async def script(keys, args):
+            self.calls.append(keys)
+            current, previous = self.data.get(keys[0], 0), self.data.get(keys[1], 0)
+            limit, window, elapsed = (float(arg) for arg in args)
+            if previous * (1 - elapsed / window) + current >= limit:
+                return [previous, current, 0]
+            self.data[keys[0]] = current + 1
+            return [previous, current + 1, 1]
+        return script
+
+@pytest.mark.asyncio
+async def test_redis_backend_counts_hits_from_every_worker():
+    server = FakeRedis()
+    first, second = RedisBackend(client=server), RedisBackend(client=server)
+
+    assert await first.hit("k", limit=3, window=60, now=1000) == 0
+    assert await second.hit("k", limit=3, window=60, now=1000) == 0
+    assert await first.hit("k", limit=3, window=60, now=1000) == 0
+    # Window [960, 1020) is 40s in; the fourth hit is refused on either worker
+    assert await second.hit("k", limit=3, window=60, now=1000) == pytest.approx(20)
+    assert server.calls[0] == ["ratelimit:k:16", "ratelimit:k:15"]
+
+    # 15s into the next window, 3 previous hits weigh 2.25: one more fits
+    assert await first.hit("k", limit=3, window=60, now=1035) == 0
+    assert await second.hit("k", limit=3, window=60, now=1035) > 0
+
+# ---------------------------
+# Test POST /auth/login throttling
+# ---------------------------
+class FakeAuthService:
+    def __init__(self):
+        self.logins = 0
+
+    async def login(self, login_data):
+        self.logins += 1
+        return TokenResponse(access_token="a", refresh_token="r")
+
+@pytest.mark.parametrize("make_backend", [MemoryBackend, lambda: RedisBackend(client=FakeRedis())], ids=["memory", "redis"])
+def test_login_is_rejected_before_reaching_the_service(monkeypatch, make_backend):
+    from app.main import app
+    from app.auth import dependencies
+
+    backend = make_backend()
+    monkeypatch.setattr(dependencies.login_ip_limiter, "backend", backend)
+    monkeypatch.setattr(dependencies.login_email_limiter, "backend", backend)
+    monkeypatch.setattr(dependencies.login_email_limiter, "limit", 2)
+    service = FakeAuthService()
+    app.dependency_overrides[dependencies.get_auth_service] = lambda: service
+    try:
+        client = TestClient(app)
+        body = {"email": "victim@example.com", "password": "guess"}
+        statuses = [client.post("/auth/login", json=body).status_code for _ in range(3)]
+        response = client.post("/auth/login", json=body)
+        other = client.post("/auth/login", json={"email": "other@example.com", "password": "guess"})
+    finally:
+        app.dependency_overrides.pop(dependencies.get_auth_service, None)
+
+    assert statuses == [200, 200, 429]
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert other.status_code == 200
+    assert service.logins == 3
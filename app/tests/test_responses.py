@@ -0,0 +1,47 @@
+import json
+from datetime import datetime, timezone
+from app.auth.model import OTPResponse, TokenResponse
+from app.main import app
+from app.responses import ModelResponse, ORJSONResponse
+
+# ---------------------------
+# Test response classes
+# ---------------------------
+def test_model_response_serializes_model_directly():
+    model = TokenResponse(access_token="a", refresh_token="r")
+    response = ModelResponse(model, status_code=201)
+    assert response.status_code == 201
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == model.model_dump()
+    assert response.headers["content-length"] == str(len(response.body))
+
+def test_orjson_response_handles_datetimes_and_int_keys():
+    response = ORJSONResponse({"at": datetime(2024, 1, 2, tzinfo=timezone.utc), 1: "one"})
+    assert json.loads(response.body) == {"at": "2024-01-02T00:00:00+00:00", "1": "one"}
+
+def test_routes_keep_response_models_in_openapi():
+    paths = app.openapi()["paths"]
+    schema = paths["/auth/login"]["post"]["responses"]["200"]["content"]["application/json"]["schema"]
+    assert schema == {"$ref": "#/components/schemas/TokenResponse"}
+    register = paths["/auth/register"]["post"]["responses"]
+    assert register["201"]["content"]["application/json"]["schema"] == {"$ref": "#/components/schemas/OTPResponse"}
+
+def test_register_returns_201_without_response_model_revalidation():
+    from fastapi.testclient import TestClient
+    from app.auth.dependencies import get_auth_service
+
+    class FakeAuthService:
+        async def register(self, register_data):
+            return OTPResponse(activation_code=1234)
+
+    app.dependency_overrides[get_auth_service] = FakeAuthService
+    try:
+        response = TestClient(app).post("/auth/register", json={
+            "email": "new@example.com", "firstname": "New", "lastname": "User", "password": "password123",
+        })
+    finally:
+        app.dependency_overrides.pop(get_auth_service, None)
+
+    assert response.status_code == 201
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == {"activation_code": 1234}
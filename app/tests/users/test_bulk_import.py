@@ -0,0 +1,108 @@
+import json
+import pytest
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+
+from app.auth.utils import verify_password
+from app.repository import db
+from app.users.bulk_import import import_users, read_rows, validate_row
+from app.users.repository import UserRepository
+
+def write_csv(path, rows):
+    lines = ["email,firstname,lastname,password,password_hash"] + rows
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+# ---------------------------
+# Test parsing and validation
+# ---------------------------
+def test_read_rows_streams_csv_and_ndjson(tmp_path):
+    csv_path = write_csv(tmp_path / "users.csv", ["a@example.com,Ann,Lee,password123,"])
+    assert list(read_rows(csv_path))[0] == (2, {
+        "email": "a@example.com", "firstname": "Ann", "lastname": "Lee",
+        "password": "password123", "password_hash": "",
+    })
+
+    ndjson_path = tmp_path / "users.ndjson"
+    ndjson_path.write_text(json.dumps({"email": "b@example.com"}) + "\n\n{broken\n")
+    rows = list(read_rows(str(ndjson_path)))
+    assert rows[0] == (1, {"email": "b@example.com"})
+    assert rows[1][0] == 3 and "_error" in rows[1][1]
+
+def test_validate_row_prefers_pre_hashed_password():
+    clean, password = validate_row({"email": "a@example.com", "firstname": "Ann", "lastname": "Lee", "password_hash": "$pbkdf2"})
+    assert clean["password_hash"] == "$pbkdf2"
+    assert password is None
+
+def test_validate_row_rejects_bad_rows():
+    with pytest.raises(ValueError, match="email"):
+        validate_row({"email": "nope", "firstname": "Ann", "lastname": "Lee", "password": "password123"})
+    with pytest.raises(ValueError, match="password"):
+        validate_row({"email": "a@example.com", "firstname": "Ann", "lastname": "Lee", "password": "short"})
+
+def test_validate_row_rejects_values_the_columns_cannot_hold():
+    row = {"email": "a@example.com", "firstname": "Ann", "lastname": "Lee", "password_hash": "$pbkdf2"}
+    with pytest.raises(ValueError, match="password_hash"):
+        validate_row({**row, "password_hash": "x" * 129})
+    with pytest.raises(ValueError, match="firstname"):
+        validate_row({**row, "firstname": "A" * 129})
+    with pytest.raises(ValueError, match="lastname"):
+        validate_row({**row, "lastname": "Lee\x00"})
+
+# ---------------------------
+# Test import pipeline
+# ---------------------------
+@pytest.mark.asyncio
+async def test_import_users_hashes_batches_and_reports(tmp_path, monkeypatch):
+    from app.auth.passwords import PasswordPolicy
+    from app.users import bulk_import
+    policy = PasswordPolicy(schemes=["pbkdf2_sha256", "bcrypt_sha256"], rounds={"pbkdf2_sha256": 2000})
+    monkeypatch.setattr(bulk_import, "password_policy", policy)
+    path = write_csv(tmp_path / "users.csv", [
+        "a@example.com,Ann,Lee,password123,",
+        "b@example.com,Bob,Ray,,$pbkdf2-sha256$prehashed",
+        "not-an-email,Cy,Doe,password123,",
+        "c@example.com,Cat,Fox,password456,",
+    ])
+    repo = UserRepository()
+    repo.bulk_insert = AsyncMock(side_effect=[2, 0])
+
+    report = await import_users(path, batch_size=2, workers=1, repo=repo)
+
+    assert report.read == 4
+    assert report.inserted == 2
+    assert report.skipped == 1
+    assert [line for line, _ in report.rejected] == [4]
+    first_batch = repo.bulk_insert.await_args_list[0].args[0]
+    assert [r[0] for r in first_batch] == ["a@example.com", "b@example.com"]
+    assert verify_password("password123", first_batch[0][3])
+    # Hashed with the importing process's policy, so first login does not rehash
+    assert first_batch[0][3].startswith("$pbkdf2-sha256$2000$")
+    assert not policy.needs_update(first_batch[0][3])
+    assert first_batch[1][3] == "$pbkdf2-sha256$prehashed"
+    assert report.rows_per_sec > 0
+
+@pytest.mark.asyncio
+async def test_bulk_insert_copies_into_staging_and_merges(monkeypatch):
+    conn = MagicMock()
+    conn.execute = AsyncMock(side_effect=["CREATE TABLE", "INSERT 0 2"])
+    conn.copy_records_to_table = AsyncMock()
+    conn.transaction.return_value.__aenter__ = AsyncMock()
+    conn.transaction.return_value.__aexit__ = AsyncMock(return_value=False)
+
+    @asynccontextmanager
+    async def acquire():
+        yield conn
+    monkeypatch.setattr(db, "acquire", acquire)
+
+    records = [("a@example.com", "Ann", "Lee", "h1", False, None), ("b@example.com", "Bob", "Ray", "h2", False, None)]
+    inserted = await UserRepository().bulk_insert(records)
+
+    assert inserted == 2
+    staging, = conn.copy_records_to_table.await_args.args
+    assert staging == "users_import"
+    # Each row carries its position, so the first of duplicate emails wins
+    assert conn.copy_records_to_table.await_args.kwargs["records"] == [(0, *records[0]), (1, *records[1])]
+    merge = conn.execute.await_args_list[1].args[0]
+    assert "ORDER BY email, position" in merge
+    assert "ON CONFLICT (email) DO NOTHING" in merge
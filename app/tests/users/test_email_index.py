@@ -0,0 +1,79 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+from app.bloom import BloomFilter
+from app.repository import db
+from app.users.email_index import EmailIndex
+
+# ---------------------------
+# Test Bloom filter
+# ---------------------------
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    emails = [f"user{i}@example.com" for i in range(1000)]
+    for email in emails:
+        bloom.add(email)
+    assert all(email in bloom for email in emails)
+    assert 980 <= bloom.count <= 1000
+
+def test_bloom_filter_false_positive_rate_is_near_target():
+    bloom = BloomFilter(capacity=5000, error_rate=0.01)
+    for i in range(5000):
+        bloom.add(f"user{i}@example.com")
+    false_positives = sum(f"other{i}@example.com" in bloom for i in range(20000))
+    assert false_positives / 20000 < 0.02
+    assert bloom.estimated_fp_rate() == pytest.approx(0.01, rel=0.2)
+
+def test_bloom_filter_does_not_count_duplicates():
+    bloom = BloomFilter(capacity=10)
+    bloom.add("a@example.com")
+    bloom.add("a@example.com")
+    assert bloom.count == 1
+
+# ---------------------------
+# Test loading and catch-up
+# ---------------------------
+@pytest.mark.asyncio
+async def test_load_reads_every_page(monkeypatch):
+    pages = [
+        [{"id": 1, "email": "a@example.com"}, {"id": 2, "email": "b@example.com"}],
+        [{"id": 5, "email": "c@example.com"}],
+    ]
+    fetch_all = AsyncMock(side_effect=pages)
+    monkeypatch.setattr(db, "fetchAll", fetch_all)
+    monkeypatch.setattr(db, "fetchOne", AsyncMock(return_value={"n": 3}))
+    index = EmailIndex(capacity=100, page_size=2)
+
+    assert not index.ready and index.might_exist("z@example.com")
+    await index.load()
+
+    assert index.ready and index.last_id == 5
+    assert [call.args[1] for call in fetch_all.await_args_list] == [0, 2]
+    assert index.might_exist("c@example.com")
+    assert not index.might_exist("z@example.com")
+
+@pytest.mark.asyncio
+async def test_notifications_add_emails_or_wake_catch_up():
+    index = EmailIndex(capacity=100)
+    index.filter = BloomFilter(100)
+    index._wake = asyncio.Event()
+
+    index._on_notify(None, 1, "users_inserted", "a@example.com\nb@example.com")
+    assert index.might_exist("b@example.com")
+    assert not index._wake.is_set()
+
+    index._on_notify(None, 1, "users_inserted", "")
+    assert index._wake.is_set()
+
+def test_stats_report_false_positive_rates_and_memory():
+    index = EmailIndex(capacity=1000)
+    index.filter = BloomFilter(1000)
+    index.add("known@example.com")
+    index.might_exist("absent@example.com")
+    index.record_absent("known@example.com")
+
+    stats = index.stats()
+    assert stats["memory_bytes"] == index.filter.memory_bytes
+    assert stats["false_positives"] == 1
+    assert stats["observed_fp_rate"] == 0.5
+    assert 0 < stats["estimated_fp_rate"] < 0.01
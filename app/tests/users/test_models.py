@@ -2,7 +2,7 @@ import pytest
 from datetime import datetime, timezone
 from pydantic import ValidationError
 
-from app.users.model import User
+from app.users.model import User, UserRecord, UserResponse
 
 def test_user_model_initialization():
     # vars
@@ -84,3 +84,18 @@ def test_user_model_lastname_too_long():
             lastname="demo" * 200,  # too long
             password_hash="password123"
         )
+
+# ---------------------------
+# Test UserRecord
+# ---------------------------
+def test_user_record_from_row_ignores_extra_columns():
+    row = {"id": 1, "email": "a@example.com", "firstname": "Al", "lastname": "Ex",
+           "password_hash": "h", "is_active": True, "created_at": None, "updated_at": None}
+    user = UserRecord.from_row(row)
+    assert user.id == 1 and user.email == "a@example.com" and user.is_active is True
+    assert not hasattr(user, "__dict__")
+
+def test_user_response_from_record_drops_private_fields():
+    user = UserRecord(id=1, email="a@example.com", firstname="Al", lastname="Ex", password_hash="h", is_active=True)
+    response = UserResponse.from_record(user)
+    assert response.model_dump() == {"email": "a@example.com", "firstname": "Al", "lastname": "Ex", "is_active": True}
@@ -1,8 +1,10 @@
 import pytest
-from unittest.mock import MagicMock, ANY
+from unittest.mock import AsyncMock, ANY
 from datetime import datetime, timezone
-from app.users.repository import UserRepository
-from app.users.model import User
+from app.users.repository import UserRepository, user_cache
+from app.bloom import BloomFilter
+from app.users.email_index import email_index
+from app.users.model import User, UserRecord
 from app.repository import db
 
 # ---------------------------
@@ -34,98 +36,238 @@ def fake_user_dict(
 @pytest.fixture
 def mock_db_fetchAll(monkeypatch):
     """Patch Database.fetchAll to return controlled results"""
-    mock_fetchAll = MagicMock()
+    mock_fetchAll = AsyncMock()
     monkeypatch.setattr(db, "fetchAll", mock_fetchAll)
     return mock_fetchAll
 
 @pytest.fixture
 def mock_db_fetchOne(monkeypatch):
     """Patch Database.fetchOne to return controlled results"""
-    mock_fetchOne = MagicMock()
+    mock_fetchOne = AsyncMock()
     monkeypatch.setattr(db, "fetchOne", mock_fetchOne)
     return mock_fetchOne
 
 @pytest.fixture
 def mock_db_execute(monkeypatch):
     """Patch Database.execute for updates/deletes"""
-    mock_execute = MagicMock()
+    mock_execute = AsyncMock()
     monkeypatch.setattr(db, "execute", mock_execute)
     return mock_execute
 
+@pytest.fixture(autouse=True)
+def empty_user_cache():
+    user_cache.clear()
+    email_index.negative.clear()
+    yield
+    user_cache.clear()
+    email_index.negative.clear()
+
 # ---------------------------
 # Test get_all
 # ---------------------------
-def test_get_all_returns_results(mock_db_fetchAll):
+@pytest.mark.asyncio
+async def test_get_all_returns_results(mock_db_fetchAll):
     repo = UserRepository()
     fake_users = [fake_user_dict(), fake_user_dict(user_id="2", email="b@example.com")]
     mock_db_fetchAll.return_value = fake_users
 
-    results = repo.get_all()
+    results = await repo.get_all()
     assert results == fake_users
-    mock_db_fetchAll.assert_called_once_with(ANY)
+    mock_db_fetchAll.assert_awaited_once_with(ANY)
 
-def test_get_all_returns_empty_if_no_results(mock_db_fetchAll):
+@pytest.mark.asyncio
+async def test_get_all_returns_empty_if_no_results(mock_db_fetchAll):
     repo = UserRepository()
     mock_db_fetchAll.return_value = []
 
-    results = repo.get_all()
+    results = await repo.get_all()
     assert results == []
-    mock_db_fetchAll.assert_called_once_with(ANY)
+    mock_db_fetchAll.assert_awaited_once_with(ANY)
 
 # ---------------------------
 # Test get_by_email
 # ---------------------------
-def test_get_by_email_returns_user(mock_db_fetchOne):
+@pytest.mark.asyncio
+async def test_get_by_email_returns_user(mock_db_fetchOne):
     repo = UserRepository()
     user_dict = fake_user_dict()
     mock_db_fetchOne.return_value = user_dict
 
-    result = repo.get_by_email(user_dict["email"])
-    assert isinstance(result, User)
+    result = await repo.get_by_email(user_dict["email"])
+    assert isinstance(result, UserRecord)
     assert result.email == user_dict["email"]
-    mock_db_fetchOne.assert_called_once_with(ANY)
+    mock_db_fetchOne.assert_awaited_once_with(ANY, user_dict["email"])
 
-def test_get_by_email_returns_none_if_not_found(mock_db_fetchOne):
+@pytest.mark.asyncio
+async def test_get_by_email_returns_none_if_not_found(mock_db_fetchOne):
     repo = UserRepository()
     mock_db_fetchOne.return_value = None
 
-    result = repo.get_by_email("notfound@example.com")
+    result = await repo.get_by_email("notfound@example.com")
     assert result is None
-    mock_db_fetchOne.assert_called_once_with(ANY)
+    mock_db_fetchOne.assert_awaited_once_with(ANY, "notfound@example.com")
+
+@pytest.mark.asyncio
+async def test_get_by_email_skips_db_for_emails_ruled_out(mock_db_fetchOne, monkeypatch):
+    repo = UserRepository()
+    monkeypatch.setattr(email_index, "filter", BloomFilter(100))
+    email_index.add("known@example.com")
+
+    assert await repo.get_by_email("never@example.com") is None
+    mock_db_fetchOne.assert_not_awaited()
+
+    mock_db_fetchOne.return_value = None
+    assert await repo.get_by_email("known@example.com") is None
+    assert await repo.get_by_email("known@example.com") is None
+    # The confirmed miss is served by the negative cache the second time
+    mock_db_fetchOne.assert_awaited_once_with(ANY, "known@example.com")
+
+# ---------------------------
+# Test get_by_id caching
+# ---------------------------
+@pytest.mark.asyncio
+async def test_get_by_id_is_served_from_cache(mock_db_fetchOne):
+    repo = UserRepository()
+    user_dict = fake_user_dict()
+    mock_db_fetchOne.return_value = user_dict
+
+    first = await repo.get_by_id("1")
+    second = await repo.get_by_id(1)
+    assert first is second
+    assert first == UserRecord.from_row(user_dict)
+    mock_db_fetchOne.assert_awaited_once_with(ANY, 1)
+
+@pytest.mark.asyncio
+async def test_get_by_id_does_not_cache_missing_user(mock_db_fetchOne):
+    repo = UserRepository()
+    mock_db_fetchOne.return_value = None
+
+    assert await repo.get_by_id(1) is None
+    assert await repo.get_by_id(1) is None
+    assert mock_db_fetchOne.await_count == 2
+
+@pytest.mark.asyncio
+async def test_update_user_invalidates_cached_user(mock_db_fetchOne):
+    repo = UserRepository()
+    user_dict = fake_user_dict()
+    updated_dict = {**user_dict, "firstname": "Jane"}
+    mock_db_fetchOne.side_effect = [user_dict, updated_dict, updated_dict]
+
+    await repo.get_by_id(1)
+    await repo.update_user(1, {"firstname": "Jane"})
+    result = await repo.get_by_id(1)
+    assert result.firstname == "Jane"
+    assert mock_db_fetchOne.await_count == 3
 
 # ---------------------------
 # Test update_user
 # ---------------------------
-def test_update_user_returns_updated_user(mock_db_fetchOne, mock_db_execute, monkeypatch):
+@pytest.mark.asyncio
+async def test_update_user_returns_updated_user(mock_db_fetchOne, mock_db_execute, monkeypatch):
     repo = UserRepository()
     user_dict = fake_user_dict()
     user_instance = User(**user_dict)
 
-    monkeypatch.setattr(repo, "get_by_id", lambda x: user_dict)
+    monkeypatch.setattr(repo, "get_by_id", AsyncMock(return_value=UserRecord.from_row(user_dict)))
 
     updated_dict = user_dict.copy()
     updated_dict["firstname"] = "Jane"
     mock_db_fetchOne.return_value = updated_dict
 
-    result = repo.update_user(user_instance.id, {"firstname": "Jane"})
-    assert isinstance(result, User)
+    result = await repo.update_user(user_instance.id, {"firstname": "Jane"})
+    assert isinstance(result, UserRecord)
     assert result.firstname == "Jane"
 
-def test_update_user_returns_none_if_user_not_found(monkeypatch, mock_db_execute):
+@pytest.mark.asyncio
+async def test_update_user_returns_none_if_user_not_found(monkeypatch, mock_db_execute):
     repo = UserRepository()
-    monkeypatch.setattr(repo, "get_by_id", lambda x: None)
+    monkeypatch.setattr(repo, "get_by_id", AsyncMock(return_value=None))
 
-    result = repo.update_user("1", {"firstname": "Jane"})
+    result = await repo.update_user("1", {"firstname": "Jane"})
     assert result is None
     mock_db_execute.assert_not_called()
 
-def test_update_user_returns_user_if_no_fields_to_update(monkeypatch, mock_db_execute):
+@pytest.mark.asyncio
+async def test_update_user_returns_user_if_no_fields_to_update(monkeypatch, mock_db_execute):
     repo = UserRepository()
     user_dict = fake_user_dict()
     user_instance = User(**user_dict)
-    monkeypatch.setattr(repo, "get_by_id", lambda x: user_dict)
+    monkeypatch.setattr(repo, "get_by_id", AsyncMock(return_value=UserRecord.from_row(user_dict)))
 
-    result = repo.update_user(user_instance.id, {})
-    assert isinstance(result, User)
+    result = await repo.update_user(user_instance.id, {})
+    assert isinstance(result, UserRecord)
     assert result.id == user_dict["id"]
     mock_db_execute.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_update_user_propagates_database_errors(mock_db_fetchOne, monkeypatch):
+    repo = UserRepository()
+    user_dict = fake_user_dict()
+    monkeypatch.setattr(repo, "get_by_id", AsyncMock(return_value=UserRecord.from_row(user_dict)))
+    mock_db_fetchOne.side_effect = ConnectionError("server closed the connection")
+
+    with pytest.raises(ConnectionError):
+        await repo.update_user(1, {"firstname": "Jane"})
+
+@pytest.mark.asyncio
+async def test_update_user_adds_new_email_to_email_index(mock_db_fetchOne, monkeypatch):
+    repo = UserRepository()
+    monkeypatch.setattr(email_index, "filter", BloomFilter(100))
+    user_dict = fake_user_dict()
+    monkeypatch.setattr(repo, "get_by_id", AsyncMock(return_value=UserRecord.from_row(user_dict)))
+    mock_db_fetchOne.return_value = {**user_dict, "email": "new@example.com"}
+
+    await repo.update_user(1, {"email": "new@example.com"})
+    assert email_index.might_exist("new@example.com")
+
+# ---------------------------
+# Test register_with_otp
+# ---------------------------
+@pytest.mark.asyncio
+async def test_register_with_otp_returns_id_and_code(mock_db_fetchOne):
+    repo = UserRepository()
+    user = User(**fake_user_dict(user_id=None))
+    expires_at = datetime.now(timezone.utc)
+    mock_db_fetchOne.return_value = {"id": 9, "code": "1234"}
+
+    result = await repo.register_with_otp(user, code="1234", purpose="registration", expires_at=expires_at)
+    assert result == {"id": 9, "code": "1234"}
+    mock_db_fetchOne.assert_awaited_once()
+    query, *args = mock_db_fetchOne.await_args.args
+    assert "ON CONFLICT (email) DO NOTHING" in query
+    assert args[0] == user.email
+    assert args[6:8] == ["registration", "1234"]
+    assert args[8].tzinfo is None  # stored as naive UTC
+
+@pytest.mark.asyncio
+async def test_register_with_otp_returns_none_for_existing_email(mock_db_fetchOne):
+    repo = UserRepository()
+    mock_db_fetchOne.return_value = None
+
+    result = await repo.register_with_otp(
+        User(**fake_user_dict()), code="1234", purpose="registration", expires_at=datetime.now(timezone.utc)
+    )
+    assert result is None
+
+# ---------------------------
+# Test keyset listing
+# ---------------------------
+@pytest.mark.asyncio
+async def test_list_page_uses_keyset_and_skips_password_hash(mock_db_fetchAll):
+    repo = UserRepository()
+    mock_db_fetchAll.return_value = []
+
+    await repo.list_page(after_id=40, limit=20)
+    query, after_id, limit = mock_db_fetchAll.await_args.args
+    assert "password_hash" not in query
+    assert "id > $1" in query and "ORDER BY id" in query and "LIMIT $2" in query
+    assert (after_id, limit) == (40, 20)
+
+@pytest.mark.asyncio
+async def test_stream_walks_pages_until_a_short_one(mock_db_fetchAll):
+    repo = UserRepository()
+    mock_db_fetchAll.side_effect = [[{"id": 1}, {"id": 2}], [{"id": 5}, {"id": 6}], [{"id": 9}]]
+
+    rows = [row async for row in repo.stream(page_size=2)]
+    assert [row["id"] for row in rows] == [1, 2, 5, 6, 9]
+    assert [call.args[1] for call in mock_db_fetchAll.await_args_list] == [0, 2, 6]
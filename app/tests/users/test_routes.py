@@ -2,15 +2,17 @@
 from fastapi.testclient import TestClient
 from app.main import app
 from app.auth.dependencies import get_current_active_user
+from app.users.model import UserRecord
 
 # Mock user
 def override_current_active_user():
-    return {
-        "email": "test@example.com",
-        "firstname": "Test",
-        "lastname": "User",
-        "is_active": True
-    }
+    return UserRecord(
+        id=1,
+        email="test@example.com",
+        firstname="Test",
+        lastname="User",
+        is_active=True,
+    )
 
 # Override dependency
 app.dependency_overrides[get_current_active_user] = override_current_active_user
@@ -25,3 +27,43 @@ def test_get_current_user_profile():
     assert data["firstname"] == "Test"
     assert data["lastname"] == "User"
     assert data["is_active"] is True
+
+# ---------------------------
+# Test GET /users
+# ---------------------------
+class FakeUsersService:
+    def __init__(self):
+        self.calls = []
+
+    async def stream_users_ndjson(self, after_id, page_size):
+        self.calls.append((after_id, page_size))
+        yield b'{"id": 1, "email": "a@example.com"}\n'
+        yield b'{"id": 2, "email": "b@example.com"}\n'
+
+def test_list_users_streams_ndjson():
+    from app.auth.dependencies import get_current_admin_user
+    from app.users.dependencies import get_users_service
+    service = FakeUsersService()
+    app.dependency_overrides[get_current_admin_user] = override_current_active_user
+    app.dependency_overrides[get_users_service] = lambda: service
+    try:
+        client = TestClient(app)
+        response = client.get("/users", params={"after": 10, "page_size": 50})
+    finally:
+        del app.dependency_overrides[get_current_admin_user]
+        del app.dependency_overrides[get_users_service]
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [line for line in response.text.splitlines()] == [
+        '{"id": 1, "email": "a@example.com"}',
+        '{"id": 2, "email": "b@example.com"}',
+    ]
+    assert service.calls == [(10, 50)]
+
+def test_list_users_requires_admin(monkeypatch):
+    from app.auth import dependencies
+    monkeypatch.setattr(dependencies, "ADMIN_EMAILS", {"boss@example.com"})
+    client = TestClient(app)
+    response = client.get("/users")
+    assert response.status_code == 403
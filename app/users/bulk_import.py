@@ -0,0 +1,195 @@
+"""
+Bulk user import from CSV or NDJSON.
+
+Rows need email, firstname, lastname and either a plaintext `password`
+(hashed in parallel on a process pool) or a pre-computed `password_hash`.
+Rows are validated, loaded in batches with binary COPY into a staging
+table and merged into users with ON CONFLICT (email) DO NOTHING; the
+first row for an email wins.
+
+Usage:
+    python -m app.users.bulk_import users.csv
+    python -m app.users.bulk_import users.ndjson --batch-size 20000 --workers 8 --activate
+"""
+import argparse
+import asyncio
+import csv
+import functools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from app.auth.model import RegisterForm
+from app.auth.passwords import password_policy
+from app.auth.utils import hash_password
+from app.config import logger
+from app.repository import db
+from app.users.model import User
+from app.users.repository import UserRepository, user_repository
+
+
+@dataclass
+class ImportReport:
+    read: int = 0
+    inserted: int = 0
+    skipped: int = 0
+    rejected: List[Tuple[int, str]] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.read / self.seconds if self.seconds else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"read={self.read} inserted={self.inserted} skipped_existing={self.skipped} "
+            f"rejected={len(self.rejected)} in {self.seconds:.1f}s ({self.rows_per_sec:,.0f} rows/s)"
+        )
+
+
+def read_rows(path: str, fmt: Optional[str] = None) -> Iterator[Tuple[int, Dict]]:
+    """Stream (line number, row) pairs from a CSV or NDJSON file."""
+    fmt = fmt or ("ndjson" if path.endswith((".ndjson", ".jsonl")) else "csv")
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            for line_no, row in enumerate(csv.DictReader(f), start=2):
+                yield line_no, row
+        else:
+            for line_no, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        yield line_no, json.loads(line)
+                    except json.JSONDecodeError as e:
+                        yield line_no, {"_error": f"invalid JSON: {e}"}
+
+
+# users.password_hash is VARCHAR(128); the models already bound the other columns
+MAX_PASSWORD_HASH_LENGTH = 128
+
+
+def validate_row(row: Dict) -> Tuple[Dict, Optional[str]]:
+    """
+    Return (clean row, plaintext password to hash or None); raises ValueError
+    on bad rows, including any value COPY would refuse, so that one row cannot
+    fail its whole batch.
+    """
+    if "_error" in row:
+        raise ValueError(row["_error"])
+    for key, value in row.items():
+        if isinstance(value, str) and "\x00" in value:
+            raise ValueError(f"{key}: contains a NUL character")
+    if len(row.get("password_hash") or "") > MAX_PASSWORD_HASH_LENGTH:
+        raise ValueError(f"password_hash: longer than {MAX_PASSWORD_HASH_LENGTH} characters")
+    try:
+        if row.get("password_hash"):
+            user = User(
+                email=row.get("email"),
+                firstname=row.get("firstname"),
+                lastname=row.get("lastname"),
+                password_hash=row["password_hash"],
+            )
+            return user.model_dump(include={"email", "firstname", "lastname", "password_hash"}), None
+        form = RegisterForm(
+            email=row.get("email"),
+            firstname=row.get("firstname"),
+            lastname=row.get("lastname"),
+            password=row.get("password") or "",
+        )
+    except ValidationError as e:
+        raise ValueError("; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+    return form.model_dump(include={"email", "firstname", "lastname"}), form.password
+
+
+async def import_users(
+    path: str,
+    fmt: Optional[str] = None,
+    batch_size: int = 10000,
+    workers: int = os.cpu_count() or 1,
+    activate: bool = False,
+    repo: Optional[UserRepository] = None,
+) -> ImportReport:
+    repo = repo or user_repository
+    report = ImportReport()
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    # Hash with this process's (calibrated) policy, not the workers' uncalibrated defaults
+    hash_with_policy = functools.partial(hash_password, policy=password_policy.config)
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+
+        async def flush(batch: List[Dict], passwords: List[Tuple[int, str]]):
+            if passwords:
+                hashes = await loop.run_in_executor(
+                    None, lambda: list(executor.map(hash_with_policy, [p for _, p in passwords], chunksize=64))
+                )
+                for (index, _), password_hash in zip(passwords, hashes):
+                    batch[index]["password_hash"] = password_hash
+            created_at = datetime.now(timezone.utc)
+            records = [
+                (r["email"], r["firstname"], r["lastname"], r["password_hash"], activate, created_at)
+                for r in batch
+            ]
+            inserted = await repo.bulk_insert(records)
+            report.inserted += inserted
+            report.skipped += len(records) - inserted
+            logger.info("Imported batch: %s/%s new users (%s rows read).", inserted, len(records), report.read)
+
+        batch: List[Dict] = []
+        passwords: List[Tuple[int, str]] = []
+        for line_no, row in read_rows(path, fmt):
+            report.read += 1
+            try:
+                clean, password = validate_row(row)
+            except ValueError as e:
+                report.rejected.append((line_no, str(e)))
+                continue
+            if password is not None:
+                passwords.append((len(batch), password))
+            batch.append(clean)
+            if len(batch) >= batch_size:
+                await flush(batch, passwords)
+                batch, passwords = [], []
+        if batch:
+            await flush(batch, passwords)
+
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+async def _main(args):
+    password_policy.calibrate()
+    await db.connect()
+    try:
+        report = await import_users(
+            args.path, fmt=args.format, batch_size=args.batch_size, workers=args.workers, activate=args.activate
+        )
+    finally:
+        await db.close()
+    print(report.summary())
+    if args.rejects and report.rejected:
+        with open(args.rejects, "w", encoding="utf-8") as f:
+            for line_no, reason in report.rejected:
+                f.write(f"{line_no}\t{reason}\n")
+        print(f"Rejected rows written to {args.rejects}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import users from CSV or NDJSON.")
+    parser.add_argument("path", help="CSV (with header) or NDJSON file")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=10000, help="rows per COPY batch")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="password hashing processes")
+    parser.add_argument("--activate", action="store_true", help="import users as already active")
+    parser.add_argument("--rejects", help="write rejected line numbers and reasons to this file")
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
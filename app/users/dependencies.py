@@ -1,12 +1,13 @@
 from typing import Annotated
 from fastapi import Depends
 
-from app.users.service import UsersService
+from app.dependencies import UnitOfWorkDep
+from app.users.service import UsersService, users_service
 
 
-def get_users_service() -> UsersService:
-    """Get users service instance with dependencies."""
-    return UsersService()
+def get_users_service(uow: UnitOfWorkDep) -> UsersService:
+    """Get the shared users service; its queries run in the request's unit of work."""
+    return users_service
 
 
 # Type aliases for dependency injection
@@ -0,0 +1,191 @@
+import asyncio
+from typing import Any, Dict, Optional
+
+from app.bloom import BloomFilter
+from app.cache import TTLCache
+from app.config import (
+    logger,
+    EMAIL_FILTER_CAPACITY,
+    EMAIL_FILTER_ERROR_RATE,
+    EMAIL_INDEX_REFRESH,
+    EMAIL_NEGATIVE_TTL,
+)
+from app.metrics import CallbackMetric, register_cache
+from app.query import select_sql
+from app.repository import db
+
+# Emails inserted by other workers arrive on this channel (see init.sql)
+CHANNEL = "users_inserted"
+
+# Rows re-read behind the high-water mark on every catch-up: ids are handed
+# out at INSERT but become visible at COMMIT, so a slow transaction can land
+# below ids already seen.
+CATCH_UP_OVERLAP = 1000
+
+
+class EmailIndex:
+    """
+    Answers "has this email ever registered?" without a database round trip.
+
+    A Bloom filter over users.email is loaded in keyset pages at startup and
+    kept current from three sources: local inserts, NOTIFY payloads from the
+    users_inserted trigger (other workers, bulk imports) and a periodic
+    catch-up by id. A "no" is definite; a "maybe" still goes to Postgres,
+    and emails Postgres confirmed absent are remembered briefly in a
+    negative cache. Until the first load completes every email is a "maybe".
+    """
+
+    def __init__(
+        self,
+        capacity: int = EMAIL_FILTER_CAPACITY,
+        error_rate: float = EMAIL_FILTER_ERROR_RATE,
+        negative_ttl: float = EMAIL_NEGATIVE_TTL,
+        refresh_interval: float = EMAIL_INDEX_REFRESH,
+        page_size: int = 50000,
+    ):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self.page_size = page_size
+        self.filter: Optional[BloomFilter] = None
+        self.negative = TTLCache(maxsize=100000, ttl=negative_ttl, name="email_negative")
+        self.last_id = 0
+        self._catch_up_lock: Optional[asyncio.Lock] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._listener = None
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"lookups": 0, "definitely_absent": 0, "false_positives": 0}
+
+    @property
+    def ready(self) -> bool:
+        return self.filter is not None
+
+    def might_exist(self, email: str) -> bool:
+        """False only when the email is certainly not registered."""
+        self._stats["lookups"] += 1
+        if email in self.negative or (self.filter is not None and email not in self.filter):
+            self._stats["definitely_absent"] += 1
+            return False
+        return True
+
+    def add(self, email: str):
+        if self.filter is not None:
+            self.filter.add(email)
+        self.negative.invalidate(email)
+
+    def record_absent(self, email: str):
+        """Postgres found no user for an email the index let through."""
+        if self.filter is not None:
+            self._stats["false_positives"] += 1
+        self.negative.set(email, True)
+
+    async def catch_up(self) -> int:
+        """Add users with ids above the high-water mark; returns rows read."""
+        if self._catch_up_lock is None:
+            self._catch_up_lock = asyncio.Lock()
+        query = select_sql("users", columns=("id", "email"), extra="id > $1", order_by="id", limit="$2")
+        read = 0
+        async with self._catch_up_lock:
+            after_id = max(self.last_id - CATCH_UP_OVERLAP, 0) if self.last_id else 0
+            while True:
+                page = await db.fetchAll(query, after_id, self.page_size)
+                for row in page:
+                    self.add(row["email"])
+                read += len(page)
+                if page:
+                    after_id = page[-1]["id"]
+                    self.last_id = max(self.last_id, after_id)
+                if len(page) < self.page_size:
+                    return read
+
+    async def load(self):
+        row = await db.fetchOne("SELECT count(*) AS n FROM users")
+        existing = row["n"] if row else 0
+        # Room to double before the false-positive rate degrades
+        self.filter = BloomFilter(max(self.capacity, existing * 2), self.error_rate)
+        self.last_id = 0
+        await self.catch_up()
+        logger.info(
+            "Email index loaded: %s emails, %.1f KiB, estimated false-positive rate %.4f.",
+            self.filter.count, self.filter.memory_bytes / 1024, self.filter.estimated_fp_rate(),
+        )
+
+    def _on_notify(self, connection, pid, channel, payload: str):
+        if payload:
+            for email in payload.split("\n"):
+                self.add(email)
+        else:
+            # Too many rows for one payload: read them by id
+            self._wake.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.refresh_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.catch_up()
+            except Exception as e:
+                logger.error("Email index catch-up failed: %s", e)
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._wake = asyncio.Event()
+        try:
+            # Listen before loading so that nothing inserted meanwhile is missed
+            self._listener = await db.pool.acquire()
+            await self._listener.add_listener(CHANNEL, self._on_notify)
+        except Exception as e:
+            self._listener = None
+            logger.warning("Email index not listening for inserts (%s); relying on periodic catch-up.", e)
+        try:
+            await self.load()
+        except Exception as e:
+            self.filter = None
+            logger.error("Email index load failed; every email goes to the database: %s", e)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._listener is not None:
+            try:
+                await self._listener.remove_listener(CHANNEL, self._on_notify)
+                await db.pool.release(self._listener)
+            except Exception as e:
+                logger.warning("Email index listener release failed: %s", e)
+            self._listener = None
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self._stats, ready=self.ready, last_id=self.last_id)
+        through = self._stats["false_positives"] + self._stats["definitely_absent"]
+        # Share of absent emails that still cost a query
+        stats["observed_fp_rate"] = self._stats["false_positives"] / through if through else 0.0
+        if self.filter is not None:
+            stats.update(
+                emails=self.filter.count,
+                capacity=self.filter.capacity,
+                hashes=self.filter.hashes,
+                memory_bytes=self.filter.memory_bytes,
+                estimated_fp_rate=self.filter.estimated_fp_rate(),
+            )
+        return stats
+
+
+email_index = EmailIndex()
+register_cache(email_index.negative)
+
+CallbackMetric(
+    "email_index",
+    "Email existence index counters, size and false-positive rates.",
+    lambda: [((key,), float(value)) for key, value in email_index.stats().items() if not isinstance(value, bool)],
+    ("stat",),
+)
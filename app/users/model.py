@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime, timezone
-from typing import ClassVar, Optional
+from typing import Any, ClassVar, Mapping, NamedTuple, Optional
 
 
 class User(BaseModel):
@@ -15,8 +15,34 @@ class User(BaseModel):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 
+class UserRecord(NamedTuple):
+    """
+    A users row as the repositories hand it around: immutable, compact and
+    built without validation, since the data comes from our own database.
+    Convert with UserResponse.from_record at the API boundary.
+    """
+    id: Optional[int]
+    email: str
+    firstname: str
+    lastname: str
+    password_hash: Optional[str] = None
+    is_active: bool = False
+    created_at: Optional[datetime] = None
+
+    @classmethod
+    def from_row(cls, row: Mapping[str, Any]) -> "UserRecord":
+        return cls._make(map(row.get, cls._fields))
+
+
 class UserResponse(BaseModel):
     email: EmailStr
     firstname: str
     lastname: str
-    is_active: bool
\ No newline at end of file
+    is_active: bool
+
+    @classmethod
+    def from_record(cls, user: UserRecord) -> "UserResponse":
+        """Build the response from a trusted record without re-validating it."""
+        return cls.model_construct(
+            email=user.email, firstname=user.firstname, lastname=user.lastname, is_active=user.is_active
+        )
\ No newline at end of file
@@ -1,37 +1,174 @@
-from typing import Optional
-from app.repository import BaseRepository, db
-from app.users.model import User
-from app.config import logger
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence
+from app.repository import BaseRepository, db, reads, transactional, writes
+from app.query import params, select_sql, update_sql
+from app.cache import TTLCache
+from app.metrics import register_cache
+from app.auth.model import OTP
+from app.users.email_index import email_index
+from app.users.model import User, UserRecord
+from app.config import logger as service_logger, LOG_REQUEST_LEVEL, USER_CACHE_SIZE, USER_CACHE_TTL
+
+logger = service_logger.getChild("users")
+
+# Everything but password_hash, for listings
+PUBLIC_COLUMNS = ("id", "email", "firstname", "lastname", "is_active", "created_at")
+BULK_COLUMNS = ("email", "firstname", "lastname", "password_hash", "is_active", "created_at")
+
+# Users by id, shared by every UserRepository in this worker
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL, name="users")
+register_cache(user_cache)
 
 class UserRepository(BaseRepository):
     def __init__(self):
         super().__init__(User.table_name)
 
-    def get_all(self):
+    @reads
+    async def get_all(self):
         """Get all users."""
-        query = f"SELECT * FROM {self.table_name}"
-        logger.info(f"Fetching all users from {self.table_name}")
+        query = select_sql(self.table_name)
+        logger.log(LOG_REQUEST_LEVEL, "Fetching all users from %s", self.table_name)
         try:
-            results = db.fetchAll(query)
-            logger.debug(f"Fetched users: {results}")
+            results = await db.fetchAll(query)
+            logger.debug("Fetched %s users", len(results))
             return results if results else []
         except Exception as e:
-            logger.error(f"Error fetching all users: {e}")
+            logger.error("Error fetching all users: %s", e)
             return []
 
-    def get_by_email(self, email: str) -> Optional[User]:
-        """Get user by email."""
-        query = f"SELECT * FROM {self.table_name} WHERE email='{email}'"
-        logger.info(f"Fetching user by email: {email}")
+    @reads
+    async def list_page(self, after_id: int = 0, limit: int = 100) -> List[Dict]:
+        """One keyset page of users with id > after_id, ordered by id, without password hashes."""
+        query = select_sql(self.table_name, columns=PUBLIC_COLUMNS, extra="id > $1", order_by="id", limit="$2")
+        return await db.fetchAll(query, int(after_id), int(limit))
+
+    async def stream(self, after_id: int = 0, page_size: int = 500) -> AsyncIterator[Dict]:
+        """
+        Iterate over users page by page; only one page is held in memory and
+        the pooled connection is released between pages.
+        """
+        while True:
+            page = await self.list_page(after_id, page_size)
+            for row in page:
+                yield row
+            if len(page) < page_size:
+                return
+            after_id = page[-1]["id"]
+
+    @reads(confirm_miss=True)
+    async def get_by_id(self, entity_id) -> Optional[UserRecord]:
+        """Get user by ID, served from the user cache when possible."""
+        user_id = int(entity_id)
+        cached = user_cache.get(user_id)
+        if cached is not None:
+            return cached
+        result = await super().get_by_id(user_id)
+        if not result:
+            return None
+        # Records are immutable, so the cached one can be shared
+        user = UserRecord.from_row(result)
+        user_cache.set(user_id, user)
+        return user
+
+    @reads(confirm_miss=True)
+    async def get_by_email(self, email: str) -> Optional[UserRecord]:
+        """Get user by email; emails the email index rules out never reach the database."""
+        if not email_index.might_exist(email):
+            return None
+        query = select_sql(self.table_name, ("email",))
+        logger.log(LOG_REQUEST_LEVEL, "Fetching user by email: %s", email)
         try:
-            result = db.fetchOne(query)
-            logger.debug(f"Fetched user: {result}")
-            return User(**result) if result else None
+            result = await db.fetchOne(query, email)
+            logger.debug("Fetched user: %s", result)
         except Exception as e:
-            logger.error(f"Error fetching user by email {email}: {e}")
+            logger.error("Error fetching user by email %s: %s", email, e)
+            return None
+        if not result:
+            email_index.record_absent(email)
             return None
+        return UserRecord.from_row(result)
+
+    @writes
+    async def register_with_otp(
+        self, user: UserRecord, code: str, purpose: str, expires_at: datetime
+    ) -> Optional[Dict]:
+        """
+        Create an inactive user and its activation code in one statement.
+        The user insert is skipped on an existing email, which also skips the
+        OTP insert and returns None; otherwise returns {"id", "code"}.
+        """
+        query = f"""
+        WITH new_user AS (
+            INSERT INTO {self.table_name} (email, firstname, lastname, password_hash, is_active, created_at)
+            VALUES ($1, $2, $3, $4, $5, $6)
+            ON CONFLICT (email) DO NOTHING
+            RETURNING id, email
+        ), new_otp AS (
+            INSERT INTO {OTP.table_name} (user_id, email, purpose, code, expires_at, created_at)
+            SELECT id, email, $7, $8, $9, $6 FROM new_user
+            ON CONFLICT (email) DO UPDATE SET
+                user_id = EXCLUDED.user_id,
+                purpose = EXCLUDED.purpose,
+                code = EXCLUDED.code,
+                expires_at = EXCLUDED.expires_at,
+                created_at = EXCLUDED.created_at
+            RETURNING user_id, code
+        )
+        SELECT user_id AS id, code FROM new_otp
+        """
+        logger.log(LOG_REQUEST_LEVEL, "Registering user with %s code in %s", purpose, self.table_name)
+        created = await db.fetchOne(query, *params((
+            user.email, user.firstname, user.lastname, user.password_hash, user.is_active, user.created_at,
+            purpose, code, expires_at,
+        )))
+        if created:
+            email_index.add(user.email)
+        return created
+
+    @writes
+    async def bulk_insert(self, records: Iterable[Sequence]) -> int:
+        """
+        Load (email, firstname, lastname, password_hash, is_active, created_at)
+        records with binary COPY into a staging table, then merge them into
+        users, skipping emails that already exist. When the records repeat an
+        email, the first one wins. Returns the rows inserted.
+        """
+        columns = ", ".join(BULK_COLUMNS)
+        staging = f"{self.table_name}_import"
+        async with db.connection() as conn:
+            async with conn.transaction():
+                await conn.execute(f"""
+                    CREATE TEMP TABLE {staging} (
+                        position INT, email VARCHAR(254), firstname VARCHAR(128), lastname VARCHAR(128),
+                        password_hash VARCHAR(128), is_active BOOLEAN, created_at TIMESTAMP
+                    ) ON COMMIT DROP
+                """)
+                await conn.copy_records_to_table(
+                    staging,
+                    records=[(position, *params(r)) for position, r in enumerate(records)],
+                    columns=["position", *BULK_COLUMNS],
+                )
+                status = await conn.execute(f"""
+                    INSERT INTO {self.table_name} ({columns})
+                    SELECT DISTINCT ON (email) {columns} FROM {staging}
+                    ORDER BY email, position
+                    ON CONFLICT (email) DO NOTHING
+                """)
+        inserted = int(status.split()[-1])
+        logger.info("Bulk inserted %s rows into %s", inserted, self.table_name)
+        return inserted
 
-    def update_user(self, user_id: str, update_data: dict, allow_is_active=False) -> Optional[User]:
+    @writes
+    async def update_password_hash(self, user_id: int, old_hash: str, new_hash: str) -> bool:
+        """Replace a password hash unless it changed since it was read; True if replaced."""
+        query = f"UPDATE {self.table_name} SET password_hash=$1 WHERE id=$2 AND password_hash=$3"
+        status = await db.execute(query, new_hash, int(user_id), old_hash)
+        user_cache.invalidate(int(user_id))
+        return status is not None and status.split()[-1] == "1"
+
+    @writes
+    @transactional
+    async def update_user(self, user_id: str, update_data: dict, allow_is_active=False) -> Optional[UserRecord]:
         """
         Update user information.
         Only allows certain fields to be updated. If allow_is_active=True, can update is_active.
@@ -41,38 +178,29 @@ class UserRepository(BaseRepository):
             ALLOWED_UPDATE_FIELDS.add("is_active")
 
         # Get current user data
-        user_data = self.get_by_id(user_id)
-        if not user_data:
+        user = await self.get_by_id(user_id)
+        if not user:
             return None
 
-        # Build SET clause safely
-        set_clause_parts = []
-        for k, v in update_data.items():
-            if k in ALLOWED_UPDATE_FIELDS and v is not None:
-                # If string, wrap with single quotes
-                if isinstance(v, str):
-                    safe_value = v.replace("'", "''")  # escape single quotes
-                    set_clause_parts.append(f"{k}='{safe_value}'")
-                elif isinstance(v, bool):
-                    set_clause_parts.append(f"{k}={'TRUE' if v else 'FALSE'}")
-                else:
-                    set_clause_parts.append(f"{k}={v}")
-
-        if not set_clause_parts:
+        fields = {
+            k: v for k, v in update_data.items()
+            if k in ALLOWED_UPDATE_FIELDS and v is not None
+        }
+
+        if not fields:
             # Nothing to update
-            return User(**user_data)
+            return user
 
-        set_clause = ", ".join(set_clause_parts)
-        query = f"UPDATE {self.table_name} SET {set_clause} WHERE id={user_id} RETURNING *"
+        query = update_sql(self.table_name, tuple(fields), returning="*")
 
-        try:
-            updated_user_data = db.fetchOne(query)  # no params
-            if updated_user_data:
-                return User(**updated_user_data)
+        # A failed UPDATE raises, so the unit of work rolls back instead of committing
+        updated_user_data = await db.fetchOne(query, *params(fields.values()), int(user_id))
+        user_cache.invalidate(int(user_id))
+        if not updated_user_data:
             return None
-        except Exception as e:
-            logger.error(f"Error updating user id={user_id}: {e}")
-            return None
-
+        if "email" in fields:
+            email_index.add(updated_user_data["email"])
+        return UserRecord.from_row(updated_user_data)
 
 
+user_repository = UserRepository()
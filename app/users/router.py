@@ -1,11 +1,14 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
 
-from app.auth.dependencies import CurrentActiveUser
+from app.auth.dependencies import CurrentActiveUser, CurrentAdminUser
 from app.users.dependencies import UsersServiceDep
-from app.users.model import User, UserResponse
+from app.users.model import UserResponse
+from app.dependencies import UnitOfWorkRoute
+from app.responses import ModelResponse
 
 
-router = APIRouter(prefix="/users", tags=["Users"])
+router = APIRouter(prefix="/users", tags=["Users"], route_class=UnitOfWorkRoute)
 
 
 @router.get(
@@ -16,7 +19,24 @@ router = APIRouter(prefix="/users", tags=["Users"])
 )
 async def get_current_user_profile(
     current_user: CurrentActiveUser, users_service: UsersServiceDep
-) -> UserResponse:
+) -> ModelResponse:
     """Get current user profile information."""
-    return UserResponse(**current_user)
+    return ModelResponse(UserResponse.from_record(current_user))
 
+
+@router.get(
+    "",
+    summary="List users",
+    description="Stream all users as NDJSON, ordered by id. Pass the last id received as `after` to resume. Admin only.",
+    response_class=StreamingResponse,
+)
+async def list_users(
+    admin: CurrentAdminUser,
+    users_service: UsersServiceDep,
+    after: int = Query(0, ge=0, description="Only users with an id greater than this"),
+    page_size: int = Query(500, ge=1, le=5000, description="Rows fetched per database round trip"),
+) -> StreamingResponse:
+    """Stream users as newline-delimited JSON."""
+    return StreamingResponse(
+        users_service.stream_users_ndjson(after, page_size), media_type="application/x-ndjson"
+    )
@@ -1,13 +1,21 @@
-from typing import Optional
-from app.users.model import User
-from app.users.repository import UserRepository
+import json
+from typing import AsyncIterator, Optional
+from app.users.model import UserRecord
+from app.users.repository import user_repository
 
 
 class UsersService:
     def __init__(self):
-        self.users_repo = UserRepository()
+        self.users_repo = user_repository
 
-    def get_user_by_id(self, user_id: str) -> Optional[User]:
+    async def get_user_by_id(self, user_id: str) -> Optional[UserRecord]:
         """Get user by ID."""
-        return self.users_repo.get_by_id(user_id)
+        return await self.users_repo.get_by_id(user_id)
 
+    async def stream_users_ndjson(self, after_id: int = 0, page_size: int = 500) -> AsyncIterator[bytes]:
+        """Yield one JSON line per user, fetched in keyset pages."""
+        async for row in self.users_repo.stream(after_id, page_size):
+            yield json.dumps(row, default=str).encode() + b"\n"
+
+
+users_service = UsersService()
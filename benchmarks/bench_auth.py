@@ -0,0 +1,106 @@
+"""
+Microbenchmarks for the auth hot paths.
+
+Times hash_password, create_access_token, verify_token (cold and cached)
+and BaseRepository.insert. Without --db the insert runs against an
+in-memory stand-in for `db`, which isolates the repository's own
+overhead (row conversion, SQL lookup, parameter coercion); with --db it
+inserts into the configured PostgreSQL and deletes its rows afterwards.
+
+Usage:
+    python -m benchmarks.bench_auth [--number 5000] [--db] [--output run.json] [--baseline earlier.json]
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from typing import Callable, Dict, List
+
+from benchmarks.report import load, print_table, save, summarize
+
+
+def measure(fn: Callable[[], object], number: int) -> List[float]:
+    """Per-call latencies in milliseconds."""
+    samples = []
+    for _ in range(number):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+async def measure_async(fn, number: int) -> List[float]:
+    samples = []
+    for _ in range(number):
+        started = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def result(samples: List[float]) -> dict:
+    return summarize(samples, elapsed=sum(samples) / 1000)
+
+
+async def bench_insert(number: int, use_db: bool) -> List[float]:
+    from app.repository import db
+    from app.users.model import User
+    from app.users.repository import UserRepository
+
+    repo = UserRepository()
+    prefix = f"bench-{uuid.uuid4().hex[:8]}"
+    counter = iter(range(number))
+
+    def make_user():
+        return User(email=f"{prefix}-{next(counter)}@example.com", firstname="Bench", lastname="Mark", password_hash="x")
+
+    if not use_db:
+        async def fetch_one(query, *args):
+            return {"id": 1}
+
+        db.fetchOne = fetch_one
+        return await measure_async(lambda: repo.insert(make_user()), number)
+
+    await db.connect()
+    try:
+        return await measure_async(lambda: repo.insert(make_user()), number)
+    finally:
+        await db.execute("DELETE FROM users WHERE email LIKE $1", f"{prefix}-%")
+        await db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=5000, help="calls per operation")
+    parser.add_argument("--hash-number", type=int, default=20, help="calls to hash_password (it is deliberately slow)")
+    parser.add_argument("--db", action="store_true", help="insert into the configured PostgreSQL")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    from app.auth.utils import create_access_token, hash_password, token_cache, verify_token
+
+    claims = {"sub": "42", "email": "user@example.com"}
+    token = create_access_token(claims)
+
+    def verify_cold():
+        token_cache.clear()
+        return verify_token(token)
+
+    results: Dict[str, dict] = {
+        "hash_password": result(measure(lambda: hash_password("correct horse battery staple"), args.hash_number)),
+        "create_access_token": result(measure(lambda: create_access_token(claims), args.number)),
+        "verify_token (cold)": result(measure(verify_cold, args.number)),
+        "verify_token (cached)": result(measure(lambda: verify_token(token), args.number)),
+        "BaseRepository.insert": result(asyncio.run(bench_insert(args.number, args.db))),
+    }
+
+    baseline = load(args.baseline)["results"] if args.baseline else None
+    print_table(results, baseline, columns=("requests", "rps", "p50_ms", "p95_ms", "p99_ms"))
+    if args.output:
+        params = {"number": args.number, "hash_number": args.hash_number, "db": args.db}
+        save(args.output, "bench_auth", params, results)
+
+
+if __name__ == "__main__":
+    main()
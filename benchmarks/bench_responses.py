@@ -0,0 +1,81 @@
+"""
+Per-request response encode cost: FastAPI's default path vs ModelResponse.
+
+"default" is what a route with response_model did before: re-validate the
+returned model, serialize it to JSON-compatible data and render that with
+stdlib json. "orjson" is the same with the app's ORJSONResponse, and
+"model" is ModelResponse, which the /auth/* and /users/me routes return.
+
+Usage:
+    python -m benchmarks.bench_responses [--number 20000] [--output run.json] [--baseline earlier.json]
+"""
+import argparse
+import time
+from typing import Callable, Dict, List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.auth.model import OTPResponse, TokenResponse
+from app.responses import ModelResponse, ORJSONResponse
+from app.users.model import UserResponse
+from benchmarks.report import load, print_table, save, summarize
+
+
+def run_sync(coro):
+    """Run a coroutine that never suspends, without event loop overhead."""
+    try:
+        coro.send(None)
+    except StopIteration as done:
+        return done.value
+    raise RuntimeError("coroutine suspended")
+
+
+def samples(fn: Callable[[], object], number: int) -> List[float]:
+    latencies = []
+    for _ in range(number):
+        started = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000, help="encodes per measurement")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    token = "eyJhbGciOiJIUzI1NiJ9." + "x" * 180 + ".signature-signature-signature-sig"
+    routes = {
+        "/auth/login": TokenResponse(access_token=token, refresh_token=token),
+        "/auth/register": OTPResponse(activation_code=123456),
+        "/users/me": UserResponse(email="user@example.com", firstname="Jane", lastname="Doe", is_active=True),
+    }
+
+    results: Dict[str, dict] = {}
+    for route, model in routes.items():
+        field = create_model_field(name="Response_" + route, type_=type(model), mode="serialization")
+
+        def default(response_class=JSONResponse):
+            content = run_sync(serialize_response(field=field, response_content=model))
+            return response_class(content).body
+
+        for name, fn in (
+            ("default", default),
+            ("orjson", lambda: default(ORJSONResponse)),
+            ("model", lambda: ModelResponse(model).body),
+        ):
+            latencies = samples(fn, args.number)
+            results[f"{route} {name}"] = summarize(latencies, elapsed=sum(latencies) / 1000)
+
+    baseline = load(args.baseline)["results"] if args.baseline else None
+    print_table(results, baseline, columns=("rps", "mean_ms", "p50_ms", "p99_ms"))
+    if args.output:
+        save(args.output, "bench_responses", {"number": args.number}, results)
+
+
+if __name__ == "__main__":
+    main()
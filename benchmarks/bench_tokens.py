@@ -0,0 +1,37 @@
+"""
+Encode/decode throughput of each JWT backend.
+
+Usage:
+    python -m benchmarks.bench_tokens [--number 20000]
+"""
+import argparse
+import timeit
+from datetime import datetime, timedelta, timezone
+
+from app.auth.tokens import BACKENDS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000, help="operations per measurement")
+    parser.add_argument("--repeat", type=int, default=3, help="measurements per operation (best is kept)")
+    args = parser.parse_args()
+
+    claims = {
+        "sub": "42",
+        "email": "user@example.com",
+        "type": "access",
+        "exp": datetime.now(timezone.utc) + timedelta(minutes=30),
+    }
+
+    print(f"{'backend':<8} {'encode ops/s':>14} {'decode ops/s':>14}")
+    for name, backend in BACKENDS.items():
+        codec = backend()
+        token = codec.encode(claims)
+        encode = min(timeit.repeat(lambda: codec.encode(claims), number=args.number, repeat=args.repeat))
+        decode = min(timeit.repeat(lambda: codec.decode(token), number=args.number, repeat=args.repeat))
+        print(f"{name:<8} {args.number / encode:>14,.0f} {args.number / decode:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+End-to-end load test of the auth flow.
+
+Every virtual user walks register -> verify -> login -> /users/me ->
+refresh with a fresh email; `--concurrency` users run at once until
+`--users` flows have started. Latency, throughput and error rate are
+reported per endpoint, and `--output` saves them as JSON that a later
+run can be compared against with `--baseline`.
+
+Run it against a throwaway database: every flow creates a user.
+
+All flows come from one client IP, so the per-IP login limit would turn
+most logins into 429s and the run would measure the rate limiter. Start
+the server under test with LOGIN_RATE_LIMIT_IP=0; `--in-process` sets it
+unless it is already in the environment. A run that still hits 429s says
+so at the end.
+
+Usage:
+    python -m benchmarks.load_auth --base-url http://localhost:8000 --users 500 --concurrency 50
+    python -m benchmarks.load_auth --in-process --output after.json --baseline before.json
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.report import load, print_table, save, summarize
+
+STEPS = ("register", "verify", "login", "me", "refresh")
+
+
+class Recorder:
+    """Latencies (ms) and error counts per step."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    async def call(self, step: str, request, expected: int = 200):
+        started = time.perf_counter()
+        try:
+            response = await request
+        except httpx.HTTPError:
+            self.errors[step] += 1
+            self.statuses[step][0] += 1
+            return None
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.statuses[step][response.status_code] += 1
+        if response.status_code != expected:
+            self.errors[step] += 1
+            return None
+        self.latencies[step].append(elapsed_ms)
+        return response.json()
+
+    def results(self, elapsed: float) -> Dict[str, dict]:
+        results = {}
+        for step in STEPS:
+            row = summarize(self.latencies[step], self.errors[step], elapsed)
+            row["statuses"] = {str(code): n for code, n in sorted(self.statuses[step].items())}
+            results[step] = row
+        everything = [ms for step in STEPS for ms in self.latencies[step]]
+        results["total"] = summarize(everything, sum(self.errors.values()), elapsed)
+        return results
+
+
+async def run_flow(client: httpx.AsyncClient, recorder: Recorder, email: str, password: str):
+    """One user through the whole flow; later steps are skipped once one fails."""
+    registered = await recorder.call("register", client.post("/auth/register", json={
+        "email": email, "firstname": "Load", "lastname": "Test", "password": password,
+    }), expected=201)
+    if registered is None:
+        return
+    verified = await recorder.call("verify", client.post("/auth/verify", json={
+        "email": email, "activation_code": registered["activation_code"],
+    }))
+    if verified is None:
+        return
+    tokens = await recorder.call("login", client.post("/auth/login", json={"email": email, "password": password}))
+    if tokens is None:
+        return
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    await recorder.call("me", client.get("/users/me", headers=headers))
+    await recorder.call("refresh", client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]}))
+
+
+@asynccontextmanager
+async def make_client(args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    timeout = httpx.Timeout(args.timeout)
+    if not args.in_process:
+        async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=timeout) as client:
+            yield client
+        return
+    # Drive the ASGI app directly, with its real lifespan (pool, hasher, mailer).
+    # Every flow shares one client IP: lift the per-IP login limit before config loads.
+    os.environ.setdefault("LOGIN_RATE_LIMIT_IP", "0")
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=timeout) as client:
+            yield client
+
+
+async def run(args) -> Dict[str, dict]:
+    recorder = Recorder()
+    run_id = uuid.uuid4().hex[:8]
+    remaining = iter(range(args.users))
+
+    async with make_client(args) as client:
+        async def worker():
+            for index in remaining:
+                await run_flow(client, recorder, f"load-{run_id}-{index}@example.com", args.password)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    print(f"{args.users} flows, concurrency {args.concurrency}, {elapsed:.2f}s")
+    return recorder.results(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--in-process", action="store_true", help="serve app.main in this process instead of over HTTP")
+    parser.add_argument("--users", type=int, default=200, help="flows to run in total")
+    parser.add_argument("--concurrency", type=int, default=20, help="flows in flight at once")
+    parser.add_argument("--password", default="load-test-password")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout in seconds")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    baseline = load(args.baseline)["results"] if args.baseline else None
+    print_table(results, baseline)
+    limited = sum(row["statuses"].get("429", 0) for row in results.values() if "statuses" in row)
+    if limited:
+        print(f"{limited} requests were rate limited (429); run the server with LOGIN_RATE_LIMIT_IP=0.")
+    if args.output:
+        params = {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "password")}
+        save(args.output, "load_auth", params, results)
+
+
+if __name__ == "__main__":
+    main()
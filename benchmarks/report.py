@@ -0,0 +1,73 @@
+"""
+Summaries, JSON results and run-to-run comparison shared by the benchmarks.
+"""
+import json
+import math
+import platform
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence
+
+
+def percentile(sorted_samples: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of already sorted samples."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+def summarize(latencies_ms: Iterable[float], errors: int = 0, elapsed: float = 0.0) -> Dict[str, float]:
+    """Count, error rate, throughput and latency percentiles for one operation."""
+    samples = sorted(latencies_ms)
+    total = len(samples) + errors
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(samples) / len(samples), 3) if samples else 0.0,
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+        "max_ms": round(samples[-1], 3) if samples else 0.0,
+    }
+
+
+def save(path: str, name: str, params: dict, results: Dict[str, dict]):
+    """Write a run to `path` with enough context to compare it later."""
+    document = {
+        "benchmark": name,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": params,
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2)
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+COLUMNS = ("requests", "error_rate", "rps", "p50_ms", "p95_ms", "p99_ms")
+
+
+def print_table(results: Dict[str, dict], baseline: Optional[Dict[str, dict]] = None, columns: Sequence[str] = COLUMNS):
+    """Print one row per operation; with a baseline, each cell carries its relative change."""
+    width = max([len("operation")] + [len(name) for name in results])
+    print(f"{'operation':<{width}} " + " ".join(f"{c:>18}" for c in columns))
+    for name, row in results.items():
+        base = (baseline or {}).get(name, {})
+        cells: List[str] = []
+        for column in columns:
+            value = row.get(column, 0)
+            cell = f"{value:,.3f}".rstrip("0").rstrip(".") if isinstance(value, float) else f"{value:,}"
+            previous = base.get(column)
+            if previous:
+                cell += f" ({(value - previous) / previous:+.0%})"
+            cells.append(f"{cell:>18}")
+        print(f"{name:<{width}} " + " ".join(cells))
@@ -19,7 +19,72 @@ CREATE TABLE IF NOT EXISTS activations (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+CREATE TABLE IF NOT EXISTS refresh_tokens (
+    jti VARCHAR(32) PRIMARY KEY,
+    family_id VARCHAR(32) NOT NULL,
+    user_id INT REFERENCES users(id) ON DELETE CASCADE,
+    expires_at TIMESTAMP NOT NULL,
+    used_at TIMESTAMP,
+    revoked_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Indexes for performance
 CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
 CREATE INDEX IF NOT EXISTS idx_activations_user_id ON activations(user_id);
 CREATE INDEX IF NOT EXISTS idx_activations_code ON activations(code);
+CREATE INDEX IF NOT EXISTS idx_activations_expires_at ON activations(expires_at);
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_family_id ON refresh_tokens(family_id);
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_expires_at ON refresh_tokens(expires_at);
+
+-- Tell every API worker about new emails (see app/users/email_index.py).
+-- Small inserts carry the emails in the payload; larger ones send an empty
+-- payload and workers read the new rows by id.
+CREATE OR REPLACE FUNCTION notify_users_inserted() RETURNS trigger AS $$
+DECLARE
+    payload TEXT;
+BEGIN
+    SELECT string_agg(email, E'\n') INTO payload FROM (SELECT email FROM inserted LIMIT 21) AS batch;
+    IF payload IS NULL THEN
+        RETURN NULL;
+    END IF;
+    IF (SELECT count(*) FROM (SELECT 1 FROM inserted LIMIT 21) AS batch) > 20 THEN
+        payload := '';
+    END IF;
+    PERFORM pg_notify('users_inserted', payload);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_inserted ON users;
+CREATE TRIGGER users_inserted
+    AFTER INSERT ON users
+    REFERENCING NEW TABLE AS inserted
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_users_inserted();
+
+-- Changed emails go on the same channel. The id-based catch-up never sees
+-- updates, so they are always sent in the payload, 20 per notification.
+-- (Transition tables rule out a single INSERT OR UPDATE OF email trigger.)
+CREATE OR REPLACE FUNCTION notify_users_email_updated() RETURNS trigger AS $$
+DECLARE
+    payload TEXT;
+BEGIN
+    FOR payload IN
+        SELECT string_agg(email, E'\n') FROM (
+            SELECT updated.email, (row_number() OVER () - 1) / 20 AS chunk
+            FROM updated JOIN previous USING (id)
+            WHERE updated.email IS DISTINCT FROM previous.email
+        ) AS changed
+        GROUP BY chunk
+    LOOP
+        PERFORM pg_notify('users_inserted', payload);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_email_updated ON users;
+CREATE TRIGGER users_email_updated
+    AFTER UPDATE ON users
+    REFERENCING OLD TABLE AS previous NEW TABLE AS updated
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_users_email_updated();